@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Audio preprocessing benchmark
+Compares CPU time and peak memory of PCM decoding + resampling to 16 kHz:
+the previous path (float copies, linear interpolation), librosa (if installed)
+and utils.audio_preprocessing
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from utils import audio_preprocessing
+from utils.audio_decoding import SAMPLE_RATE
+from utils.audio_preprocessing import StreamResampler, pcm16_to_float32, resample
+
+
+def previous_path(pcm: bytes, rate: int, channels: int) -> np.ndarray:
+    """Decoding as it was before utils.audio_preprocessing"""
+    audio = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio[:audio.size - audio.size % channels].reshape(-1, channels).mean(axis=1)
+    if rate == SAMPLE_RATE:
+        return audio
+    target_length = int(round(audio.size * SAMPLE_RATE / rate))
+    positions = np.arange(target_length, dtype=np.float64) * (rate / SAMPLE_RATE)
+    return np.interp(positions, np.arange(audio.size), audio).astype(np.float32)
+
+
+def librosa_path(pcm: bytes, rate: int, channels: int) -> np.ndarray:
+    """The original librosa-based preprocessing"""
+    import librosa
+    audio = np.array(np.frombuffer(pcm, dtype="<i2"), dtype=np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    audio = librosa.resample(audio, orig_sr=rate, target_sr=SAMPLE_RATE)
+    return audio / np.max(np.abs(audio))
+
+
+def current_path(pcm: bytes, rate: int, channels: int) -> np.ndarray:
+    return resample(pcm16_to_float32(pcm, channels), rate, SAMPLE_RATE)
+
+
+def numpy_polyphase_path(pcm: bytes, rate: int, channels: int) -> np.ndarray:
+    """utils.audio_preprocessing without scipy"""
+    audio = pcm16_to_float32(pcm, channels)
+    if rate == SAMPLE_RATE:
+        return audio
+    resampler = StreamResampler(rate, SAMPLE_RATE)
+    return np.concatenate((resampler.push(audio), resampler.flush()))
+
+
+def measure(path: Callable[[bytes, int, int], np.ndarray], pcm: bytes, rate: int, channels: int, repeats: int) -> Tuple[float, float]:
+    """Median CPU milliseconds and peak traced memory (MB) of one run"""
+    path(pcm, rate, channels)  # warm caches (filter design, imports)
+    cpu: List[float] = []
+    for _ in range(repeats):
+        started = time.process_time()
+        path(pcm, rate, channels)
+        cpu.append((time.process_time() - started) * 1000)
+
+    tracemalloc.start()
+    path(pcm, rate, channels)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(cpu), peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=60.0, help="Length of the test signal")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per path")
+    args = parser.parse_args()
+
+    paths: Dict[str, Callable[[bytes, int, int], np.ndarray]] = {"previous": previous_path}
+    try:
+        import librosa  # noqa: F401
+        paths["librosa"] = librosa_path
+    except ImportError:
+        pass
+    paths["current"] = current_path
+    if audio_preprocessing._scipy_resample_poly is not None:
+        paths["current (numpy only)"] = numpy_polyphase_path
+
+    rng = np.random.default_rng(0)
+    print(f"{'input':<22} {'path':<22} {'cpu ms':>9} {'peak MB':>9}")
+    for rate, channels in [(44100, 2), (48000, 1), (16000, 1)]:
+        samples = int(args.seconds * rate) * channels
+        pcm = (rng.standard_normal(samples) * 3000).astype("<i2").tobytes()
+        label = f"{rate} Hz x{channels}, {len(pcm) / 1024 / 1024:.1f} MB"
+        for name, path in paths.items():
+            cpu_ms, peak_mb = measure(path, pcm, rate, channels, args.repeats)
+            print(f"{label:<22} {name:<22} {cpu_ms:>9.1f} {peak_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
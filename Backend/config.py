@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Encodings the canvas preprocessor can produce
+IMAGE_FORMATS = ("png", "webp", "jpeg")
+
 class Settings:
     """Application settings and configuration"""
     
@@ -22,12 +25,146 @@ class Settings:
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
+    # Startup warmup (model loading, upstream preconnects); /ready answers 503 until it is done
+    WARMUP_TIMEOUT_SECONDS: float = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "600"))
     
     # AI Model settings
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
     WHISPER_MODEL: str = os.getenv("WHISPER_MODEL", "base")
+    # Extra model sizes kept resident next to WHISPER_MODEL, fastest first (e.g. "tiny")
+    WHISPER_FAST_MODELS: str = os.getenv("WHISPER_FAST_MODELS", "")
+    WHISPER_REALTIME_MAX_SECONDS: float = float(os.getenv("WHISPER_REALTIME_MAX_SECONDS", "10"))
+    WHISPER_OVERLOAD_DEPTH: int = int(os.getenv("WHISPER_OVERLOAD_DEPTH", "4"))
+    # Whisper worker processes (0 runs the model inside the API process)
+    WHISPER_WORKERS: int = int(os.getenv("WHISPER_WORKERS", "0"))
+    WHISPER_CPU_THREADS: int = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+    WHISPER_MAX_QUEUE: int = int(os.getenv("WHISPER_MAX_QUEUE", "32"))
+    WHISPER_JOB_TIMEOUT_SECONDS: int = int(os.getenv("WHISPER_JOB_TIMEOUT_SECONDS", "300"))
+    WHISPER_HEALTH_CHECK_SECONDS: int = int(os.getenv("WHISPER_HEALTH_CHECK_SECONDS", "15"))
+    # Failed restarts in a row after which a worker is given up on (/ready fails once none are left)
+    WHISPER_RESTART_ATTEMPTS: int = int(os.getenv("WHISPER_RESTART_ATTEMPTS", "5"))
+    # Micro-batching of short (<= 30 s) realtime transcriptions (batch size 1 disables it)
+    WHISPER_BATCH_MAX_SIZE: int = int(os.getenv("WHISPER_BATCH_MAX_SIZE", "8"))
+    WHISPER_BATCH_WINDOW_MS: float = float(os.getenv("WHISPER_BATCH_WINDOW_MS", "20"))
+    # Chunked realtime transcription sessions (/voice-to-text-realtime)
+    TRANSCRIPTION_SESSION_MAX: int = int(os.getenv("TRANSCRIPTION_SESSION_MAX", "1000"))
+    TRANSCRIPTION_SESSION_TTL_SECONDS: int = int(os.getenv("TRANSCRIPTION_SESSION_TTL_SECONDS", "600"))
+    TRANSCRIPTION_SESSION_MAX_BYTES: int = int(os.getenv("TRANSCRIPTION_SESSION_MAX_BYTES", str(16 * 1024 * 1024)))
+    TRANSCRIPTION_SESSION_MAX_PENDING_CHUNKS: int = int(os.getenv("TRANSCRIPTION_SESSION_MAX_PENDING_CHUNKS", "32"))
+    # Detect a realtime session's language once, from its first chunk with this much speech, then reuse it
+    REALTIME_LANGUAGE_PIN_ENABLED: bool = os.getenv("REALTIME_LANGUAGE_PIN_ENABLED", "True").lower() == "true"
+    REALTIME_LANGUAGE_PIN_MIN_SECONDS: float = float(os.getenv("REALTIME_LANGUAGE_PIN_MIN_SECONDS", "3"))
+    # Content-addressed cache of transcriptions (the disk tier is off unless a directory is set)
+    TRANSCRIPTION_CACHE_ENABLED: bool = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "True").lower() == "true"
+    TRANSCRIPTION_CACHE_MAX_ENTRIES: int = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "1024"))
+    TRANSCRIPTION_CACHE_MAX_BYTES: int = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    TRANSCRIPTION_CACHE_DIR: str = os.getenv("TRANSCRIPTION_CACHE_DIR", "")
+    TRANSCRIPTION_CACHE_DISK_MAX_BYTES: int = int(os.getenv("TRANSCRIPTION_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Streaming transcription (/voice-to-text-stream)
+    STREAM_PARTIAL_INTERVAL_MS: int = int(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "500"))
+    STREAM_ENDPOINT_SILENCE_MS: int = int(os.getenv("STREAM_ENDPOINT_SILENCE_MS", "600"))
+    STREAM_MIN_SPEECH_MS: int = int(os.getenv("STREAM_MIN_SPEECH_MS", "150"))
+    STREAM_MAX_SEGMENT_SECONDS: float = float(os.getenv("STREAM_MAX_SEGMENT_SECONDS", "20"))
+    STREAM_OVERLAP_SECONDS: float = float(os.getenv("STREAM_OVERLAP_SECONDS", "0.3"))
+    # Scale decoded uploads to a fixed peak before VAD and inference (helps quiet microphones)
+    AUDIO_PEAK_NORMALIZE: bool = os.getenv("AUDIO_PEAK_NORMALIZE", "False").lower() == "true"
+    # Longest an ffmpeg decode of one upload may run before it is killed
+    AUDIO_DECODE_TIMEOUT_SECONDS: float = float(os.getenv("AUDIO_DECODE_TIMEOUT_SECONDS", "30"))
+    # Energy voice activity detection
+    VAD_THRESHOLD_DB: float = float(os.getenv("VAD_THRESHOLD_DB", "-45"))
+    VAD_FRAME_MS: int = int(os.getenv("VAD_FRAME_MS", "30"))
+    # Silence trimming before Whisper inference
+    VAD_TRIM_ENABLED: bool = os.getenv("VAD_TRIM_ENABLED", "True").lower() == "true"
+    VAD_TRIM_PADDING_MS: int = int(os.getenv("VAD_TRIM_PADDING_MS", "200"))
+    VAD_MAX_SILENCE_MS: int = int(os.getenv("VAD_MAX_SILENCE_MS", "800"))
+    VAD_MIN_SPEECH_MS: int = int(os.getenv("VAD_MIN_SPEECH_MS", "100"))
+    VAD_NOISE_MARGIN_DB: float = float(os.getenv("VAD_NOISE_MARGIN_DB", "10"))
     ELEVENLABS_DEFAULT_VOICE: str = os.getenv("ELEVENLABS_DEFAULT_VOICE", "21m00Tcm4TlvDq8ikWAM")
     
+    # Drawing analysis cache
+    ANALYSIS_CACHE_ENABLED: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "True").lower() == "true"
+    ANALYSIS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+    ANALYSIS_CACHE_TTL_SECONDS: int = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "600"))
+    ANALYSIS_CACHE_MAX_BYTES: int = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    ANALYSIS_CACHE_HASH_SIZE: int = int(os.getenv("ANALYSIS_CACHE_HASH_SIZE", "16"))
+    ANALYSIS_CACHE_HAMMING_DISTANCE: int = int(os.getenv("ANALYSIS_CACHE_HAMMING_DISTANCE", "4"))
+
+    # Skip analyses when a session's canvas barely changed since the last one
+    CHANGE_DETECTION_ENABLED: bool = os.getenv("CHANGE_DETECTION_ENABLED", "True").lower() == "true"
+    CHANGE_DIFF_LONG_EDGE: int = int(os.getenv("CHANGE_DIFF_LONG_EDGE", "256"))
+    CHANGE_PIXEL_TOLERANCE: int = int(os.getenv("CHANGE_PIXEL_TOLERANCE", "24"))
+    CHANGE_MAX_CHANGED_FRACTION: float = float(os.getenv("CHANGE_MAX_CHANGED_FRACTION", "0.002"))
+    CHANGE_BLOCK_SIZE: int = int(os.getenv("CHANGE_BLOCK_SIZE", "16"))
+    CHANGE_MAX_BLOCK_CHANGE: float = float(os.getenv("CHANGE_MAX_BLOCK_CHANGE", "0.05"))
+    CHANGE_MAX_SESSIONS: int = int(os.getenv("CHANGE_MAX_SESSIONS", "1000"))
+    CHANGE_IDLE_TTL_SECONDS: int = int(os.getenv("CHANGE_IDLE_TTL_SECONDS", "3600"))
+    # Crop-to-changed-region analysis (mode=changes on /analyze-drawing-with-context)
+    CHANGE_REGION_PADDING: int = int(os.getenv("CHANGE_REGION_PADDING", "32"))
+    CHANGE_REGION_MIN_SIDE: int = int(os.getenv("CHANGE_REGION_MIN_SIDE", "128"))
+    CHANGE_REGION_MAX_AREA: float = float(os.getenv("CHANGE_REGION_MAX_AREA", "0.5"))
+    CHANGE_OVERVIEW_LONG_EDGE: int = int(os.getenv("CHANGE_OVERVIEW_LONG_EDGE", "256"))
+
+    # Canvas preprocessing before Gemini upload
+    IMAGE_PREPROCESS_ENABLED: bool = os.getenv("IMAGE_PREPROCESS_ENABLED", "True").lower() == "true"
+    IMAGE_PREPROCESS_WORKERS: int = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))
+    IMAGE_AUTOCROP: bool = os.getenv("IMAGE_AUTOCROP", "True").lower() == "true"
+    IMAGE_CROP_PADDING: int = int(os.getenv("IMAGE_CROP_PADDING", "16"))
+    IMAGE_BACKGROUND_TOLERANCE: int = int(os.getenv("IMAGE_BACKGROUND_TOLERANCE", "12"))
+    IMAGE_TARGET_LONG_EDGE: int = int(os.getenv("IMAGE_TARGET_LONG_EDGE", "1024"))
+    IMAGE_QUANTIZE_COLORS: int = int(os.getenv("IMAGE_QUANTIZE_COLORS", "16"))
+    IMAGE_OUTPUT_FORMATS: List[str] = [
+        f.strip().lower() for f in os.getenv("IMAGE_OUTPUT_FORMATS", "png,webp,jpeg").split(",") if f.strip()
+    ]
+    IMAGE_JPEG_QUALITY: int = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+    # Gemini concurrency / admission control
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "64"))
+    GEMINI_MAX_QUEUE: int = int(os.getenv("GEMINI_MAX_QUEUE", "256"))
+    GEMINI_RETRY_AFTER_SECONDS: int = int(os.getenv("GEMINI_RETRY_AFTER_SECONDS", "1"))
+
+    # Upstream resilience: per-attempt timeout, overall deadline, retries, hedging, circuit breaker
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+    GEMINI_DEADLINE_SECONDS: float = float(os.getenv("GEMINI_DEADLINE_SECONDS", "60"))
+    GEMINI_MAX_ATTEMPTS: int = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+    GEMINI_HEDGE_AFTER_SECONDS: float = float(os.getenv("GEMINI_HEDGE_AFTER_SECONDS", "0"))
+    ELEVENLABS_TIMEOUT_SECONDS: float = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", "20"))
+    ELEVENLABS_DEADLINE_SECONDS: float = float(os.getenv("ELEVENLABS_DEADLINE_SECONDS", "45"))
+    ELEVENLABS_MAX_ATTEMPTS: int = int(os.getenv("ELEVENLABS_MAX_ATTEMPTS", "3"))
+    ELEVENLABS_HEDGE_AFTER_SECONDS: float = float(os.getenv("ELEVENLABS_HEDGE_AFTER_SECONDS", "0"))
+    RETRY_BACKOFF_BASE_SECONDS: float = float(os.getenv("RETRY_BACKOFF_BASE_SECONDS", "0.25"))
+    RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "4"))
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+    # Server-side canvas sync over WebSocket
+    CANVAS_SYNC_MAX_SESSIONS: int = int(os.getenv("CANVAS_SYNC_MAX_SESSIONS", "200"))
+    CANVAS_SYNC_IDLE_TTL_SECONDS: int = int(os.getenv("CANVAS_SYNC_IDLE_TTL_SECONDS", "1800"))
+    CANVAS_SYNC_MAX_DIMENSION: int = int(os.getenv("CANVAS_SYNC_MAX_DIMENSION", "4096"))
+
+    # Server-side conversation history
+    CONVERSATION_TOKEN_BUDGET: int = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000"))
+    CONVERSATION_SUMMARY_TOKENS: int = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "400"))
+    CONVERSATION_MIN_RECENT_TURNS: int = int(os.getenv("CONVERSATION_MIN_RECENT_TURNS", "4"))
+    CONVERSATION_MAX_SESSIONS: int = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+    CONVERSATION_IDLE_TTL_SECONDS: int = int(os.getenv("CONVERSATION_IDLE_TTL_SECONDS", "3600"))
+
+    # Batch drawing analysis
+    BATCH_MAX_IMAGES: int = int(os.getenv("BATCH_MAX_IMAGES", "50"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+    # Model backends ("gemini" / "whisper" / "elevenlabs", or "stub" for offline load tests)
+    VISION_BACKEND: str = os.getenv("VISION_BACKEND", "gemini")
+    TRANSCRIPTION_BACKEND: str = os.getenv("TRANSCRIPTION_BACKEND", "whisper")
+    SPEECH_BACKEND: str = os.getenv("SPEECH_BACKEND", "elevenlabs")
+
+    # Stub backend latency distributions: fixed:MS, uniform:LOW_MS:HIGH_MS,
+    # normal:MEAN_MS:STD_MS or lognormal:MEDIAN_MS:SIGMA
+    STUB_VISION_LATENCY: str = os.getenv("STUB_VISION_LATENCY", "lognormal:1200:0.4")
+    STUB_TRANSCRIPTION_LATENCY: str = os.getenv("STUB_TRANSCRIPTION_LATENCY", "lognormal:400:0.3")
+    STUB_SPEECH_LATENCY: str = os.getenv("STUB_SPEECH_LATENCY", "lognormal:600:0.3")
+    STUB_SEED: int = int(os.getenv("STUB_SEED", "0"))
+    STUB_FAILURE_RATE: float = float(os.getenv("STUB_FAILURE_RATE", "0"))
+
     # File upload limits
     MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB", "50"))
     MAX_AUDIO_DURATION_SECONDS: int = int(os.getenv("MAX_AUDIO_DURATION_SECONDS", "300"))
@@ -50,9 +187,9 @@ class Settings:
         """Validate that all required API keys are present"""
         missing_keys = []
         
-        if not cls.GOOGLE_API_KEY:
+        if cls.VISION_BACKEND == "gemini" and not cls.GOOGLE_API_KEY:
             missing_keys.append("GOOGLE_API_KEY")
-        if not cls.ELEVENLABS_API_KEY:
+        if cls.SPEECH_BACKEND == "elevenlabs" and not cls.ELEVENLABS_API_KEY:
             missing_keys.append("ELEVENLABS_API_KEY")
         if not cls.SUPABASE_URL:
             missing_keys.append("SUPABASE_URL")
@@ -61,6 +198,22 @@ class Settings:
             
         return missing_keys
     
+    @classmethod
+    def validate(cls) -> None:
+        """Reject settings that cannot be used as configured
+
+        Raises:
+            ValueError: If a setting has an unsupported value
+        """
+        unknown = [f for f in cls.IMAGE_OUTPUT_FORMATS if f not in IMAGE_FORMATS]
+        if unknown:
+            raise ValueError(
+                f"IMAGE_OUTPUT_FORMATS has unsupported formats {', '.join(unknown)}; "
+                f"use any of {', '.join(IMAGE_FORMATS)}"
+            )
+        if not cls.IMAGE_OUTPUT_FORMATS:
+            raise ValueError(f"IMAGE_OUTPUT_FORMATS is empty; use any of {', '.join(IMAGE_FORMATS)}")
+    
     @classmethod
     def get_database_config(cls) -> dict:
         """Get database configuration for Supabase"""
@@ -1,19 +1,55 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+from config import settings
 from routes import drawing, voice_to_text, text_to_speech
 from websocket import ConnectionManager
+from middleware import CancelOnDisconnectMiddleware
+from utils.canvas_store import CanvasSyncError
+from utils.readiness import Readiness
 
 # Load environment variables
 load_dotenv()
 
+# Fail at startup rather than on the first request that needs a bad setting
+settings.validate()
+
+# Warmup state and health reported by /ready
+readiness = Readiness({"transcription": voice_to_text.transcriber.health_error})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up models and upstream connections in the background; release them at shutdown"""
+    warmup = asyncio.create_task(readiness.run(
+        [
+            # The app cannot serve transcriptions without its models
+            ("transcription", voice_to_text.transcriber.warmup, True),
+            # Upstream APIs may be briefly unreachable; they are retried per request
+            ("vision", drawing.vision_backend.warmup, False),
+            ("speech", text_to_speech.tts_engine.warmup, False),
+        ],
+        timeout=settings.WARMUP_TIMEOUT_SECONDS
+    ))
+    yield
+    warmup.cancel()
+    await asyncio.gather(
+        voice_to_text.transcriber.close(),
+        drawing.vision_backend.close(),
+        text_to_speech.tts_engine.close(),
+        return_exceptions=True
+    )
+
 app = FastAPI(
     title="AI Canvas Backend",
     description="Backend for AI Canvas - an AI-powered interactive drawing platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -27,6 +63,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stop working on (and paying for) requests whose client has gone away
+app.add_middleware(CancelOnDisconnectMiddleware)
+
 # Include route modules
 app.include_router(drawing.router, prefix="/api", tags=["drawing"])
 app.include_router(voice_to_text.router, prefix="/api", tags=["voice"])
@@ -43,21 +82,100 @@ async def root():
         "endpoints": {
             "analyze_drawing": "/api/analyze-drawing",
             "analyze_with_context": "/api/analyze-drawing-with-context", 
+            "analyze_drawings_batch": "/api/analyze-drawings/batch",
             "text_chat": "/api/text-chat",
+            "analyze_drawing_stream": "/api/analyze-drawing/stream",
+            "analyze_with_context_stream": "/api/analyze-drawing-with-context/stream",
+            "text_chat_stream": "/api/text-chat/stream",
             "voice_to_text": "/api/voice-to-text",
             "text_to_speech": "/api/text-to-speech",
-            "websocket": "/ws"
+            "websocket": "/ws",
+            "metrics": "/metrics",
+            "ready": "/ready"
         }
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until models are loaded and warmed up, and again if a model backend fails"""
+    state = readiness.stats()
+    return JSONResponse(content=state, status_code=200 if state["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for caches and upstream model usage"""
+    return {
+        "analysis_cache": drawing.analysis_cache.stats(),
+        "change_detection": drawing.change_detector.stats(),
+        "canvas_preprocessing": drawing.canvas_preprocessor.stats(),
+        "canvas_sync": drawing.canvas_store.stats(),
+        "conversations": drawing.conversation_store.stats(),
+        "vision_backend": drawing.vision_backend.stats(),
+        "transcription_backend": voice_to_text.transcriber.stats(),
+        "transcription_streams": voice_to_text.stream_stats.stats(),
+        "speech_backend": text_to_speech.tts_engine.stats()
+    }
+
+async def handle_canvas_init(message: dict, websocket: WebSocket):
+    """Handle a canvas_init message: {"session_id", "canvas_token"? (to reset), "data": {"width", "height", "background"?, "image"?}}"""
+    session_id = message.get("session_id")
+    data = message.get("data") or {}
+    try:
+        if not session_id:
+            raise CanvasSyncError("session_id is required")
+        if not isinstance(data, dict):
+            raise CanvasSyncError("data must be an object")
+        ack = await drawing.canvas_preprocessor.run(
+            drawing.canvas_store.init_session,
+            session_id,
+            data.get("width", 0),
+            data.get("height", 0),
+            data.get("background", "#ffffff"),
+            data.get("image"),
+            message.get("canvas_token")
+        )
+        await manager.send_personal_message({"type": "canvas_ack", "session_id": session_id, "status": "ok", **ack}, websocket)
+    except Exception as e:
+        await manager.send_personal_message({"type": "canvas_error", "session_id": session_id, "error": str(e)}, websocket)
+
+async def handle_canvas_patches(message: dict, websocket: WebSocket):
+    """Handle a drawing_update message: {"session_id", "canvas_token", "data": {"seq", "patches": [{"x", "y", "encoding", "data", ...}]}}"""
+    session_id = message.get("session_id")
+    data = message.get("data") or {}
+    try:
+        if not session_id:
+            raise CanvasSyncError("session_id is required")
+        if not isinstance(data, dict):
+            raise CanvasSyncError("data must be an object")
+        result = await drawing.canvas_preprocessor.run(
+            drawing.canvas_store.apply_patches,
+            session_id,
+            message.get("canvas_token"),
+            int(data.get("seq", 0)),
+            data.get("patches", [])
+        )
+        response_type = "canvas_resync" if result["status"] == "resync" else "canvas_ack"
+        await manager.send_personal_message({"type": response_type, "session_id": session_id, **result}, websocket)
+    except Exception as e:
+        await manager.send_personal_message({"type": "canvas_error", "session_id": session_id, "error": str(e)}, websocket)
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_json()
+            if not isinstance(data, dict):
+                await manager.send_personal_message({"error": "Messages must be JSON objects"}, websocket)
+                continue
             # Handle different types of WebSocket messages
-            if data.get("type") == "drawing_update":
+            if data.get("type") == "canvas_init":
+                # Create / reset the authoritative server-side canvas for a session
+                await handle_canvas_init(data, websocket)
+            elif data.get("type") == "drawing_update" and isinstance(data.get("data"), dict) and "patches" in data["data"]:
+                # Apply dirty-rect patches to the session's server-side canvas
+                await handle_canvas_patches(data, websocket)
+            elif data.get("type") == "drawing_update":
                 # Process drawing updates
                 await manager.broadcast({"type": "drawing_response", "data": "Drawing received"})
             elif data.get("type") == "voice_message":
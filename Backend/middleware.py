@@ -0,0 +1,61 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CancelOnDisconnectMiddleware:
+    """
+    ASGI middleware that cancels a request's handler when the client disconnects
+
+    Without it, a handler keeps awaiting its model call after the client has
+    gone away. Cancelling the handler propagates into the upstream call (an
+    async Gemini RPC is cancelled; a coalesced call only once no caller is
+    left waiting for it).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # The watcher below owns the real receive channel and forwards every
+        # message to the handler, so it sees http.disconnect as soon as it arrives
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+        disconnected = False
+
+        async def send_wrapper(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+
+        async def watch():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    # After the response, disconnect is normal (background tasks may still run)
+                    if not response_complete and not handler.done():
+                        disconnected = True
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            logger.info(f"Client disconnected, cancelled {scope['method']} {scope['path']}")
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
@@ -1,112 +1,512 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
-from utils.gemini import GeminiVisionAnalyzer
+from fastapi.responses import JSONResponse, StreamingResponse
+from utils.backends import create_vision_backend, EmptyResponseError
+from utils.executor import ExecutorSaturatedError
+from utils.image_cache import AnalysisCache
+from utils.image_preprocessing import CanvasPreprocessor
+from utils.canvas_store import CanvasStore
+from utils.change_detection import ChangeDetector, region_box
+from utils.conversation import ConversationStore
 from PIL import Image
-import io
+from config import settings
+from typing import AsyncGenerator, Callable, Dict, Any, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize Gemini Vision analyzer
-gemini_analyzer = GeminiVisionAnalyzer()
+# Initialize the drawing analysis backend selected by VISION_BACKEND
+vision_backend = create_vision_backend()
+
+# Cache of analyses for repeated / near-identical canvas submissions
+analysis_cache = AnalysisCache(
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    max_bytes=settings.ANALYSIS_CACHE_MAX_BYTES,
+    hash_size=settings.ANALYSIS_CACHE_HASH_SIZE,
+    max_hamming_distance=settings.ANALYSIS_CACHE_HAMMING_DISTANCE,
+    enabled=settings.ANALYSIS_CACHE_ENABLED
+)
+
+# Crops / downscales / re-encodes canvases off the event loop before upload
+canvas_preprocessor = CanvasPreprocessor(
+    enabled=settings.IMAGE_PREPROCESS_ENABLED,
+    max_workers=settings.IMAGE_PREPROCESS_WORKERS,
+    autocrop=settings.IMAGE_AUTOCROP,
+    crop_padding=settings.IMAGE_CROP_PADDING,
+    background_tolerance=settings.IMAGE_BACKGROUND_TOLERANCE,
+    target_long_edge=settings.IMAGE_TARGET_LONG_EDGE,
+    quantize_colors=settings.IMAGE_QUANTIZE_COLORS,
+    output_formats=settings.IMAGE_OUTPUT_FORMATS,
+    jpeg_quality=settings.IMAGE_JPEG_QUALITY
+)
+
+# Server-side canvases kept in sync over the /ws WebSocket (dirty-rect patches)
+canvas_store = CanvasStore(
+    max_sessions=settings.CANVAS_SYNC_MAX_SESSIONS,
+    idle_ttl_seconds=settings.CANVAS_SYNC_IDLE_TTL_SECONDS,
+    max_dimension=settings.CANVAS_SYNC_MAX_DIMENSION
+)
+
+# Last analyzed frame per session, to skip analyses of (almost) unchanged canvases
+change_detector = ChangeDetector(
+    enabled=settings.CHANGE_DETECTION_ENABLED,
+    diff_long_edge=settings.CHANGE_DIFF_LONG_EDGE,
+    pixel_tolerance=settings.CHANGE_PIXEL_TOLERANCE,
+    max_changed_fraction=settings.CHANGE_MAX_CHANGED_FRACTION,
+    block_size=settings.CHANGE_BLOCK_SIZE,
+    max_block_change=settings.CHANGE_MAX_BLOCK_CHANGE,
+    max_sessions=settings.CHANGE_MAX_SESSIONS,
+    idle_ttl_seconds=settings.CHANGE_IDLE_TTL_SECONDS
+)
+
+# Per-session conversation history, compacted into a rolling summary to stay within budget
+conversation_store = ConversationStore(
+    summarizer=vision_backend.summarize_conversation,
+    token_budget=settings.CONVERSATION_TOKEN_BUDGET,
+    summary_tokens=settings.CONVERSATION_SUMMARY_TOKENS,
+    min_recent_turns=settings.CONVERSATION_MIN_RECENT_TURNS,
+    max_sessions=settings.CONVERSATION_MAX_SESSIONS,
+    idle_ttl_seconds=settings.CONVERSATION_IDLE_TTL_SECONDS
+)
+
+async def _conversation_context(
+    session_id: Optional[str],
+    conversation_history: str
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Resolve the conversation history to put in the prompt
+    
+    With a session_id the server-side history is used; a client-sent history
+    only seeds a session the server does not know yet. Without a session_id
+    the client-sent history is used as is.
+    
+    Args:
+        session_id: Conversation / drawing session identifier
+        conversation_history: History sent by the client
+        
+    Returns:
+        Tuple of (history text, conversation info for the response or None)
+    """
+    if not session_id:
+        return conversation_history, None
+    
+    if conversation_history and not conversation_store.has_history(session_id):
+        conversation_store.add_turn(session_id, "Earlier conversation", conversation_history)
+    
+    rendered = await conversation_store.render_history(session_id)
+    return rendered["history"], {
+        "session_id": session_id,
+        "history_tokens": rendered["history_tokens"],
+        "turns": rendered["turns"],
+        "summarized_turns": rendered["summarized_turns"]
+    }
+
+async def _read_canvas(
+    image: Optional[UploadFile],
+    session_id: Optional[str]
+) -> Tuple[Image.Image, int, Optional[str]]:
+    """
+    Get the canvas to analyze from an upload, or from the session's synced canvas
+    
+    Args:
+        image: Uploaded canvas screenshot, if any
+        session_id: Session whose server-side canvas is used when nothing was uploaded
+        
+    Returns:
+        Tuple of (decoded RGB image, source size in bytes, filename)
+    """
+    if image is not None:
+        if not image.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        
+        # Read and decode the image (RGB) off the event loop
+        contents = await image.read()
+        pil_image = await canvas_preprocessor.run(canvas_preprocessor.decode, contents)
+        return pil_image, len(contents), image.filename
+    
+    if session_id:
+        pil_image = await canvas_preprocessor.run(canvas_store.snapshot, session_id)
+        if pil_image is None:
+            raise HTTPException(status_code=404, detail="No synced canvas for this session")
+        return pil_image, pil_image.width * pil_image.height * 3, None
+    
+    raise HTTPException(status_code=400, detail="Provide an image or the session_id of a synced canvas")
+
+async def _check_change(
+    session_id: Optional[str],
+    pil_image: Image.Image,
+    prompt: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Diff a session's canvas against its last analyzed frame (off the event loop)
+    
+    Returns:
+        Result of ChangeDetector.check, or None without a session_id
+    """
+    if not session_id:
+        return None
+    return await canvas_preprocessor.run(change_detector.check, session_id, pil_image, prompt)
+
+def _change_info(change: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Change-detection fields reported to the client"""
+    if change is None:
+        return None
+    return {
+        "changed": change["changed"],
+        "changed_fraction": change["changed_fraction"],
+        "max_block_change": change["max_block_change"]
+    }
+
+def _overloaded(error: ExecutorSaturatedError) -> HTTPException:
+    """Build a 503 response telling the client when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+DEFAULT_ANALYSIS_PROMPT = "Describe what you see in this drawing. Be creative and engaging in your response."
+
+def _build_context_prompt(conversation_history: str, user_question: str) -> str:
+    """Prompt for analyzing a drawing as part of an ongoing conversation"""
+    return f"""
+        Previous conversation: {conversation_history}
+        
+        Current user question: {user_question}
+        
+        Please analyze this drawing and respond to the user's question while considering our previous conversation.
+        Be conversational, helpful, and engaging.
+        """
+
+def _build_region_prompt(
+    conversation_history: str,
+    user_question: str,
+    box: Tuple[int, int, int, int],
+    canvas_size: Tuple[int, int]
+) -> str:
+    """Prompt for analyzing a close-up of the changed region plus an overview of the canvas"""
+    left, upper, right, lower = box
+    width, height = canvas_size
+    return f"""
+        Previous conversation: {conversation_history}
+        
+        Current user question: {user_question}
+        
+        The user just changed part of their drawing. The first image is a close-up of the changed
+        region (x {left}-{right}, y {upper}-{lower} of a {width}x{height} canvas). The second image
+        is a small overview of the whole canvas, for context only.
+        
+        Focus on what was added or changed in the close-up and how it fits the rest of the drawing,
+        answer the user's question, and consider our previous conversation.
+        Be conversational, helpful, and engaging.
+        """
+
+def _prepare_region(
+    pil_image: Image.Image,
+    box: Tuple[int, int, int, int],
+    source_bytes: int
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Encode a full-resolution close-up of box and a small overview of the canvas
+    
+    Blocking; run it on the preprocessing pool. Neither image is a shrunk copy of
+    the upload, so the report has no bytes_saved and the preprocessor's byte
+    counters leave them out.
+    
+    Returns:
+        Tuple of ([close-up part, overview part], preprocessing report)
+    """
+    overview = pil_image.copy()
+    overview.thumbnail(
+        (settings.CHANGE_OVERVIEW_LONG_EDGE, settings.CHANGE_OVERVIEW_LONG_EDGE),
+        Image.Resampling.LANCZOS
+    )
+    region_part, region_report = canvas_preprocessor.prepare(pil_image.crop(box), None, autocrop=False)
+    overview_part, overview_report = canvas_preprocessor.prepare(overview, None, autocrop=False)
+    
+    report: Dict[str, Any] = {
+        "mode": "changes",
+        "region": list(box),
+        "region_size": region_report.get("output_size"),
+        "overview_size": overview_report.get("output_size"),
+        "original_bytes": source_bytes
+    }
+    if region_report.get("enabled"):
+        report["output_bytes"] = region_report["output_bytes"] + overview_report["output_bytes"]
+    return [region_part, overview_part], report
+
+async def _context_images(
+    pil_image: Image.Image,
+    source_bytes: int,
+    session_id: Optional[str],
+    mode: str,
+    history: str,
+    user_question: str
+) -> Tuple[Any, str, Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Choose what to send for a contextual analysis
+    
+    In "changes" mode, when the session has a previous frame and the change
+    covers a small enough part of the canvas, only a close-up of the changed
+    region and a small overview are sent. Otherwise the whole canvas is sent.
+    
+    Returns:
+        Tuple of (image input, prompt, preprocessing report, change check result or None)
+    """
+    if mode not in ("full", "changes"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'changes'")
+    
+    change = await _check_change(session_id, pil_image, None)
+    
+    if mode == "changes" and change is not None and change["bbox"] is not None:
+        box = region_box(
+            change["bbox"],
+            pil_image.size,
+            padding=settings.CHANGE_REGION_PADDING,
+            min_side=settings.CHANGE_REGION_MIN_SIDE
+        )
+        area = (box[2] - box[0]) * (box[3] - box[1]) / (pil_image.width * pil_image.height)
+        if area <= settings.CHANGE_REGION_MAX_AREA:
+            parts, preprocessing = await canvas_preprocessor.run(_prepare_region, pil_image, box, source_bytes)
+            prompt = _build_region_prompt(history, user_question, box, pil_image.size)
+            return parts, prompt, preprocessing, change
+    
+    image_part, preprocessing = await canvas_preprocessor.run(
+        canvas_preprocessor.prepare, pil_image, source_bytes
+    )
+    return image_part, _build_context_prompt(history, user_question), {"mode": "full", **preprocessing}, change
+
+def _build_chat_prompt(message: str, conversation_history: str) -> str:
+    """Prompt for a text-only conversation turn"""
+    return f"""
+        You are an AI art assistant helping users with their creative projects.
+        
+        Previous conversation: {conversation_history}
+        
+        Current user message: {message}
+        
+        Please respond in a helpful, encouraging, and creative way. If the user asks about 
+        drawing or art techniques, provide specific advice. If they ask general questions, 
+        relate your response back to art and creativity when possible.
+        """
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _sse_response(
+    chunks: AsyncGenerator[str, None],
+    done_info: Dict[str, Any],
+    on_complete: Optional[Callable[[str], None]] = None,
+    empty_message: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Forward generated text chunks to the client as server-sent events
+    
+    The first chunk is awaited before the response starts, so admission and
+    upstream errors still surface as proper HTTP status codes. Afterwards the
+    client receives one `token` event per chunk and a final `done` event with
+    the full text; failures mid-stream are reported as an `error` event.
+    
+    Args:
+        chunks: Async generator of text chunks
+        done_info: Extra fields included in the `done` event
+        on_complete: Called with the full text once the stream finished successfully
+        empty_message: Text sent instead when Gemini returns no content
+        
+    Returns:
+        Streaming response with media type text/event-stream
+    """
+    started_at = time.perf_counter()
+    fallback = False
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = ""
+    except EmptyResponseError as e:
+        first_chunk = empty_message or vision_backend.describe_analysis_error(e)
+        fallback = True
+    time_to_first_token_ms = int((time.perf_counter() - started_at) * 1000)
+    
+    async def events():
+        parts = [first_chunk]
+        try:
+            yield _sse_event("token", {"text": first_chunk})
+            if not fallback:
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield _sse_event("token", {"text": chunk})
+            
+            text = "".join(parts)
+            if on_complete is not None and not fallback:
+                on_complete(text)
+            
+            yield _sse_event("done", {
+                "success": True,
+                "analysis": text,
+                "time_to_first_token_ms": time_to_first_token_ms,
+                "processing_time_ms": int((time.perf_counter() - started_at) * 1000),
+                **done_info
+            })
+        except Exception as e:
+            logger.error(f"Error while streaming analysis: {e}")
+            yield _sse_event("error", {"success": False, "error": str(e)})
+        finally:
+            await chunks.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _single_chunk(text: str) -> AsyncGenerator[str, None]:
+    """Wrap an already available text (e.g. a cache hit) as a one-chunk stream"""
+    yield text
 
 @router.post("/analyze-drawing")
 async def analyze_drawing(
-    image: UploadFile = File(...),
-    prompt: str = "Describe what you see in this drawing. Be creative and engaging in your response."
+    image: Optional[UploadFile] = File(None),
+    prompt: str = DEFAULT_ANALYSIS_PROMPT,
+    session_id: Optional[str] = None
 ):
     """
     Analyze a drawing using Gemini Vision API
     
     Args:
-        image: Canvas screenshot as image file
+        image: Canvas screenshot as image file (optional when session_id has a synced canvas)
         prompt: Optional custom prompt for the AI analysis
+        session_id: Session whose canvas, synced over /ws, is analyzed if no image is uploaded
         
     Returns:
         JSON response with AI analysis of the drawing
     """
     try:
-        # Validate file type
-        if not image.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        # Read and process the image
-        contents = await image.read()
-        pil_image = Image.open(io.BytesIO(contents))
+        pil_image, source_bytes, filename = await _read_canvas(image, session_id)
         
-        # Convert to RGB if necessary
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
+        # Reuse the session's previous analysis when only a few pixels changed
+        change = await _check_change(session_id, pil_image, prompt)
+        reused = change is not None and change["analysis"] is not None
+        cached = None
+        preprocessing = None
         
-        # Analyze the drawing with Gemini
-        analysis = await gemini_analyzer.analyze_image(pil_image, prompt)
+        if reused:
+            analysis = change["analysis"]
+        else:
+            # Serve repeat submissions of the same (or a near-identical) canvas from cache
+            image_hash = await canvas_preprocessor.run(analysis_cache.image_hash, pil_image)
+            cached = analysis_cache.get(image_hash, prompt)
+            
+            if cached is not None:
+                analysis = cached["analysis"]
+            else:
+                image_part, preprocessing = await canvas_preprocessor.run(
+                    canvas_preprocessor.prepare, pil_image, source_bytes
+                )
+                
+                # Analyze the drawing with Gemini; only real analyses are cached
+                try:
+                    analysis = await vision_backend.generate_image_analysis(image_part, prompt)
+                    analysis_cache.put(image_hash, prompt, analysis)
+                except ExecutorSaturatedError:
+                    raise
+                except Exception as e:
+                    analysis = vision_backend.describe_analysis_error(e)
+                    change = None
+            
+            if change is not None:
+                change_detector.remember(session_id, change["frame"], prompt, analysis)
         
         return JSONResponse(content={
             "success": True,
             "analysis": analysis,
             "prompt_used": prompt,
+            "cached": cached is not None,
+            "reused": reused,
+            "change": _change_info(change),
             "image_info": {
-                "filename": image.filename,
+                "filename": filename,
+                "source": "upload" if image is not None else "session",
                 "size": f"{pil_image.width}x{pil_image.height}",
-                "format": pil_image.format
+                "format": pil_image.format,
+                "preprocessing": preprocessing
             }
         })
         
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing drawing: {str(e)}")
 
 @router.post("/analyze-drawing-with-context")
 async def analyze_drawing_with_context(
-    image: UploadFile = File(...),
+    image: Optional[UploadFile] = File(None),
     conversation_history: str = "",
-    user_question: str = ""
+    user_question: str = "",
+    session_id: Optional[str] = None,
+    mode: str = "full"
 ):
     """
     Analyze a drawing with conversation context
     
     Args:
-        image: Canvas screenshot as image file
+        image: Canvas screenshot as image file (optional when session_id has a synced canvas)
         conversation_history: Previous conversation context
         user_question: Specific question about the drawing
+        session_id: Session whose canvas, synced over /ws, is analyzed if no image is uploaded
+        mode: "full" sends the whole canvas; "changes" sends a close-up of what changed
+              since the session's previous analysis plus a small overview
         
     Returns:
         JSON response with contextual AI analysis
     """
     try:
-        if not image.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        contents = await image.read()
-        pil_image = Image.open(io.BytesIO(contents))
-        
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
+        pil_image, source_bytes, filename = await _read_canvas(image, session_id)
         
-        # Create contextual prompt
-        context_prompt = f"""
-        Previous conversation: {conversation_history}
-        
-        Current user question: {user_question}
-        
-        Please analyze this drawing and respond to the user's question while considering our previous conversation.
-        Be conversational, helpful, and engaging.
-        """
+        # Create contextual prompt (and, in "changes" mode, crop to what changed)
+        history, conversation = await _conversation_context(session_id, conversation_history)
+        image_input, context_prompt, preprocessing, change = await _context_images(
+            pil_image, source_bytes, session_id, mode, history, user_question
+        )
         
-        analysis = await gemini_analyzer.analyze_image(pil_image, context_prompt)
+        try:
+            analysis = await vision_backend.generate_image_analysis(image_input, context_prompt)
+            if session_id:
+                conversation_store.add_exchange(session_id, user_question, analysis)
+                change_detector.remember(session_id, change["frame"], context_prompt, analysis)
+        except ExecutorSaturatedError:
+            raise
+        except Exception as e:
+            analysis = vision_backend.describe_analysis_error(e)
         
         return JSONResponse(content={
             "success": True,
             "analysis": analysis,
-            "context_used": bool(conversation_history),
-            "user_question": user_question
+            "context_used": bool(history),
+            "user_question": user_question,
+            "conversation": conversation,
+            "preprocessing": preprocessing
         })
         
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing drawing with context: {str(e)}")
 
 @router.post("/text-chat")
 async def text_chat(
     message: str = Form(...),
-    conversation_history: str = Form(default="")
+    conversation_history: str = Form(default=""),
+    session_id: str = Form(default="")
 ):
     """
     Chat with AI using text only (no image required)
@@ -114,33 +514,302 @@ async def text_chat(
     Args:
         message: User's text message
         conversation_history: Previous conversation context
+        session_id: Session whose server-side history is used instead of conversation_history
         
     Returns:
         JSON response with AI text response
     """
     try:
         # Create contextual prompt for text-only conversation
-        context_prompt = f"""
-        You are an AI art assistant helping users with their creative projects.
-        
-        Previous conversation: {conversation_history}
-        
-        Current user message: {message}
-        
-        Please respond in a helpful, encouraging, and creative way. If the user asks about 
-        drawing or art techniques, provide specific advice. If they ask general questions, 
-        relate your response back to art and creativity when possible.
-        """
+        history, conversation = await _conversation_context(session_id, conversation_history)
+        context_prompt = _build_chat_prompt(message, history)
         
         # Use text-only analysis
-        response_text = await gemini_analyzer.analyze_text_only(context_prompt)
+        try:
+            response_text = await vision_backend.generate_text(context_prompt)
+            if session_id:
+                conversation_store.add_exchange(session_id, message, response_text)
+        except ExecutorSaturatedError:
+            raise
+        except Exception as e:
+            response_text = vision_backend.describe_text_error(e)
         
         return JSONResponse(content={
             "success": True,
             "analysis": response_text,
             "message_processed": message,
-            "context_used": bool(conversation_history)
+            "context_used": bool(history),
+            "conversation": conversation
         })
         
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in text chat: {str(e)}") 
+
+@router.post("/analyze-drawing/stream")
+async def analyze_drawing_stream(
+    image: Optional[UploadFile] = File(None),
+    prompt: str = DEFAULT_ANALYSIS_PROMPT,
+    session_id: Optional[str] = None
+):
+    """
+    Analyze a drawing using Gemini Vision API, streaming the response
+    
+    Args:
+        image: Canvas screenshot as image file (optional when session_id has a synced canvas)
+        prompt: Optional custom prompt for the AI analysis
+        session_id: Session whose canvas, synced over /ws, is analyzed if no image is uploaded
+        
+    Returns:
+        Server-sent events: `token` per text chunk, then `done` (or `error`)
+    """
+    try:
+        pil_image, source_bytes, filename = await _read_canvas(image, session_id)
+        
+        change = await _check_change(session_id, pil_image, prompt)
+        if change is not None and change["analysis"] is not None:
+            return await _sse_response(
+                _single_chunk(change["analysis"]),
+                {"prompt_used": prompt, "cached": False, "reused": True, "change": _change_info(change)}
+            )
+        
+        def remember(text: str):
+            if change is not None:
+                change_detector.remember(session_id, change["frame"], prompt, text)
+        
+        image_hash = await canvas_preprocessor.run(analysis_cache.image_hash, pil_image)
+        cached = analysis_cache.get(image_hash, prompt)
+        
+        if cached is not None:
+            remember(cached["analysis"])
+            return await _sse_response(
+                _single_chunk(cached["analysis"]),
+                {"prompt_used": prompt, "cached": True, "reused": False, "change": _change_info(change)}
+            )
+        
+        image_part, preprocessing = await canvas_preprocessor.run(
+            canvas_preprocessor.prepare, pil_image, source_bytes
+        )
+        
+        def on_complete(text: str):
+            analysis_cache.put(image_hash, prompt, text)
+            remember(text)
+        
+        return await _sse_response(
+            vision_backend.stream_image_analysis(image_part, prompt),
+            {
+                "prompt_used": prompt,
+                "cached": False,
+                "reused": False,
+                "change": _change_info(change),
+                "preprocessing": preprocessing
+            },
+            on_complete=on_complete
+        )
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing drawing: {str(e)}")
+
+@router.post("/analyze-drawing-with-context/stream")
+async def analyze_drawing_with_context_stream(
+    image: Optional[UploadFile] = File(None),
+    conversation_history: str = "",
+    user_question: str = "",
+    session_id: Optional[str] = None,
+    mode: str = "full"
+):
+    """
+    Analyze a drawing with conversation context, streaming the response
+    
+    Args:
+        image: Canvas screenshot as image file (optional when session_id has a synced canvas)
+        conversation_history: Previous conversation context
+        user_question: Specific question about the drawing
+        session_id: Session whose canvas, synced over /ws, is analyzed if no image is uploaded
+        mode: "full" or "changes" (see /analyze-drawing-with-context)
+        
+    Returns:
+        Server-sent events: `token` per text chunk, then `done` (or `error`)
+    """
+    try:
+        pil_image, source_bytes, filename = await _read_canvas(image, session_id)
+        
+        history, conversation = await _conversation_context(session_id, conversation_history)
+        image_input, context_prompt, preprocessing, change = await _context_images(
+            pil_image, source_bytes, session_id, mode, history, user_question
+        )
+        
+        def on_complete(text: str):
+            conversation_store.add_exchange(session_id, user_question, text)
+            change_detector.remember(session_id, change["frame"], context_prompt, text)
+        
+        return await _sse_response(
+            vision_backend.stream_image_analysis(image_input, context_prompt),
+            {
+                "context_used": bool(history),
+                "user_question": user_question,
+                "conversation": conversation,
+                "preprocessing": preprocessing
+            },
+            on_complete=on_complete if session_id else None
+        )
+        
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing drawing with context: {str(e)}")
+
+@router.post("/text-chat/stream")
+async def text_chat_stream(
+    message: str = Form(...),
+    conversation_history: str = Form(default=""),
+    session_id: str = Form(default="")
+):
+    """
+    Chat with AI using text only, streaming the response
+    
+    Args:
+        message: User's text message
+        conversation_history: Previous conversation context
+        session_id: Session whose server-side history is used instead of conversation_history
+        
+    Returns:
+        Server-sent events: `token` per text chunk, then `done` (or `error`)
+    """
+    try:
+        history, conversation = await _conversation_context(session_id, conversation_history)
+        context_prompt = _build_chat_prompt(message, history)
+        
+        return await _sse_response(
+            vision_backend.stream_text_only(context_prompt),
+            {"message_processed": message, "context_used": bool(history), "conversation": conversation},
+            on_complete=(
+                (lambda text: conversation_store.add_exchange(session_id, message, text))
+                if session_id else None
+            ),
+            empty_message="I'd be happy to help!"
+        )
+        
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error in text chat: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error in text chat: {str(e)}")
+
+async def _analyze_batch_item(
+    index: int,
+    image: UploadFile,
+    contents: bytes,
+    prompt: str,
+    model_slots: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """
+    Decode, preprocess and analyze one image of a batch
+    
+    Decoding and preprocessing of all items overlap on the preprocessing pool;
+    model calls are limited by model_slots.
+    
+    Returns:
+        NDJSON result record for the item
+    """
+    started_at = time.perf_counter()
+    result: Dict[str, Any] = {"type": "result", "index": index, "filename": image.filename}
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            raise ValueError("File must be an image")
+        
+        pil_image = await canvas_preprocessor.run(canvas_preprocessor.decode, contents)
+        image_hash = await canvas_preprocessor.run(analysis_cache.image_hash, pil_image)
+        cached = analysis_cache.get(image_hash, prompt)
+        
+        if cached is not None:
+            result.update(success=True, analysis=cached["analysis"], cached=True)
+        else:
+            image_part, preprocessing = await canvas_preprocessor.run(
+                canvas_preprocessor.prepare, pil_image, len(contents)
+            )
+            async with model_slots:
+                analysis = await vision_backend.generate_image_analysis(image_part, prompt)
+            analysis_cache.put(image_hash, prompt, analysis)
+            result.update(success=True, analysis=analysis, cached=False, bytes_saved=preprocessing.get("bytes_saved"))
+    
+    except ExecutorSaturatedError as e:
+        result.update(success=False, error=str(e), retry_after=e.retry_after)
+    except Exception as e:
+        logger.error(f"Batch item {index} failed: {e}")
+        result.update(success=False, error=str(e))
+    
+    result["processing_time_ms"] = int((time.perf_counter() - started_at) * 1000)
+    return result
+
+@router.post("/analyze-drawings/batch")
+async def analyze_drawings_batch(
+    images: List[UploadFile] = File(...),
+    prompt: str = DEFAULT_ANALYSIS_PROMPT
+):
+    """
+    Analyze many drawings at once (e.g. a whole class), streaming results as they complete
+    
+    Args:
+        images: Canvas screenshots as image files
+        prompt: Optional custom prompt used for every image
+        
+    Returns:
+        NDJSON stream: one `result` line per image in completion order
+        (with its `index` in the upload), then a final `summary` line
+    """
+    if len(images) > settings.BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"Too many images (max {settings.BATCH_MAX_IMAGES})")
+    
+    started_at = time.perf_counter()
+    
+    # Read uploads up front; they may be closed once the endpoint has returned
+    uploads = [(image, await image.read()) for image in images]
+    
+    model_slots = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_analyze_batch_item(index, image, contents, prompt, model_slots))
+        for index, (image, contents) in enumerate(uploads)
+    ]
+    
+    async def results():
+        succeeded = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                succeeded += result["success"]
+                yield json.dumps(result) + "\n"
+            
+            yield json.dumps({
+                "type": "summary",
+                "total": len(tasks),
+                "succeeded": succeeded,
+                "failed": len(tasks) - succeeded,
+                "processing_time_ms": int((time.perf_counter() - started_at) * 1000)
+            }) + "\n"
+        finally:
+            # Client went away: don't keep spending quota on the rest of the batch
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.delete("/conversations/{session_id}")
+async def clear_conversation(session_id: str):
+    """
+    Forget the server-side conversation history of a session
+    
+    Args:
+        session_id: Conversation / drawing session identifier
+        
+    Returns:
+        JSON response confirming the reset
+    """
+    conversation_store.clear(session_id)
+    return {"success": True, "session_id": session_id}
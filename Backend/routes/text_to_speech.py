@@ -1,14 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from utils.elevenlabs import ElevenLabsTTS
+from utils.backends import create_speech_backend
+from utils.resilience import CircuitOpenError, DeadlineExceededError
 import io
 from typing import Optional
 
 router = APIRouter()
 
-# Initialize ElevenLabs TTS
-tts_engine = ElevenLabsTTS()
+# Initialize the text-to-speech backend selected by SPEECH_BACKEND
+tts_engine = create_speech_backend()
 
 class TTSRequest(BaseModel):
     text: str
@@ -21,6 +22,14 @@ class TTSStreamRequest(BaseModel):
     voice_id: Optional[str] = "21m00Tcm4TlvDq8ikWAM"
     model_id: Optional[str] = "eleven_monolingual_v1"
 
+def _unavailable(error: CircuitOpenError) -> HTTPException:
+    """Build a 503 response telling the client when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 @router.post("/text-to-speech")
 async def text_to_speech(request: TTSRequest):
     """
@@ -57,6 +66,12 @@ async def text_to_speech(request: TTSRequest):
             }
         )
         
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=f"Error generating speech: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating speech: {str(e)}")
 
@@ -82,12 +97,32 @@ async def text_to_speech_stream(request: TTSStreamRequest):
             model_id=request.model_id
         )
         
+        # Wait for the first chunk so upstream failures still get an HTTP status
+        try:
+            first_chunk = await audio_stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        
+        async def audio():
+            try:
+                yield first_chunk
+                async for chunk in audio_stream:
+                    yield chunk
+            finally:
+                await audio_stream.aclose()
+        
         return StreamingResponse(
-            audio_stream,
+            audio(),
             media_type="audio/mpeg",
             headers={"Content-Disposition": "attachment; filename=speech_stream.mp3"}
         )
         
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=f"Error streaming speech: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error streaming speech: {str(e)}")
 
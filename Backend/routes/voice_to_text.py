@@ -1,13 +1,43 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
-from utils.whisper import WhisperTranscriber
-import tempfile
-import os
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from config import settings
+from utils.audio_decoding import AudioDecodeError, OpusStreamDecoder, PcmStreamDecoder
+from utils.backends import create_transcription_backend
+from utils.executor import ExecutorSaturatedError
+from utils.streaming_transcription import StreamingSession, StreamingStats
+from utils.vad import EnergyVAD
+from typing import Any, Dict, Optional
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize Whisper transcriber
-whisper_transcriber = WhisperTranscriber()
+# Initialize the speech-to-text backend selected by TRANSCRIPTION_BACKEND
+transcriber = create_transcription_backend()
+
+# Counters of /voice-to-text-stream sessions
+stream_stats = StreamingStats()
+
+ALLOWED_AUDIO_TYPES = ['audio/wav', 'audio/mpeg', 'audio/mp3', 'audio/m4a', 'audio/webm']
+
+def _overloaded(error: ExecutorSaturatedError) -> HTTPException:
+    """Build a 503 response telling the client when to retry"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def _language(language: str) -> Optional[str]:
+    """Validate a language parameter; returns None for auto-detection"""
+    if language == "auto":
+        return None
+    if language not in transcriber.get_supported_languages():
+        raise HTTPException(status_code=400, detail=f"Unsupported language '{language}'. Use 'auto' or a Whisper language code")
+    return language
 
 @router.post("/voice-to-text")
 async def voice_to_text(
@@ -26,52 +56,136 @@ async def voice_to_text(
     """
     try:
         # Validate audio file
-        allowed_types = ['audio/wav', 'audio/mpeg', 'audio/mp3', 'audio/m4a', 'audio/webm']
-        if audio.content_type not in allowed_types:
+        if audio.content_type not in ALLOWED_AUDIO_TYPES:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Unsupported audio format. Allowed: {', '.join(allowed_types)}"
+                detail=f"Unsupported audio format. Allowed: {', '.join(ALLOWED_AUDIO_TYPES)}"
             )
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio.filename.split('.')[-1]}") as temp_file:
-            contents = await audio.read()
-            temp_file.write(contents)
-            temp_file_path = temp_file.name
+        language = _language(language)
         
-        try:
-            # Transcribe audio
-            result = await whisper_transcriber.transcribe(
-                temp_file_path, 
-                language=None if language == "auto" else language
-            )
-            
-            return JSONResponse(content={
-                "success": True,
-                "transcription": result["text"],
-                "language": result["language"],
-                "confidence": result.get("confidence", 0.0),
-                "segments": result.get("segments", []),
-                "audio_info": {
-                    "filename": audio.filename,
-                    "content_type": audio.content_type,
-                    "size_bytes": len(contents)
-                }
-            })
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        # Decoded in memory by the backend; nothing is written to disk
+        contents = await audio.read()
+        
+        # Transcribe audio
+        result = await transcriber.transcribe(contents, language=language)
+        if result.get("error"):
+            raise HTTPException(status_code=500, detail=f"Error transcribing audio: {result['error']}")
+        
+        return JSONResponse(content={
+            "success": True,
+            "transcription": result["text"],
+            "language": result["language"],
+            "confidence": result.get("confidence", 0.0),
+            "segments": result.get("segments", []),
+            "model": result.get("model"),
+            "cached": result.get("cached", False),
+            "audio_info": {
+                "filename": audio.filename,
+                "content_type": audio.content_type,
+                "size_bytes": len(contents),
+                "duration_seconds": result.get("duration"),
+                "skipped_seconds": result.get("skipped_seconds", 0.0)
+            }
+        })
                 
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error transcribing audio: {str(e)}")
 
+def _stream_message(format: str, event: str, data: Dict[str, Any]) -> str:
+    """Format one message as a server-sent event or an NDJSON line"""
+    if format == "ndjson":
+        return json.dumps({"type": event, **data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/voice-to-text/stream")
+async def voice_to_text_segments(
+    audio: UploadFile = File(...),
+    language: str = Form(default="auto"),
+    format: str = Form(default="sse")
+):
+    """
+    Convert voice audio to text, streaming each segment as soon as it is transcribed
+    
+    Args:
+        audio: Audio file (WAV, MP3, M4A, etc.)
+        language: Language code (e.g., 'en', 'es', 'fr') or 'auto' for auto-detection
+        format: 'sse' for server-sent events or 'ndjson' for one JSON object per line
+        
+    Returns:
+        Stream of `segment` messages (text, start, end) and a final `done` message
+        with the full text, language, confidence and duration; a failure
+        mid-stream is reported as an `error` message
+    """
+    if audio.content_type not in ALLOWED_AUDIO_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported audio format. Allowed: {', '.join(ALLOWED_AUDIO_TYPES)}"
+        )
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'sse' or 'ndjson'")
+    language = _language(language)
+    
+    contents = await audio.read()
+    started_at = time.perf_counter()
+    messages = transcriber.transcribe_stream(contents, language=language)
+    
+    # The first message is awaited before the response starts, so decoding and
+    # admission errors still surface as proper HTTP status codes
+    try:
+        first = await messages.__anext__()
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error transcribing audio: {str(e)}")
+    time_to_first_segment_ms = int((time.perf_counter() - started_at) * 1000)
+    
+    async def events():
+        try:
+            message = first
+            while True:
+                event = message.pop("type")
+                if event == "done":
+                    message.update({
+                        "success": True,
+                        "time_to_first_segment_ms": time_to_first_segment_ms,
+                        "processing_time_ms": int((time.perf_counter() - started_at) * 1000),
+                        "audio_info": {
+                            "filename": audio.filename,
+                            "content_type": audio.content_type,
+                            "size_bytes": len(contents)
+                        }
+                    })
+                yield _stream_message(format, event, message)
+                message = await messages.__anext__()
+        except StopAsyncIteration:
+            pass
+        except Exception as e:
+            logger.error(f"Error while streaming transcription: {e}")
+            yield _stream_message(format, "error", {"success": False, "error": str(e)})
+        finally:
+            await messages.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/voice-to-text-realtime")
 async def voice_to_text_realtime(
     audio_chunk: UploadFile = File(...),
     session_id: str = Form(...),
-    chunk_index: int = Form(...)
+    chunk_index: int = Form(...),
+    language: str = Form(default="auto")
 ):
     """
     Real-time voice transcription for streaming audio
@@ -80,37 +194,145 @@ async def voice_to_text_realtime(
         audio_chunk: Audio chunk from real-time stream
         session_id: Unique session identifier
         chunk_index: Index of this audio chunk in the session
+        language: Language code to use for this and later chunks of the session,
+                  or 'auto' to keep the session's detected language
         
     Returns:
         JSON response with partial transcription
     """
     try:
-        # Save audio chunk temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            contents = await audio_chunk.read()
-            temp_file.write(contents)
-            temp_file_path = temp_file.name
+        language = _language(language)
+        contents = await audio_chunk.read()
         
-        try:
-            # Transcribe chunk
-            result = await whisper_transcriber.transcribe_chunk(
-                temp_file_path,
-                session_id=session_id,
-                chunk_index=chunk_index
-            )
-            
-            return JSONResponse(content={
-                "success": True,
-                "session_id": session_id,
-                "chunk_index": chunk_index,
-                "partial_text": result["text"],
-                "is_final": result.get("is_final", False),
-                "confidence": result.get("confidence", 0.0)
-            })
-            
-        finally:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        # Transcribe chunk
+        result = await transcriber.transcribe_chunk(
+            contents,
+            session_id=session_id,
+            chunk_index=chunk_index,
+            language=language
+        )
+        if result.get("error"):
+            raise HTTPException(status_code=500, detail=f"Error in realtime transcription: {result['error']}")
+        
+        return JSONResponse(content={
+            "success": True,
+            "session_id": session_id,
+            "chunk_index": chunk_index,
+            "partial_text": result["text"],
+            "is_final": result.get("is_final", False),
+            "confidence": result.get("confidence", 0.0),
+            "session_text": result.get("session_text", ""),
+            "model": result.get("model"),
+            "language": result.get("language"),
+            "language_pinned": result.get("language_pinned", False)
+        })
                 
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError as e:
+        raise _overloaded(e)
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error in realtime transcription: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error in realtime transcription: {str(e)}")
+
+@router.delete("/voice-to-text-realtime/{session_id}")
+async def end_realtime_session(session_id: str):
+    """
+    Release the state of a realtime transcription session
+    
+    Args:
+        session_id: Session identifier used for the chunks
+        
+    Returns:
+        JSON response telling whether the session existed
+    """
+    return JSONResponse(content={"success": True, "session_id": session_id, "cleared": transcriber.clear_session(session_id)})
+
+@router.websocket("/voice-to-text-stream")
+async def voice_to_text_stream(websocket: WebSocket):
+    """
+    Streaming transcription of a continuous audio stream
+    
+    The client first sends a JSON start message:
+        {"type": "start", "encoding": "pcm_s16le" | "opus", "sample_rate": 16000,
+         "channels": 1, "language": "auto"}
+    then binary messages with audio (raw PCM of any size, or one Opus packet
+    each), and finally {"type": "stop"}. The server answers with "ready",
+    "partial" and "final" messages and ends with "done".
+    """
+    await websocket.accept()
+    session = None
+    try:
+        start = await websocket.receive_json()
+        if start.get("type") != "start":
+            await websocket.send_json({"type": "error", "error": "First message must be {\"type\": \"start\"}"})
+            await websocket.close(code=1003)
+            return
+        
+        encoding = start.get("encoding", "pcm_s16le")
+        channels = int(start.get("channels", 1))
+        try:
+            language = _language(start.get("language", "auto"))
+            if encoding == "pcm_s16le":
+                decoder = PcmStreamDecoder(int(start.get("sample_rate", 16000)), channels)
+            elif encoding == "opus":
+                decoder = OpusStreamDecoder(int(start.get("sample_rate", 48000)), channels)
+            else:
+                raise AudioDecodeError(f"Unsupported encoding '{encoding}'. Use pcm_s16le or opus")
+        except HTTPException as e:
+            await websocket.send_json({"type": "error", "error": e.detail})
+            await websocket.close(code=1003)
+            return
+        except AudioDecodeError as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1003)
+            return
+        
+        async def transcribe(wav: bytes):
+            return await transcriber.transcribe(wav, language=language, realtime=True)
+        
+        session = StreamingSession(
+            transcribe,
+            websocket.send_json,
+            EnergyVAD(settings.VAD_THRESHOLD_DB, settings.VAD_FRAME_MS),
+            stats=stream_stats,
+            partial_interval_ms=settings.STREAM_PARTIAL_INTERVAL_MS,
+            endpoint_silence_ms=settings.STREAM_ENDPOINT_SILENCE_MS,
+            min_speech_ms=settings.STREAM_MIN_SPEECH_MS,
+            max_segment_seconds=settings.STREAM_MAX_SEGMENT_SECONDS,
+            overlap_seconds=settings.STREAM_OVERLAP_SECONDS
+        )
+        await websocket.send_json({"type": "ready", "encoding": encoding})
+        
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                try:
+                    audio = decoder.decode(message["bytes"])
+                except Exception as e:
+                    await websocket.send_json({"type": "error", "error": f"Could not decode audio: {e}"})
+                    continue
+                await session.feed(audio)
+            elif message.get("text") is not None:
+                if json.loads(message["text"]).get("type") == "stop":
+                    # The resampler holds back the last few milliseconds until the stream ends
+                    await session.feed(decoder.flush())
+                    await session.finish()
+                    await websocket.send_json({"type": "done"})
+                    await websocket.close()
+                    break
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Streaming transcription error: {e}")
+        try:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        if session is not None:
+            session.close()
@@ -22,12 +22,16 @@ def check_environment() -> bool:
     logger.info("🔍 Checking environment variables...")
     
     required_vars = [
-        "GOOGLE_API_KEY",
-        "ELEVENLABS_API_KEY", 
         "SUPABASE_URL",
         "SUPABASE_API_KEY"
     ]
     
+    # Vendor keys are only needed when that vendor's backend is selected
+    if os.getenv("VISION_BACKEND", "gemini") == "gemini":
+        required_vars.append("GOOGLE_API_KEY")
+    if os.getenv("SPEECH_BACKEND", "elevenlabs") == "elevenlabs":
+        required_vars.append("ELEVENLABS_API_KEY")
+    
     missing_vars = []
     for var in required_vars:
         if not os.getenv(var):
@@ -40,6 +44,13 @@ def check_environment() -> bool:
             logger.info(f"   {var}=your_value_here")
         return False
     
+    from config import settings
+    try:
+        settings.validate()
+    except ValueError as e:
+        logger.error(f"❌ Invalid configuration: {e}")
+        return False
+    
     logger.info("✅ All required environment variables are set")
     return True
 
@@ -82,16 +93,18 @@ async def test_apis() -> bool:
     
     try:
         # Test Gemini API
-        import google.generativeai as genai
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        logger.info("✅ Gemini API configured")
+        if os.getenv("VISION_BACKEND", "gemini") == "gemini":
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            logger.info("✅ Gemini API configured")
         
         # Test ElevenLabs API (just check if key is valid format)
-        elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
-        if len(elevenlabs_key) < 20:
-            logger.warning("⚠️  ElevenLabs API key seems too short")
-        else:
-            logger.info("✅ ElevenLabs API key format looks good")
+        if os.getenv("SPEECH_BACKEND", "elevenlabs") == "elevenlabs":
+            elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
+            if len(elevenlabs_key) < 20:
+                logger.warning("⚠️  ElevenLabs API key seems too short")
+            else:
+                logger.info("✅ ElevenLabs API key format looks good")
         
         # Test Supabase connection
         from supabase import create_client
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the backend's modules the way main.py does (e.g. "from utils.vad import ...")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,34 @@
+import subprocess
+
+import numpy as np
+import pytest
+
+from utils import audio_decoding
+from utils.audio_decoding import AudioDecodeError, AudioDecoder, pcm_to_wav
+
+
+def test_wav_round_trip():
+    audio = np.linspace(-0.5, 0.5, 1600, dtype=np.float32)
+
+    decoded = AudioDecoder().decode(pcm_to_wav(audio))
+
+    assert np.allclose(decoded, audio, atol=1e-4)
+
+
+def test_hung_ffmpeg_is_reported_as_a_decode_error(monkeypatch):
+    calls = []
+
+    def run(args, **kwargs):
+        calls.append(kwargs["timeout"])
+        raise subprocess.TimeoutExpired(args, kwargs["timeout"])
+
+    monkeypatch.setattr(audio_decoding.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(audio_decoding.subprocess, "run", run)
+    decoder = AudioDecoder(ffmpeg_timeout=2.5)
+    decoder._decoders = [entry for entry in decoder._decoders if entry[0] == "ffmpeg"]
+
+    with pytest.raises(AudioDecodeError, match="within 2.5s"):
+        decoder.decode(b"not really audio")
+
+    assert calls == [2.5]
+    assert decoder.failures == 1
@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.audio_decoding import PcmStreamDecoder
+from utils.audio_preprocessing import StreamResampler, normalize_peak, pcm16_to_float32
+
+TARGET_RATE = 16000
+
+
+def _reference(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Brute-force polyphase resampling: zero-stuff, convolve with the full filter, decimate"""
+    divisor = math.gcd(source_rate, target_rate)
+    up, down = target_rate // divisor, source_rate // divisor
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    length = 2 * half_len + 1
+    cutoff = 1.0 / max_rate
+    taps = cutoff * np.sinc(cutoff * (np.arange(length) - half_len)) * np.kaiser(length, 5.0)
+    taps *= up / taps.sum()
+
+    upsampled = np.zeros(audio.size * up)
+    upsampled[::up] = audio
+    size = upsampled.size + taps.size - 1
+    # Full linear convolution (FFT only for speed; exact up to float64 rounding)
+    filtered = np.fft.irfft(np.fft.rfft(upsampled, size) * np.fft.rfft(taps, size), size)[half_len:]
+    count = -(-audio.size * up // down)
+    filtered = np.concatenate((filtered, np.zeros(max(0, count * down - filtered.size))))
+    return filtered[::down][:count]
+
+
+def _one_shot(audio: np.ndarray, source_rate: int) -> np.ndarray:
+    resampler = StreamResampler(source_rate, TARGET_RATE)
+    return np.concatenate((resampler.push(audio), resampler.flush()))
+
+
+def _chunked(audio: np.ndarray, source_rate: int, rng: np.random.Generator) -> np.ndarray:
+    resampler = StreamResampler(source_rate, TARGET_RATE)
+    parts = []
+    position = 0
+    while position < audio.size:
+        size = int(rng.integers(1, 400))
+        parts.append(resampler.push(audio[position:position + size]))
+        position += size
+    parts.append(resampler.flush())
+    return np.concatenate(parts)
+
+
+@pytest.mark.parametrize("source_rate", [44100, 48000, 22050, 8000])
+def test_stream_resampler_matches_reference(source_rate):
+    rng = np.random.default_rng(source_rate)
+    audio = rng.standard_normal(3000).astype(np.float32)
+
+    expected = _reference(audio.astype(np.float64), source_rate, TARGET_RATE)
+    one_shot = _one_shot(audio, source_rate)
+    chunked = _chunked(audio, source_rate, rng)
+
+    assert one_shot.size == expected.size
+    assert chunked.size == expected.size
+    np.testing.assert_allclose(one_shot, expected, atol=1e-5)
+    np.testing.assert_allclose(chunked, one_shot, atol=1e-6)
+
+
+def test_pcm_stream_decoder_flush_returns_the_tail():
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(4410) * 3000).astype("<i2")
+    decoder = PcmStreamDecoder(sample_rate=44100)
+
+    head = np.concatenate([decoder.decode(samples[i:i + 441].tobytes()) for i in range(0, samples.size, 441)])
+    tail = decoder.flush()
+
+    assert tail.size > 0
+    assert head.size + tail.size == 1600
+    expected = _reference(samples.astype(np.float64) / 32768.0, 44100, TARGET_RATE)
+    np.testing.assert_allclose(np.concatenate((head, tail)), expected, atol=1e-5)
+
+
+def test_pcm16_to_float32_averages_channels():
+    pcm = np.array([0, 16384, -32768, 32767], dtype="<i2").tobytes()
+
+    audio = pcm16_to_float32(pcm, channels=2)
+
+    assert audio.dtype == np.float32
+    np.testing.assert_allclose(audio, [0.25, -0.5 / 32768.0], atol=1e-7)
+
+
+def test_normalize_peak_leaves_silence_untouched():
+    np.testing.assert_array_equal(normalize_peak(np.zeros(4, dtype=np.float32)), 0.0)
+    np.testing.assert_allclose(normalize_peak(np.array([0.1, -0.5], dtype=np.float32)), [0.19, -0.95], rtol=1e-6)
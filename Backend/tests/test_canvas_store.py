@@ -0,0 +1,115 @@
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.canvas_store import CanvasStore, CanvasSyncError
+
+
+def _png(width: int, height: int, colour: str) -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), colour).save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _rgba(width: int, height: int, rgb: tuple) -> dict:
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[:, :, :3] = rgb
+    pixels[:, :, 3] = 255
+    return {"encoding": "rgba", "width": width, "height": height, "data": base64.b64encode(pixels.tobytes()).decode("ascii")}
+
+
+def _pixels(store: CanvasStore, session_id: str) -> np.ndarray:
+    return np.asarray(store.snapshot(session_id))
+
+
+def test_patches_are_applied_in_sequence():
+    store = CanvasStore()
+    token = store.init_session("s", 8, 8)["canvas_token"]
+
+    ack = store.apply_patches("s", token, 1, [
+        {"x": 0, "y": 0, "encoding": "png", "data": _png(2, 2, "#ff0000")},
+        {"x": 6, "y": 6, **_rgba(4, 4, (0, 0, 255))},
+    ])
+
+    pixels = _pixels(store, "s")
+    assert ack == {"status": "ok", "seq": 1}
+    assert tuple(pixels[1, 1]) == (255, 0, 0)
+    assert tuple(pixels[7, 7]) == (0, 0, 255)  # clipped to the canvas
+    assert tuple(pixels[4, 4]) == (255, 255, 255)
+
+
+def test_duplicates_are_ignored_and_gaps_request_a_resync():
+    store = CanvasStore()
+    token = store.init_session("s", 4, 4)["canvas_token"]
+    store.apply_patches("s", token, 1, [])
+
+    assert store.apply_patches("s", token, 1, [])["status"] == "duplicate"
+    assert store.apply_patches("s", token, 3, []) == {"status": "resync", "reason": "sequence_gap", "seq": 1}
+    assert store.apply_patches("other", token, 1, [])["reason"] == "unknown_session"
+
+
+def test_patches_need_the_canvas_token():
+    store = CanvasStore()
+    store.init_session("s", 4, 4)
+
+    for token in (None, "guessed", 123):
+        with pytest.raises(CanvasSyncError, match="canvas_token"):
+            store.apply_patches("s", token, 1, [{"x": 0, "y": 0, "data": _png(4, 4, "#000000")}])
+
+    assert tuple(_pixels(store, "s")[0, 0]) == (255, 255, 255)
+
+
+def test_only_the_owner_can_reset_a_canvas():
+    store = CanvasStore()
+    token = store.init_session("s", 4, 4, "#ffffff")["canvas_token"]
+
+    with pytest.raises(CanvasSyncError, match="canvas_token"):
+        store.init_session("s", 4, 4, "#000000")
+
+    reset = store.init_session("s", 2, 2, "#000000", token=token)
+    assert reset["canvas_token"] == token
+    assert reset["seq"] == 0
+    assert _pixels(store, "s").shape == (2, 2, 3)
+
+
+def test_bad_patch_leaves_the_batch_unapplied():
+    store = CanvasStore()
+    token = store.init_session("s", 4, 4)["canvas_token"]
+
+    with pytest.raises(CanvasSyncError):
+        store.apply_patches("s", token, 1, [
+            {"x": 0, "y": 0, "data": _png(4, 4, "#ff0000")},
+            {"x": 0, "y": 0, "encoding": "rgba", "width": 3, "height": 3, "data": base64.b64encode(b"short").decode()},
+        ])
+    with pytest.raises(CanvasSyncError):
+        store.apply_patches("s", token, 1, [{"x": 0, "y": 0, "data": _png(4, 4, "#ff0000")}, {"data": "bm90IGFuIGltYWdl"}])
+
+    assert tuple(_pixels(store, "s")[0, 0]) == (255, 255, 255)
+    # seq was not bumped, so the batch can be resent as is
+    assert store.apply_patches("s", token, 1, [{"x": 0, "y": 0, "data": _png(4, 4, "#ff0000")}])["status"] == "ok"
+
+
+def test_init_validates_size_and_background():
+    store = CanvasStore(max_dimension=100)
+
+    with pytest.raises(CanvasSyncError):
+        store.init_session("s", 0, 10)
+    with pytest.raises(CanvasSyncError):
+        store.init_session("s", 101, 10)
+    with pytest.raises(CanvasSyncError):
+        store.init_session("s", 10, 10, "not a colour")
+
+
+def test_least_recently_used_canvases_are_evicted():
+    store = CanvasStore(max_sessions=2)
+    store.init_session("a", 2, 2)
+    store.init_session("b", 2, 2)
+    store.snapshot("a")
+    store.init_session("c", 2, 2)
+
+    assert store.snapshot("b") is None
+    assert store.snapshot("a") is not None
+    assert store.evictions == 1
@@ -0,0 +1,32 @@
+import importlib
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def reload_config(monkeypatch):
+    def reload(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(config).settings
+
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+def test_image_output_formats_are_trimmed_and_lowercased(reload_config):
+    settings = reload_config(IMAGE_OUTPUT_FORMATS=" PNG, webp,,jpeg ")
+
+    assert settings.IMAGE_OUTPUT_FORMATS == ["png", "webp", "jpeg"]
+    settings.validate()
+
+
+@pytest.mark.parametrize("formats", ["png,gif", " , "])
+def test_unusable_image_output_formats_are_rejected(reload_config, formats):
+    settings = reload_config(IMAGE_OUTPUT_FORMATS=formats)
+
+    with pytest.raises(ValueError, match="IMAGE_OUTPUT_FORMATS"):
+        settings.validate()
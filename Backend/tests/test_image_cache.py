@@ -0,0 +1,19 @@
+from utils import image_cache
+from utils.image_cache import AnalysisCache
+
+
+def test_near_hit_skips_expired_closer_candidate(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(image_cache.time, "monotonic", lambda: clock[0])
+    cache = AnalysisCache(ttl_seconds=10, max_hamming_distance=4)
+
+    cache.put(0b0001, "prompt", "closer but older")
+    clock[0] += 6
+    cache.put(0b0111, "prompt", "further but fresh")
+    clock[0] += 6  # the first entry has expired, the second has not
+
+    hit = cache.get(0b0000, "prompt")
+
+    assert hit == {"analysis": "further but fresh", "distance": 3}
+    assert cache.stats()["entries"] == 1
+    assert cache.expirations == 1
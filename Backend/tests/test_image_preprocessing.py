@@ -0,0 +1,30 @@
+from PIL import Image, ImageDraw
+
+from utils.image_preprocessing import CanvasPreprocessor
+
+
+def _canvas() -> Image.Image:
+    image = Image.new("RGB", (400, 300), "white")
+    ImageDraw.Draw(image).rectangle((100, 80, 200, 160), fill="black")
+    return image
+
+
+def test_uploads_count_towards_the_savings():
+    preprocessor = CanvasPreprocessor(max_workers=1)
+
+    _, report = preprocessor.prepare(_canvas(), 50_000)
+
+    stats = preprocessor.stats()
+    assert report["bytes_saved"] == 50_000 - report["output_bytes"]
+    assert (stats["bytes_in"], stats["bytes_out"]) == (50_000, report["output_bytes"])
+
+
+def test_derived_images_are_left_out_of_the_savings():
+    preprocessor = CanvasPreprocessor(max_workers=1)
+
+    _, report = preprocessor.prepare(_canvas().crop((90, 70, 210, 170)), None, autocrop=False)
+
+    stats = preprocessor.stats()
+    assert report["bytes_saved"] is None
+    assert stats["images_processed"] == 1
+    assert (stats["bytes_in"], stats["bytes_out"], stats["bytes_saved"]) == (0, 0, 0)
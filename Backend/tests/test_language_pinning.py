@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+from config import settings  # noqa: E402
+from utils.whisper import WhisperTranscriber  # noqa: E402
+
+
+class FakeModel:
+    """Stands in for WhisperTranscriber.transcribe: detects `detected` unless a language is given"""
+
+    def __init__(self, detected="de", speech_seconds=5.0):
+        self.detected = detected
+        self.speech_seconds = speech_seconds
+        self.languages = []
+        self.result = None
+
+    async def __call__(self, audio, language=None, temperature=0.0, realtime=False):
+        assert realtime
+        self.languages.append(language)
+        if self.result is not None:
+            return self.result
+        return {
+            "text": "hallo",
+            "language": language or self.detected,
+            "confidence": 0.9,
+            "duration": self.speech_seconds + 1.0,
+            "skipped_seconds": 1.0,
+            "model": "base",
+        }
+
+
+def _transcriber(model: FakeModel) -> WhisperTranscriber:
+    transcriber = WhisperTranscriber()
+    transcriber.pin_languages = True
+    transcriber.transcribe = model
+    return transcriber
+
+
+def _chunks(transcriber, *languages):
+    async def run():
+        return [
+            await transcriber.transcribe_chunk(b"", "s", index, language=language)
+            for index, language in enumerate(languages)
+        ]
+    return asyncio.run(run())
+
+
+def test_detected_language_is_pinned_for_later_chunks():
+    model = FakeModel(speech_seconds=settings.REALTIME_LANGUAGE_PIN_MIN_SECONDS)
+    transcriber = _transcriber(model)
+
+    first, second = _chunks(transcriber, None, None)
+
+    assert model.languages == [None, "de"]
+    assert (first["language"], first["language_pinned"]) == ("de", False)
+    assert (second["language"], second["language_pinned"]) == ("de", True)
+    stats = transcriber._language_pinning_stats()
+    assert (stats["detect_chunks"], stats["pinned_chunks"]) == (1, 1)
+
+
+def test_short_chunks_keep_detecting():
+    model = FakeModel(speech_seconds=settings.REALTIME_LANGUAGE_PIN_MIN_SECONDS / 2)
+    transcriber = _transcriber(model)
+
+    _chunks(transcriber, None, None)
+
+    assert model.languages == [None, None]
+    assert transcriber.sessions.get_language("s") == (None, None)
+
+
+def test_override_pins_the_language_for_the_rest_of_the_session():
+    model = FakeModel()
+    transcriber = _transcriber(model)
+
+    results = _chunks(transcriber, None, "es", None)
+
+    assert model.languages == [None, "es", "es"]
+    assert transcriber.sessions.get_language("s") == ("es", "override")
+    assert results[2]["language_pinned"]
+
+
+def test_chunks_without_speech_or_with_errors_do_not_pin():
+    model = FakeModel()
+    transcriber = _transcriber(model)
+    model.result = {"text": "", "language": "unknown", "confidence": 0.0, "duration": 5.0, "no_speech": True}
+    _chunks(transcriber, None)
+    model.result = {"text": "", "language": "unknown", "confidence": 0.0, "error": "model failed"}
+    _chunks(transcriber, None)
+
+    assert transcriber.sessions.get_language("s") == (None, None)
+
+
+def test_pinning_can_be_disabled():
+    model = FakeModel()
+    transcriber = _transcriber(model)
+    transcriber.pin_languages = False
+
+    _chunks(transcriber, None, None)
+
+    assert model.languages == [None, None]
@@ -0,0 +1,95 @@
+import asyncio
+
+from middleware import CancelOnDisconnectMiddleware
+
+SCOPE = {"type": "http", "method": "POST", "path": "/api/analyze-drawing"}
+
+
+class Client:
+    """ASGI receive/send pair: the request body first, then http.disconnect once `leave` is set"""
+
+    def __init__(self):
+        self.leave = asyncio.Event()
+        self.sent = []
+        self._messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive(self):
+        if self._messages:
+            return self._messages.pop(0)
+        await self.leave.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_handler_is_cancelled_when_the_client_disconnects():
+    events = []
+
+    async def app(scope, receive, send):
+        await receive()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        events.append("finished")
+
+    async def run():
+        client = Client()
+        request = asyncio.ensure_future(CancelOnDisconnectMiddleware(app)(SCOPE, client.receive, client.send))
+        await asyncio.sleep(0.01)
+        client.leave.set()
+        # Returns quietly: the disconnect is not an error of the server
+        await asyncio.wait_for(request, 1)
+        return client
+
+    client = asyncio.run(run())
+
+    assert events == ["cancelled"]
+    assert client.sent == []
+
+
+def test_handler_is_not_cancelled_after_the_response_completes():
+    events = []
+    background_done = None
+
+    async def app(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+        # e.g. a background task still running after the body was sent
+        try:
+            await background_done.wait()
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        events.append("finished")
+
+    async def run():
+        nonlocal background_done
+        background_done = asyncio.Event()
+        client = Client()
+        request = asyncio.ensure_future(CancelOnDisconnectMiddleware(app)(SCOPE, client.receive, client.send))
+        await asyncio.sleep(0.01)
+        client.leave.set()
+        await asyncio.sleep(0.01)
+        background_done.set()
+        await asyncio.wait_for(request, 1)
+        return client
+
+    client = asyncio.run(run())
+
+    assert events == ["finished"]
+    assert client.sent[-1] == {"type": "http.response.body", "body": b"ok"}
+
+
+def test_other_scopes_pass_through():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(scope["type"])
+
+    asyncio.run(CancelOnDisconnectMiddleware(app)({"type": "lifespan"}, None, None))
+
+    assert seen == ["lifespan"]
@@ -0,0 +1,45 @@
+import pytest
+
+from utils.model_router import ModelRouter
+
+
+def test_single_tier_takes_everything():
+    router = ModelRouter(["base"])
+
+    assert router.choose(3.0, True, {}) == ("base", "single")
+    assert router.choose(60.0, False, {"base": 99}) == ("base", "single")
+
+
+def test_short_realtime_audio_goes_to_the_fastest_tier():
+    router = ModelRouter(["tiny", "small"], realtime_max_seconds=10)
+
+    assert router.choose(10.0, True, {}) == ("tiny", "realtime")
+    # Long realtime audio and uploads prefer the accurate tier
+    assert router.choose(10.5, True, {}) == ("small", "idle")
+    assert router.choose(2.0, False, {}) == ("small", "idle")
+
+
+def test_overload_falls_back_to_the_next_smaller_tier():
+    router = ModelRouter(["tiny", "base", "small"], overload_depth=2)
+
+    assert router.choose(20.0, False, {"small": 1}) == ("small", "idle")
+    assert router.choose(20.0, False, {"small": 2}) == ("base", "overload")
+    assert router.choose(20.0, False, {"small": 2, "base": 5}) == ("tiny", "overload")
+    # Every tier overloaded: the fastest one still takes the request
+    assert router.choose(20.0, False, {"small": 2, "base": 2, "tiny": 9}) == ("tiny", "overload")
+
+
+def test_routing_counters():
+    router = ModelRouter(["tiny", "small"], overload_depth=1)
+    router.choose(1.0, True, {})
+    router.choose(30.0, False, {})
+    router.choose(30.0, False, {"small": 1})
+
+    stats = router.stats()
+    assert stats["routed"] == {"tiny": 2, "small": 1}
+    assert stats["reasons"] == {"realtime": 1, "idle": 1, "overload": 1}
+
+
+def test_at_least_one_tier_is_required():
+    with pytest.raises(ValueError):
+        ModelRouter([])
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils import resilience
+from utils.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, Resilience, UpstreamError
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # Replaces the module's reference only; the event loop keeps the real clock
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("svc", failure_threshold=3, reset_seconds=10)
+    breaker.record_failure()
+    breaker.record_success()
+    _open(breaker)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+    clock[0] += 4
+    assert breaker.retry_after() == 6
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker("svc", failure_threshold=2, reset_seconds=10)
+    _open(breaker)
+    clock[0] += 10
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("svc", failure_threshold=2, reset_seconds=10)
+    _open(breaker)
+    clock[0] += 10
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
+    clock[0] += 10
+    assert breaker.allow()
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker("svc", failure_threshold=2, reset_seconds=10)
+    _open(breaker)
+    clock[0] += 10
+    assert breaker.allow()
+
+    breaker.record_abandoned()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+class Upstream:
+    """Fake upstream: each call takes the next behaviour (a result, an exception, or a (delay, outcome) pair); the last one repeats"""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        behaviour = self.behaviours[min(self.calls, len(self.behaviours) - 1)]
+        self.calls += 1
+        delay, outcome = behaviour if isinstance(behaviour, tuple) else (0, behaviour)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def _policy(**kwargs):
+    options = {"backoff_base": 0.001, "backoff_max": 0.001, "attempt_timeout": 1.0, "deadline": 2.0}
+    options.update(kwargs)
+    return Resilience("svc", **options)
+
+
+def test_retryable_errors_are_retried_until_success():
+    upstream = Upstream(UpstreamError("svc", "busy", status=503), ConnectionError("reset"), "ok")
+    policy = _policy()
+
+    assert asyncio.run(policy.call(upstream)) == "ok"
+    assert upstream.calls == 3
+    assert policy.retries == 2 and policy.failures == 0
+    assert policy.breaker.consecutive_failures == 0
+
+
+def test_non_retryable_error_is_raised_at_once_and_does_not_trip_the_breaker():
+    upstream = Upstream(UpstreamError("svc", "bad request", status=400), "ok")
+    policy = _policy(failure_threshold=1)
+
+    with pytest.raises(UpstreamError, match="400"):
+        asyncio.run(policy.call(upstream))
+    assert upstream.calls == 1
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_last_retryable_error_is_raised_when_attempts_run_out():
+    upstream = Upstream(UpstreamError("svc", "busy", status=503))
+    policy = _policy(max_attempts=2)
+
+    with pytest.raises(UpstreamError, match="503"):
+        asyncio.run(policy.call(upstream))
+    assert upstream.calls == 2
+    assert policy.failures == 1
+
+
+def test_open_circuit_rejects_without_calling_upstream():
+    upstream = Upstream(UpstreamError("svc", "down", status=502))
+    policy = _policy(max_attempts=1, failure_threshold=2, reset_seconds=30)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            asyncio.run(policy.call(upstream))
+    with pytest.raises(CircuitOpenError) as rejected:
+        asyncio.run(policy.call(upstream))
+
+    assert upstream.calls == 2
+    assert rejected.value.retry_after == 30
+
+
+def test_retry_after_is_a_floor_for_the_backoff():
+    upstream = Upstream(UpstreamError("svc", "slow down", status=429, retry_after=0.1), "ok")
+    policy = _policy()
+
+    started = time.perf_counter()
+    assert asyncio.run(policy.call(upstream)) == "ok"
+    assert time.perf_counter() - started >= 0.1
+
+
+def test_retry_after_beyond_the_deadline_fails_without_waiting():
+    upstream = Upstream(UpstreamError("svc", "slow down", status=429, retry_after=30), "ok")
+    policy = _policy(deadline=1.0)
+
+    started = time.perf_counter()
+    with pytest.raises(UpstreamError, match="429"):
+        asyncio.run(policy.call(upstream))
+    assert time.perf_counter() - started < 0.5
+    assert upstream.calls == 1
+
+
+def test_attempts_share_the_deadline():
+    upstream = Upstream((5, "late"))
+    policy = _policy(attempt_timeout=1.0, deadline=0.15)
+
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(policy.call(upstream))
+    assert time.perf_counter() - started < 0.5
+    assert policy.timeouts == 1
+    assert upstream.cancelled == 1
+
+
+def test_cancelled_probe_releases_the_half_open_slot(clock):
+    policy = _policy(failure_threshold=1, reset_seconds=10)
+    policy.breaker.record_failure()
+    clock[0] += 10
+    upstream = Upstream((5, "late"))
+
+    async def run():
+        call = asyncio.ensure_future(policy.call(upstream))
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(run())
+
+    assert policy.breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.breaker.allow()
+
+
+def test_hedge_wins_when_the_first_request_is_slow():
+    upstream = Upstream((1, "slow"), (0, "fast"))
+    policy = _policy(hedge_after=0.02)
+
+    assert asyncio.run(policy.call(upstream)) == "fast"
+    assert (policy.hedges, policy.hedge_wins) == (1, 1)
+    assert upstream.cancelled == 1
+
+
+def test_first_request_can_still_beat_its_hedge():
+    upstream = Upstream((0.05, "first"), (1, "hedge"))
+    policy = _policy(hedge_after=0.01)
+
+    assert asyncio.run(policy.call(upstream)) == "first"
+    assert (policy.hedges, policy.hedge_wins) == (1, 0)
+    assert upstream.cancelled == 1
+
+
+def test_hedge_is_skipped_for_fast_answers_and_non_idempotent_calls():
+    upstream = Upstream((0.05, "ok"))
+    policy = _policy(hedge_after=0.01)
+
+    assert asyncio.run(policy.call(upstream, hedge=False)) == "ok"
+    assert upstream.calls == 1 and policy.hedges == 0
+
+    fast = Upstream("ok")
+    assert asyncio.run(policy.call(fast)) == "ok"
+    assert fast.calls == 1 and policy.hedges == 0
+
+
+def test_hedged_call_fails_when_both_requests_fail():
+    upstream = Upstream((0.03, ValueError("first")), (0, ValueError("second")))
+    policy = _policy(hedge_after=0.01)
+
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(upstream))
+    assert upstream.calls == 2
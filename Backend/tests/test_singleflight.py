@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+class Upstream:
+    """Coroutine function that blocks until released, counting starts and cancellations"""
+
+    def __init__(self, result="result", error=None):
+        self.result = result
+        self.error = error
+        self.started = 0
+        self.cancelled = 0
+        self.release = None
+
+    async def __call__(self):
+        self.started += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_callers_share_one_call_and_the_key_is_released():
+    upstream = Upstream()
+
+    async def run():
+        group = SingleFlight("test")
+        upstream.release = asyncio.Event()
+        callers = [asyncio.ensure_future(group.do("key", upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        in_flight = group.stats()["in_flight"]
+        upstream.release.set()
+        results = await asyncio.gather(*callers)
+        return group, in_flight, results
+
+    group, in_flight, results = asyncio.run(run())
+
+    assert results == ["result"] * 3
+    assert upstream.started == 1
+    assert in_flight == 1
+    assert group.stats() == {"in_flight": 0, "upstream_calls": 1, "coalesced": 2, "abandoned": 0}
+
+
+def test_exception_reaches_every_waiter():
+    upstream = Upstream(error=ValueError("upstream failed"))
+
+    async def run():
+        group = SingleFlight("test")
+        upstream.release = asyncio.Event()
+        callers = [asyncio.ensure_future(group.do("key", upstream)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return group, await asyncio.gather(*callers, return_exceptions=True)
+
+    group, outcomes = asyncio.run(run())
+
+    assert all(isinstance(o, ValueError) and str(o) == "upstream failed" for o in outcomes)
+    assert group.stats()["in_flight"] == 0
+
+
+def test_call_survives_until_the_last_waiter_leaves():
+    upstream = Upstream()
+
+    async def run():
+        group = SingleFlight("test")
+        upstream.release = asyncio.Event()
+        first = asyncio.ensure_future(group.do("key", upstream))
+        second = asyncio.ensure_future(group.do("key", upstream))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        cancelled_with_one_waiter = upstream.cancelled
+
+        upstream.release.set()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return group, cancelled_with_one_waiter, result
+
+    group, cancelled_with_one_waiter, result = asyncio.run(run())
+
+    assert cancelled_with_one_waiter == 0
+    assert result == "result"
+    assert group.abandoned == 0
+
+
+def test_call_is_cancelled_when_every_waiter_leaves():
+    upstream = Upstream()
+
+    async def run():
+        group = SingleFlight("test")
+        upstream.release = asyncio.Event()
+        callers = [asyncio.ensure_future(group.do("key", upstream)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        in_flight = group.stats()["in_flight"]
+
+        # A new caller starts a fresh call instead of joining the cancelled one
+        upstream.release.set()
+        result = await group.do("key", upstream)
+        return group, in_flight, result
+
+    group, in_flight, result = asyncio.run(run())
+
+    assert upstream.cancelled == 1
+    assert in_flight == 0
+    assert result == "result"
+    assert upstream.started == 2
+    assert group.abandoned == 1
+
+
+def test_different_keys_do_not_coalesce():
+    upstream = Upstream()
+
+    async def run():
+        group = SingleFlight("test")
+        upstream.release = asyncio.Event()
+        upstream.release.set()
+        return group, await asyncio.gather(group.do("a", upstream), group.do("b", upstream))
+
+    group, results = asyncio.run(run())
+
+    assert results == ["result", "result"]
+    assert upstream.started == 2
+    assert group.coalesced == 0
@@ -0,0 +1,57 @@
+import asyncio
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE
+from utils.streaming_transcription import StreamingSession
+from utils.vad import EnergyVAD
+
+
+def _run_session(pieces):
+    calls = []
+    messages = []
+
+    async def transcribe(wav: bytes):
+        calls.append(len(wav))
+        return {"text": "hello", "language": "en"}
+
+    async def emit(message):
+        messages.append(message)
+
+    async def run():
+        session = StreamingSession(transcribe, emit, EnergyVAD(-45.0), partial_interval_ms=0)
+        for piece in pieces:
+            for start in range(0, piece.size, SAMPLE_RATE // 10):
+                await session.feed(piece[start:start + SAMPLE_RATE // 10])
+                await asyncio.sleep(0)
+        buffered = session._buffer.size
+        await session.finish()
+        return buffered
+
+    buffered = asyncio.run(run())
+    return calls, messages, buffered
+
+
+def _tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def test_short_click_is_not_transcribed_or_buffered():
+    calls, messages, buffered = _run_session([_silence(0.5), _tone(0.06), _silence(15.0)])
+
+    assert calls == []
+    assert messages == []
+    assert buffered < SAMPLE_RATE
+
+
+def test_speech_is_committed_at_endpoint():
+    calls, messages, _ = _run_session([_silence(0.5), _tone(1.0), _silence(1.0)])
+
+    finals = [m for m in messages if m["type"] == "final"]
+    assert len(finals) == 1
+    assert finals[0]["text"] == "hello"
@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+import numpy as np
+
+from utils.transcription_cache import TranscriptionCache, audio_digest
+
+RESULT = {"language": "en", "segments": [{"text": "hello", "start": 0.0, "end": 1.0}]}
+
+
+def test_digest_depends_on_exact_samples():
+    audio = np.zeros(16000, dtype=np.float32)
+    changed = audio.copy()
+    changed[100] = 1e-6
+
+    assert audio_digest(audio) == audio_digest(audio.copy())
+    assert audio_digest(audio) != audio_digest(changed)
+
+
+def test_memory_hit_prefers_the_first_acceptable_size():
+    async def run():
+        cache = TranscriptionCache()
+        await cache.put("d", "en", "base", RESULT)
+        await cache.put("d", "en", "small", {"language": "en", "segments": []})
+        return (
+            await cache.get("d", "en", ["small", "base"]),
+            await cache.get("d", "fr", ["small", "base"]),
+            cache,
+        )
+
+    hit, miss, cache = asyncio.run(run())
+
+    assert hit == ("small", {"language": "en", "segments": []})
+    assert miss is None
+    assert (cache.memory_hits, cache.misses, cache.stores) == (1, 1, 2)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    async def run():
+        cache = TranscriptionCache(max_entries=2)
+        await cache.put("a", None, "base", RESULT)
+        await cache.put("b", None, "base", RESULT)
+        await cache.get("a", None, ["base"])
+        await cache.put("c", None, "base", RESULT)
+        return cache, [await cache.get(d, None, ["base"]) is not None for d in "abc"]
+
+    cache, present = asyncio.run(run())
+
+    assert present == [True, False, True]
+    assert cache.evictions == 1
+
+
+def test_memory_tier_respects_byte_cap():
+    async def run():
+        cache = TranscriptionCache(max_bytes=2000)
+        big = {"language": "en", "segments": [{"text": "x" * 1200}]}
+        await cache.put("a", None, "base", big)
+        await cache.put("b", None, "base", big)
+        await cache.put("huge", None, "base", {"language": "en", "segments": [{"text": "x" * 5000}]})
+        return cache
+
+    cache = asyncio.run(run())
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.evictions == 1
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    async def run():
+        await TranscriptionCache(disk_dir=str(tmp_path)).put("d", None, "base", RESULT)
+        fresh = TranscriptionCache(disk_dir=str(tmp_path))
+        first = await fresh.get("d", None, ["base"])
+        second = await fresh.get("d", None, ["base"])
+        return fresh, first, second
+
+    fresh, first, second = asyncio.run(run())
+
+    assert first == second == ("base", RESULT)
+    assert (fresh.disk_hits, fresh.memory_hits) == (1, 1)
+
+
+def test_disk_tier_prunes_to_its_cap(tmp_path):
+    async def run():
+        cache = TranscriptionCache(disk_dir=str(tmp_path), disk_max_bytes=1500)
+        for index in range(10):
+            await cache.put(f"d{index}", None, "base", {"language": "en", "segments": [{"text": "x" * 200}]})
+        return cache
+
+    cache = asyncio.run(run())
+    on_disk = sum(os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(tmp_path) for n in names)
+
+    assert cache.disk_evictions > 0
+    assert on_disk <= 1500
+    assert cache.stats()["disk"]["bytes"] == on_disk
+
+
+def test_disk_files_stay_inside_the_cache_directory(tmp_path):
+    cache_dir = tmp_path / "cache"
+
+    async def run():
+        cache = TranscriptionCache(disk_dir=str(cache_dir))
+        await cache.put("d", "x/../../../escaped", "base", RESULT)
+        return await TranscriptionCache(disk_dir=str(cache_dir)).get("d", "x/../../../escaped", ["base"])
+
+    hit = asyncio.run(run())
+    written = [os.path.join(d, n) for d, _, names in os.walk(tmp_path) for n in names]
+
+    assert hit == ("base", RESULT)
+    assert len(written) == 1
+    assert os.path.commonpath([written[0], str(cache_dir)]) == str(cache_dir)
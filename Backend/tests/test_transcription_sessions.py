@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import transcription_sessions
+from utils.transcription_sessions import TranscriptionSessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(transcription_sessions, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_final_chunk_commits_pending_chunks_in_index_order():
+    store = TranscriptionSessionStore()
+
+    assert store.add_chunk("s", 1, "world", False) == ""
+    assert store.add_chunk("s", 0, "hello", False) == ""
+    assert store.add_chunk("s", 2, "again.", True) == "hello world again."
+    assert store.stats()["pending_chunks"] == 0
+
+
+def test_late_chunks_are_counted_and_dropped():
+    store = TranscriptionSessionStore()
+    store.add_chunk("s", 0, "hello", False)
+    store.add_chunk("s", 2, "there.", True)
+
+    assert store.add_chunk("s", 1, "late", False) == "hello there."
+    assert store.late_chunks == 1
+    assert store.stats()["pending_chunks"] == 0
+
+
+def test_oldest_pending_chunks_are_compacted_above_the_cap():
+    store = TranscriptionSessionStore(max_pending_chunks=3)
+    for index in range(4):
+        text = store.add_chunk("s", index, f"w{index}", False)
+
+    assert text == "w0"
+    assert store.stats()["pending_chunks"] == 3
+    assert store.compactions == 1
+    # A chunk older than the compacted ones can no longer be placed
+    store.add_chunk("s", 0, "again", False)
+    assert store.late_chunks == 1
+
+
+def test_committed_text_is_trimmed_at_a_word_boundary():
+    store = TranscriptionSessionStore(max_text_chars=20)
+    store.add_chunk("s", 0, "alpha beta gamma", True)
+
+    text = store.add_chunk("s", 1, "delta epsilon", True)
+
+    assert len(text) <= 20
+    assert text == "gamma delta epsilon"
+
+
+def test_idle_sessions_expire(clock):
+    store = TranscriptionSessionStore(idle_ttl_seconds=60)
+    store.add_chunk("old", 0, "bye.", True)
+    store.pin_language("old", "fr", "detected")
+    clock[0] += 61
+
+    assert store.get_text("old") is None
+    assert store.get_language("old") == (None, None)
+    store.add_chunk("new", 0, "hi.", True)
+    assert store.stats()["sessions"] == 1
+    assert store.evictions["ttl"] == 1
+
+
+def test_least_recently_used_session_is_dropped_above_the_cap(clock):
+    store = TranscriptionSessionStore(max_sessions=2)
+    store.add_chunk("a", 0, "a.", True)
+    clock[0] += 1
+    store.add_chunk("b", 0, "b.", True)
+    clock[0] += 1
+    store.add_chunk("a", 1, "again.", True)
+    store.add_chunk("c", 0, "c.", True)
+
+    assert store.get_text("b") is None
+    assert store.get_text("a") == "a. again."
+    assert store.evictions["lru"] == 1
+
+
+def test_sessions_are_dropped_above_the_memory_cap():
+    store = TranscriptionSessionStore(max_bytes=4000)
+    for index in range(10):
+        store.add_chunk(f"s{index}", 0, "x" * 500, True)
+
+    stats = store.stats()
+    assert stats["bytes"] <= 4000
+    assert stats["evictions"]["memory"] > 0
+    assert store.get_text("s9") == "x" * 500
+
+
+def test_memory_accounting_returns_to_zero_when_sessions_are_dropped():
+    store = TranscriptionSessionStore()
+    store.add_chunk("a", 0, "hello", False)
+    store.add_chunk("a", 1, "there.", True)
+    store.add_chunk("b", 0, "pending", False)
+
+    assert store.drop_session("a") and store.drop_session("b")
+    assert not store.drop_session("a")
+    assert store.stats()["bytes"] == 0
+
+
+def test_detected_language_does_not_replace_a_pinned_one():
+    store = TranscriptionSessionStore()
+
+    assert store.pin_language("s", "en", "detected")
+    assert not store.pin_language("s", "de", "detected")
+    assert store.pin_language("s", "es", "override")
+    assert store.get_language("s") == ("es", "override")
+    assert (store.languages_detected, store.language_overrides) == (1, 1)
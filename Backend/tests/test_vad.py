@@ -0,0 +1,41 @@
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE
+from utils.vad import EnergyVAD
+
+
+def _noise(seconds: float, level_db: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 10 ** (level_db / 20)).astype(np.float32)
+
+
+def test_loud_continuous_speech_is_kept():
+    # -20 dBFS throughout with a few dB of syllable-rate modulation: no quiet part to call a noise floor
+    audio = _noise(3.0, -20.0)
+    t = np.arange(audio.size) / SAMPLE_RATE
+    audio *= (1.0 + 0.3 * np.sin(2 * np.pi * 4 * t)).astype(np.float32)
+    vad = EnergyVAD(threshold_db=-45.0)
+    levels = vad.frame_levels(audio)
+    assert levels.max() - levels.min() <= 8
+
+    trim = vad.trim(audio, noise_margin_db=10.0)
+
+    assert trim.has_speech
+    assert trim.audio.size == audio.size
+
+
+def test_speech_above_noise_floor_is_trimmed():
+    audio = np.concatenate([_noise(1.0, -50.0, 1), _noise(1.0, -20.0, 2), _noise(1.0, -50.0, 3)])
+
+    trim = EnergyVAD(threshold_db=-60.0).trim(audio, padding_ms=100, noise_margin_db=10.0)
+
+    assert trim.has_speech
+    assert abs(trim.audio.size - 1.2 * SAMPLE_RATE) <= EnergyVAD().frame_length * 2
+    assert abs(trim.original_time(0.0) - 0.9) < 0.05
+
+
+def test_silence_has_no_speech():
+    trim = EnergyVAD(threshold_db=-45.0).trim(_noise(2.0, -70.0), noise_margin_db=10.0)
+
+    assert not trim.has_speech
+    assert trim.skipped_seconds == 2.0
@@ -0,0 +1,143 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+from utils import whisper  # noqa: E402
+from utils.whisper import TranscriptionBatcher, WhisperTier  # noqa: E402
+
+
+def _clip(value: float, seconds: float = 1.0) -> np.ndarray:
+    return np.full(int(seconds * 16000), value, dtype=np.float32)
+
+
+class Recorder:
+    """Batch runner answering each clip with its first sample"""
+
+    def __init__(self, error=None, delay=0.0):
+        self.batches = []
+        self.error = error
+        self.delay = delay
+
+    async def __call__(self, audios, languages, temperature):
+        self.batches.append(([float(a[0]) for a in audios], list(languages), temperature))
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [{"language": language, "segments": [{"text": str(a[0])}]} for a, language in zip(audios, languages)]
+
+
+def test_results_fan_out_to_callers_in_order():
+    runner = Recorder()
+
+    async def run():
+        batcher = TranscriptionBatcher(runner, max_batch_size=8, window_ms=20)
+        return await asyncio.gather(*(
+            batcher.submit(_clip(i), language, 0.0) for i, language in enumerate(["en", None, "fr"])
+        ))
+
+    results = asyncio.run(run())
+
+    assert runner.batches == [([0.0, 1.0, 2.0], ["en", None, "fr"], 0.0)]
+    assert [r["segments"][0]["text"] for r in results] == ["0.0", "1.0", "2.0"]
+    assert [r["language"] for r in results] == ["en", None, "fr"]
+
+
+def test_cancelled_callers_are_left_out_of_the_batch():
+    runner = Recorder()
+
+    async def run():
+        batcher = TranscriptionBatcher(runner, max_batch_size=8, window_ms=20)
+        tasks = [asyncio.ensure_future(batcher.submit(_clip(i), None, 0.0)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks[1].cancel()
+        done = await asyncio.gather(*tasks, return_exceptions=True)
+        return batcher, done
+
+    batcher, done = asyncio.run(run())
+
+    assert runner.batches[0][0] == [0.0, 2.0]
+    assert isinstance(done[1], asyncio.CancelledError)
+    assert batcher.stats()["requests"] == 2
+
+
+def test_a_failed_batch_fails_every_caller():
+    runner = Recorder(error=RuntimeError("decode failed"))
+
+    async def run():
+        batcher = TranscriptionBatcher(runner, max_batch_size=8, window_ms=20)
+        return await asyncio.gather(
+            *(batcher.submit(_clip(i), None, 0.0) for i in range(3)), return_exceptions=True
+        )
+
+    done = asyncio.run(run())
+
+    assert len(runner.batches) == 1
+    assert all(isinstance(e, RuntimeError) and str(e) == "decode failed" for e in done)
+
+
+def test_full_batch_starts_without_waiting_for_the_window():
+    runner = Recorder()
+
+    async def run():
+        batcher = TranscriptionBatcher(runner, max_batch_size=2, window_ms=10_000)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(_clip(i), None, 0.0) for i in range(3)), return_exceptions=True), 0.5
+        )
+
+    # The third clip waits for a window that never ends within the test
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert [batch[0] for batch in runner.batches] == [[0.0, 1.0]]
+
+
+def test_lone_request_is_flushed_by_the_window():
+    runner = Recorder()
+
+    async def run():
+        batcher = TranscriptionBatcher(runner, max_batch_size=8, window_ms=30)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await batcher.submit(_clip(0), None, 0.0)
+        return loop.time() - started
+
+    waited = asyncio.run(run())
+
+    assert 0.025 <= waited < 0.5
+    assert len(runner.batches) == 1
+
+
+def test_batches_are_kept_apart_by_temperature():
+    runner = Recorder()
+
+    async def run():
+        batcher = TranscriptionBatcher(runner, max_batch_size=8, window_ms=20)
+        await asyncio.gather(batcher.submit(_clip(0), None, 0.0), batcher.submit(_clip(1), None, 0.4))
+
+    asyncio.run(run())
+
+    assert sorted((batch[2], batch[0]) for batch in runner.batches) == [(0.0, [0.0]), (0.4, [1.0])]
+
+
+def test_tier_batches_only_realtime_clips(monkeypatch):
+    single = []
+    monkeypatch.setattr(
+        whisper, "run_transcription",
+        lambda model, audio, **options: single.append(audio.size) or {"language": "en", "segments": []}
+    )
+    runner = Recorder()
+
+    async def run():
+        tier = WhisperTier("tiny", batch_max_size=8, batch_window_ms=5)
+        tier.model = object()
+        tier.batcher.run = runner
+        await tier.run(_clip(0), None, 0.0)
+        await tier.run(_clip(1), None, 0.0, realtime=True)
+        await tier.run(_clip(2, seconds=31), None, 0.0, realtime=True)
+
+    asyncio.run(run())
+
+    assert [batch[0] for batch in runner.batches] == [[1.0]]
+    assert single == [16000, 31 * 16000]
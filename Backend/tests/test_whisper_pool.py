@@ -0,0 +1,259 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from utils.whisper_pool import WhisperWorkerPool, WorkerCrashedError, _JobCancelled, _send_segment, _Worker
+
+AUDIO = np.zeros(1600, dtype=np.float32)
+RESULT = {"language": "en", "segments": []}
+
+
+class FakeWorker:
+    """Stands in for _Worker: runs jobs with a handler instead of a process"""
+
+    def __init__(self, index, handler=None, start_error=None):
+        self.index = index
+        self.pid = index
+        self.jobs = 0
+        self.restarts = 0
+        self.failed = False
+        self.handler = handler or (lambda on_segment: ("ok", RESULT))
+        self.start_error = start_error
+        self.is_alive = True
+        self.starts = 0
+        self.buffers = []
+
+    def request(self, message, timeout, on_segment=None, cancel=None):
+        kind, payload = message
+        if kind == "ping":
+            return "pong", None
+        self.buffers.append(payload[0])
+        return self.handler(on_segment)
+
+    def start(self, ready_timeout):
+        self.starts += 1
+        if self.start_error is not None:
+            raise WorkerCrashedError(self.start_error)
+        self.is_alive = True
+
+    def stop(self):
+        self.is_alive = False
+
+    def alive(self):
+        return self.is_alive
+
+
+def _pool(workers, **kwargs):
+    pool = WhisperWorkerPool("tiny", workers=len(workers), health_interval=0.01, **kwargs)
+    pool._workers = workers
+    pool._idle = asyncio.Queue()
+    for worker in workers:
+        pool._idle.put_nowait(worker)
+    pool._started = True
+    return pool
+
+
+def _released(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+
+async def _settle(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_successful_job_returns_the_worker_and_releases_the_buffer():
+    worker = FakeWorker(0)
+
+    async def run():
+        pool = _pool([worker])
+        try:
+            result = await pool.transcribe(AUDIO)
+            return result, pool.stats()
+        finally:
+            pool.close()
+
+    result, stats = asyncio.run(run())
+
+    assert result == RESULT
+    assert _released(worker.buffers[0])
+    assert stats["idle"] == 1 and stats["completed"] == 1
+
+
+@pytest.mark.parametrize("error, crashes", [(WorkerCrashedError("died"), 1), (ValueError("callback failed"), 0)])
+def test_failed_job_releases_the_buffer_and_restarts_the_worker(error, crashes):
+    def fail(on_segment):
+        raise error
+
+    worker = FakeWorker(0, handler=fail)
+
+    async def run():
+        pool = _pool([worker])
+        try:
+            with pytest.raises(type(error)):
+                await pool.transcribe(AUDIO)
+            await _settle(lambda: pool._idle.qsize() == 1)
+            return pool.stats()
+        finally:
+            pool.close()
+
+    stats = asyncio.run(run())
+
+    assert _released(worker.buffers[0])
+    assert worker.starts == 1 and worker.restarts == 1
+    assert stats["failed"] == 1 and stats["crashes"] == crashes
+
+
+def test_error_after_cancel_still_restarts_the_worker():
+    release = threading.Event()
+
+    def slow_then_fail(on_segment):
+        release.wait(2)
+        raise RuntimeError("loop closed")
+
+    worker = FakeWorker(0, handler=slow_then_fail)
+
+    async def run():
+        pool = _pool([worker])
+        try:
+            task = asyncio.ensure_future(pool.transcribe(AUDIO))
+            await _settle(lambda: worker.buffers)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The buffer stays alive while the worker may still read it
+            assert not _released(worker.buffers[0])
+            release.set()
+            await _settle(lambda: pool._idle.qsize() == 1)
+        finally:
+            pool.close()
+
+    asyncio.run(run())
+
+    assert _released(worker.buffers[0])
+    assert worker.restarts == 1
+
+
+def test_pool_fails_when_no_worker_can_be_restarted():
+    def crash(on_segment):
+        raise WorkerCrashedError("died")
+
+    worker = FakeWorker(0, handler=crash, start_error="model not found")
+
+    async def run():
+        pool = _pool([worker], restart_attempts=2)
+        try:
+            with pytest.raises(WorkerCrashedError):
+                await pool.transcribe(AUDIO)
+            # Admitted while the restarts are still being attempted
+            waiting = asyncio.ensure_future(pool.transcribe(AUDIO))
+            with pytest.raises(WorkerCrashedError, match="no worker could be restarted"):
+                await asyncio.wait_for(waiting, 2)
+            with pytest.raises(WorkerCrashedError, match="no worker could be restarted"):
+                await pool.transcribe(AUDIO)
+            return pool.stats()
+        finally:
+            pool.close()
+
+    stats = asyncio.run(run())
+
+    assert worker.starts == 2
+    assert worker.failed
+    assert stats["error"] is not None
+
+
+def test_health_loop_restarts_dead_workers_and_keeps_healthy_ones():
+    healthy, dead = FakeWorker(0), FakeWorker(1)
+    dead.is_alive = False
+
+    async def run():
+        pool = _pool([healthy, dead])
+        loop = asyncio.ensure_future(pool._health_loop())
+        try:
+            await _settle(lambda: dead.restarts == 1 and pool._idle.qsize() == 2)
+            return pool.stats()
+        finally:
+            loop.cancel()
+            pool.close()
+
+    stats = asyncio.run(run())
+
+    assert healthy.starts == 0
+    assert stats["crashes"] >= 1
+
+
+def test_cancel_stops_a_streaming_job_at_its_next_segment():
+    parent, child = multiprocessing.Pipe()
+    worker = _Worker(None, 0, "tiny", 1)
+    worker.conn = parent
+    sent = []
+
+    def child_main():
+        # Plays the worker process's side of a transcribe_stream job
+        child.recv()
+        try:
+            for index in range(200):
+                sent.append(index)
+                _send_segment(child, {"index": index})
+                time.sleep(0.005)
+            child.send(("ok", None))
+        except _JobCancelled:
+            child.send(("cancelled", None))
+
+    thread = threading.Thread(target=child_main)
+    thread.start()
+    cancel = threading.Event()
+    received = []
+
+    def on_segment(segment):
+        received.append(segment["index"])
+        if len(received) == 2:
+            cancel.set()
+
+    status, _ = worker.request(("transcribe_stream", None), 5.0, on_segment, cancel)
+    thread.join(5)
+
+    assert status == "cancelled"
+    assert received == [0, 1]
+    assert len(sent) < 20
+
+
+def test_abandoned_stream_returns_the_worker_without_a_restart():
+    def stream(on_segment):
+        time.sleep(0.05)
+        # A worker that was told to cancel answers "cancelled" instead of a result
+        return "cancelled", None
+
+    worker = FakeWorker(0, handler=stream)
+
+    async def run():
+        pool = _pool([worker])
+        try:
+            cancel = threading.Event()
+            task = asyncio.ensure_future(pool.transcribe_stream(AUDIO, lambda s: None, cancel=cancel))
+            await asyncio.sleep(0)
+            cancel.set()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await _settle(lambda: pool._idle.qsize() == 1)
+            return pool.stats()
+        finally:
+            pool.close()
+
+    stats = asyncio.run(run())
+
+    assert stats["cancelled"] == 1
+    assert worker.starts == 0
@@ -0,0 +1,264 @@
+import io
+import shutil
+import subprocess
+import wave
+from functools import partial
+from typing import Dict, Any
+import logging
+
+import numpy as np
+
+from utils.audio_preprocessing import StreamResampler, normalize_peak, pcm16_to_float32, resample
+
+logger = logging.getLogger(__name__)
+
+# Sample rate Whisper models expect
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(Exception):
+    """Raised when uploaded audio cannot be decoded by any available decoder"""
+
+
+def _decode_wav(data: bytes, sample_rate: int) -> np.ndarray:
+    """Decode 16-bit (or 8/32-bit) PCM WAV with the standard library"""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 2:
+        return resample(pcm16_to_float32(frames, channels), rate, sample_rate)
+    if width == 4:
+        audio = np.frombuffer(frames, dtype="<i4").astype(np.float32)
+        audio *= 1.0 / 2147483648.0
+    elif width == 1:
+        audio = np.frombuffer(frames, dtype=np.uint8).astype(np.float32)
+        audio -= 128.0
+        audio *= 1.0 / 128.0
+    else:
+        raise AudioDecodeError(f"Unsupported WAV sample width: {width * 8} bits")
+
+    if channels > 1:
+        audio = audio[:audio.size - audio.size % channels].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return resample(audio, rate, sample_rate)
+
+
+def _decode_av(data: bytes, sample_rate: int) -> np.ndarray:
+    """Decode any container PyAV understands from a seekable in-memory buffer"""
+    # faster-whisper ships PyAV and a decoder that resamples to mono float32
+    from faster_whisper.audio import decode_audio
+    return decode_audio(io.BytesIO(data), sampling_rate=sample_rate)
+
+
+def _decode_ffmpeg(data: bytes, sample_rate: int, timeout: float = 30.0) -> np.ndarray:
+    """Pipe the bytes through ffmpeg, reading raw float32 PCM back from stdout"""
+    if shutil.which("ffmpeg") is None:
+        raise AudioDecodeError("ffmpeg is not installed")
+    try:
+        process = subprocess.run(
+            [
+                "ffmpeg", "-nostdin", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate),
+                "pipe:1"
+            ],
+            input=data,
+            capture_output=True,
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        # subprocess.run has already killed ffmpeg; a crafted upload must not hold the thread
+        raise AudioDecodeError(f"ffmpeg did not finish within {timeout:g}s")
+    if process.returncode != 0:
+        raise AudioDecodeError(process.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+class AudioDecoder:
+    """
+    Decodes uploaded audio bytes to a mono float32 array without touching disk
+
+    PCM WAV (what the realtime client sends) is parsed directly; other formats
+    go through PyAV on an in-memory buffer, falling back to an ffmpeg pipe.
+    Blocking; call it off the event loop.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, normalize: bool = False, ffmpeg_timeout: float = 30.0):
+        """
+        Initialize the decoder
+
+        Args:
+            sample_rate: Output sample rate in Hz
+            normalize: Scale decoded audio in place to a fixed peak (silence is left as is)
+            ffmpeg_timeout: Seconds an ffmpeg decode may run before it is killed
+        """
+        self.sample_rate = sample_rate
+        self.normalize = normalize
+        self._decoders = [
+            ("wav", _decode_wav),
+            ("av", _decode_av),
+            ("ffmpeg", partial(_decode_ffmpeg, timeout=ffmpeg_timeout)),
+        ]
+        self.decoded = {name: 0 for name, _ in self._decoders}
+        self.failures = 0
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """
+        Decode audio bytes
+
+        Args:
+            data: Encoded audio (WAV, MP3, M4A, WebM, ...)
+
+        Returns:
+            Mono float32 samples in [-1, 1] at sample_rate
+
+        Raises:
+            AudioDecodeError: If no decoder could read the audio
+        """
+        if not data:
+            raise AudioDecodeError("Empty audio")
+
+        errors = []
+        for name, decoder in self._decoders:
+            if name == "wav" and data[:4] != b"RIFF":
+                continue
+            try:
+                audio = decoder(data, self.sample_rate)
+            except Exception as e:
+                logger.debug(f"{name} could not decode audio: {e}")
+                errors.append(f"{name}: {e}")
+                continue
+            self.decoded[name] += 1
+            return normalize_peak(audio) if self.normalize else audio
+
+        self.failures += 1
+        raise AudioDecodeError(f"Could not decode audio ({'; '.join(errors)})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-decoder counters"""
+        return {"decoded": dict(self.decoded), "failures": self.failures}
+
+
+def pcm_to_wav(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """
+    Encode mono float32 samples as 16-bit PCM WAV bytes (in memory)
+
+    Args:
+        audio: Mono float32 samples in [-1, 1]
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        WAV file contents
+    """
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return output.getvalue()
+
+
+class PcmStreamDecoder:
+    """Incremental decoder for a raw 16-bit little-endian PCM stream split into arbitrary messages"""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = 1, output_rate: int = SAMPLE_RATE):
+        """
+        Initialize the decoder
+
+        Args:
+            sample_rate: Sample rate of the incoming stream in Hz
+            channels: Interleaved channels in the incoming stream
+            output_rate: Sample rate of the decoded output in Hz
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.output_rate = output_rate
+        self._pending = b""
+        # Stateful, so messages are resampled as one continuous signal
+        self._resampler = StreamResampler(sample_rate, output_rate) if sample_rate != output_rate else None
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """
+        Decode the next piece of the stream
+
+        Args:
+            data: Raw PCM bytes; a trailing partial sample is kept for the next call
+
+        Returns:
+            Mono float32 samples at output_rate
+        """
+        data = self._pending + data
+        usable = len(data) - len(data) % (2 * self.channels)
+        self._pending = data[usable:]
+        audio = pcm16_to_float32(memoryview(data)[:usable], self.channels)
+        return self._resampler.push(audio) if self._resampler is not None else audio
+
+    def flush(self) -> np.ndarray:
+        """
+        End the stream
+
+        Returns:
+            The samples still held back by the resampler's filter delay
+        """
+        if self._resampler is None:
+            return np.zeros(0, dtype=np.float32)
+        return self._resampler.flush()
+
+
+class OpusStreamDecoder:
+    """Incremental decoder for raw Opus packets (one packet per message), using PyAV"""
+
+    def __init__(self, sample_rate: int = 48000, channels: int = 1, output_rate: int = SAMPLE_RATE):
+        """
+        Initialize the decoder
+
+        Args:
+            sample_rate: Sample rate the stream was encoded at in Hz
+            channels: Channels in the stream
+            output_rate: Sample rate of the decoded output in Hz
+
+        Raises:
+            AudioDecodeError: If PyAV is not installed
+        """
+        try:
+            import av
+        except ImportError:
+            raise AudioDecodeError("Opus streams require PyAV (installed with faster-whisper)")
+        self._av = av
+        self._codec = av.CodecContext.create("opus", "r")
+        self._codec.sample_rate = sample_rate
+        self._codec.layout = "stereo" if channels > 1 else "mono"
+        self._resampler = av.AudioResampler(format="flt", layout="mono", rate=output_rate)
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """
+        Decode one Opus packet
+
+        Args:
+            data: One Opus packet
+
+        Returns:
+            Mono float32 samples at output_rate
+        """
+        chunks = []
+        for frame in self._codec.decode(self._av.Packet(data)):
+            for resampled in self._resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        return self._join(chunks)
+
+    def flush(self) -> np.ndarray:
+        """
+        End the stream
+
+        Returns:
+            The samples still buffered in the resampler
+        """
+        return self._join([frame.to_ndarray().reshape(-1) for frame in self._resampler.resample(None)])
+
+    @staticmethod
+    def _join(chunks) -> np.ndarray:
+        return np.concatenate(chunks).astype(np.float32, copy=False) if chunks else np.zeros(0, dtype=np.float32)
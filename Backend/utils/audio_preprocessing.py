@@ -0,0 +1,198 @@
+import math
+from functools import lru_cache
+from typing import Tuple, Union
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.signal import resample_poly as _scipy_resample_poly
+except ImportError:  # scipy is optional; the numpy resampler below gives the same result
+    _scipy_resample_poly = None
+
+
+def pcm16_to_float32(data: Union[bytes, memoryview], channels: int = 1) -> np.ndarray:
+    """
+    Convert 16-bit little-endian PCM to mono float32 in [-1, 1)
+
+    The int16 samples are read through a zero-copy view of the input, and the
+    output is the only array allocated: scaling happens in place and
+    multi-channel audio is averaged straight into float32.
+
+    Args:
+        data: Raw interleaved PCM bytes (a trailing partial frame is ignored)
+        channels: Interleaved channels
+
+    Returns:
+        Mono float32 samples
+    """
+    samples = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+    if channels > 1:
+        samples = samples[:samples.size - samples.size % channels].reshape(-1, channels)
+        audio = samples.mean(axis=1, dtype=np.float32)
+    else:
+        audio = samples.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+
+def normalize_peak(audio: np.ndarray, target: float = 0.95, min_peak: float = 1e-4) -> np.ndarray:
+    """
+    Scale audio in place so that its peak amplitude is target
+
+    Args:
+        audio: Float32 samples (copied first if read-only)
+        target: Peak amplitude after scaling
+        min_peak: Audio quieter than this is digital silence and is left untouched
+                  (instead of dividing by zero or blowing up the noise floor)
+
+    Returns:
+        The scaled array
+    """
+    if audio.size == 0:
+        return audio
+    if not audio.flags.writeable:
+        audio = audio.copy()
+    # max / -min instead of np.abs, which would allocate a second array
+    peak = max(float(audio.max()), -float(audio.min()))
+    if peak >= min_peak:
+        audio *= target / peak
+    return audio
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """
+    Anti-aliasing low-pass FIR split into its up phases (the design scipy's resample_poly uses)
+
+    Returns:
+        Per-phase taps, reversed, with shape (up, taps per phase), and the filter's half length
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    length = 2 * half_len + 1
+    cutoff = 1.0 / max_rate
+    taps = cutoff * np.sinc(cutoff * (np.arange(length) - half_len)) * np.kaiser(length, 5.0)
+    taps *= up / taps.sum()
+    per_phase = math.ceil(length / up)
+    padded = np.zeros(up * per_phase)
+    padded[:length] = taps
+    # phases[p, k] = taps[p + k * up]; reversed so a phase is a dot product with a forward window
+    phases = padded.reshape(per_phase, up).T[:, ::-1]
+    return np.ascontiguousarray(phases, dtype=np.float32), half_len
+
+
+class StreamResampler:
+    """
+    Polyphase resampler that can be fed a signal piece by piece
+
+    Equivalent to upsampling by up, low-pass filtering and keeping every
+    down-th sample, but each output is computed directly from the input
+    samples under the filter. The input is kept only as far back as the
+    filter reaches, so pieces join seamlessly.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int):
+        """
+        Initialize the resampler
+
+        Args:
+            source_rate: Sample rate of the input in Hz
+            target_rate: Sample rate of the output in Hz
+        """
+        divisor = math.gcd(source_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = source_rate // divisor
+        self._phases, self._half_len = _polyphase_filter(self.up, self.down)
+        self._taps = self._phases.shape[1]
+
+        # Input samples not needed any more are dropped; _origin is the input
+        # index of _buffer[0] (negative: zeros before the start of the signal)
+        self._origin = -(self._taps - 1)
+        self._buffer = np.zeros(self._taps - 1, dtype=np.float32)
+        self._received = 0
+        self._produced = 0
+
+    def _base(self, n: int) -> int:
+        """Newest input index under the filter for output n"""
+        return (n * self.down + self._half_len) // self.up
+
+    def push(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Resample the next piece of the signal
+
+        Args:
+            audio: Float32 samples at source_rate
+
+        Returns:
+            Every output sample whose inputs are all available by now
+        """
+        self._buffer = np.concatenate((self._buffer, audio.astype(np.float32, copy=False)))
+        self._received += audio.size
+        # Output n can be computed once input _base(n) has arrived
+        end = max(self._produced, -(-(self._received * self.up - self._half_len) // self.down))
+        return self._produce(end)
+
+    def flush(self) -> np.ndarray:
+        """
+        Finish the signal (zeros are assumed after its end)
+
+        Returns:
+            The remaining output samples
+        """
+        end = -(-self._received * self.up // self.down)
+        if end > self._produced:
+            missing = self._base(end - 1) + 1 - (self._origin + self._buffer.size)
+            if missing > 0:
+                self._buffer = np.concatenate((self._buffer, np.zeros(missing, dtype=np.float32)))
+        return self._produce(end)
+
+    def _produce(self, end: int) -> np.ndarray:
+        start = self._produced
+        output = np.empty(max(0, end - start), dtype=np.float32)
+        if output.size == 0:
+            return output
+
+        windows = np.lib.stride_tricks.sliding_window_view(self._buffer, self._taps)
+        # Outputs with the same phase read windows exactly down samples apart
+        for offset in range(min(self.up, output.size)):
+            n = start + offset
+            phase = (n * self.down + self._half_len) % self.up
+            first = self._base(n) - self._taps + 1 - self._origin
+            count = len(range(offset, output.size, self.up))
+            rows = windows[first:first + (count - 1) * self.down + 1:self.down]
+            # einsum reads the strided windows directly; matmul would be ~3x slower on them
+            output[offset::self.up] = np.einsum("ij,j->i", rows, self._phases[phase])
+
+        # Keep only the input the next output still needs
+        keep_from = self._base(end) - self._taps + 1
+        self._buffer = self._buffer[keep_from - self._origin:].copy()
+        self._origin = keep_from
+        self._produced = end
+        return output
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Polyphase resample of a mono float32 signal (anti-aliased, unlike linear interpolation)
+
+    Uses scipy's resample_poly when scipy is installed, otherwise the
+    equivalent numpy implementation.
+
+    Args:
+        audio: Mono float32 samples at source_rate
+        source_rate: Input sample rate in Hz
+        target_rate: Output sample rate in Hz
+
+    Returns:
+        Mono float32 samples at target_rate
+    """
+    if source_rate == target_rate or audio.size == 0:
+        return audio
+    if _scipy_resample_poly is not None:
+        divisor = math.gcd(source_rate, target_rate)
+        return _scipy_resample_poly(audio, target_rate // divisor, source_rate // divisor).astype(np.float32, copy=False)
+    resampler = StreamResampler(source_rate, target_rate)
+    return np.concatenate((resampler.push(audio), resampler.flush()))
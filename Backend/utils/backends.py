@@ -0,0 +1,382 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Union
+import logging
+
+from PIL import Image
+
+from config import settings
+from utils.executor import ExecutorSaturatedError
+
+logger = logging.getLogger(__name__)
+
+ImagePart = Union[Image.Image, Dict[str, Any]]
+# One image part, or several (e.g. a close-up of a region plus an overview)
+ImageInput = Union[ImagePart, List[ImagePart]]
+
+
+def image_parts(image: ImageInput) -> List[ImagePart]:
+    """Normalize an image argument to a list of image parts"""
+    return list(image) if isinstance(image, (list, tuple)) else [image]
+
+
+class EmptyResponseError(Exception):
+    """Raised when a model returns a response without any content"""
+
+
+class VisionBackend(ABC):
+    """
+    Interface for drawing analysis and chat backends
+
+    Subclasses must implement the raising generate_* / stream_* / summarize
+    methods (a backend missing one cannot be instantiated); the
+    friendly-fallback wrappers are shared.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def generate_image_analysis(self, image: ImageInput, prompt: str = None) -> str:
+        """Analyze an image (or several, in order), raising on failure"""
+
+    @abstractmethod
+    async def generate_text(self, prompt: str) -> str:
+        """Generate a text-only response, raising on failure"""
+
+    @abstractmethod
+    def stream_image_analysis(self, image: ImageInput, prompt: str) -> AsyncGenerator[str, None]:
+        """Analyze an image (or several, in order), yielding text chunks as they are generated"""
+
+    @abstractmethod
+    def stream_text_only(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Generate a text-only response, yielding text chunks as they are generated"""
+
+    @abstractmethod
+    async def summarize_conversation(self, previous_summary: str, transcript: str, max_words: int = 300) -> str:
+        """Fold older conversation turns into a rolling summary"""
+
+    async def warmup(self):
+        """Open connections to the upstream API ahead of the first request"""
+
+    async def close(self):
+        """Release connections, processes and other resources at shutdown"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics of the backend"""
+        return {"backend": self.name}
+
+    async def analyze_image(self, image: ImageInput, prompt: str = None) -> str:
+        """
+        Analyze an image, returning a friendly message instead of raising
+
+        Args:
+            image: PIL Image object, or an encoded {"mime_type", "data"} image part
+            prompt: Custom prompt for analysis
+
+        Returns:
+            Analysis text
+        """
+        try:
+            return await self.generate_image_analysis(image, prompt)
+        except ExecutorSaturatedError:
+            raise
+        except Exception as e:
+            return self.describe_analysis_error(e)
+
+    def describe_analysis_error(self, error: Exception) -> str:
+        """
+        Build the friendly message returned in place of a failed drawing analysis
+
+        Args:
+            error: Exception raised by generate_image_analysis
+
+        Returns:
+            Message to show the user
+        """
+        if isinstance(error, EmptyResponseError):
+            return "I can see your drawing, but I'm having trouble analyzing it right now. Could you try again?"
+
+        logger.error(f"Error in {self.name} vision analysis: {error}")
+        return f"I apologize, but I encountered an error while analyzing your drawing: {str(error)}"
+
+    async def analyze_text_only(self, prompt: str) -> str:
+        """
+        Generate a text response, returning a friendly message instead of raising
+
+        Args:
+            prompt: Text prompt for generation
+
+        Returns:
+            Generated text response
+        """
+        try:
+            return await self.generate_text(prompt)
+        except ExecutorSaturatedError:
+            raise
+        except Exception as e:
+            return self.describe_text_error(e)
+
+    def describe_text_error(self, error: Exception) -> str:
+        """
+        Build the friendly message returned in place of a failed text response
+
+        Args:
+            error: Exception raised by generate_text
+
+        Returns:
+            Message to show the user
+        """
+        if isinstance(error, EmptyResponseError):
+            return "I'd be happy to help!"
+
+        logger.error(f"Error in {self.name} text generation: {error}")
+        return f"I encountered an error: {str(error)}"
+
+    @staticmethod
+    def contents_key(contents) -> str:
+        """
+        Digest of normalized request contents
+
+        Prompts are whitespace-normalized and images are hashed by their
+        encoded bytes (or raw pixels for PIL images), so the same canvas and
+        question always map to the same key.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        for part in contents if isinstance(contents, list) else [contents]:
+            if isinstance(part, str):
+                digest.update(b"t:" + " ".join(part.split()).encode("utf-8"))
+            elif isinstance(part, dict):
+                digest.update(f"b:{part['mime_type']}:".encode("utf-8"))
+                digest.update(part["data"])
+            else:
+                digest.update(f"i:{part.mode}:{part.width}x{part.height}:".encode("utf-8"))
+                digest.update(part.tobytes())
+        return digest.hexdigest()
+
+
+class TranscriptionBackend(ABC):
+    """Interface for speech-to-text backends"""
+
+    name = "base"
+
+    @abstractmethod
+    async def transcribe(
+        self,
+        audio: bytes,
+        language: Optional[str] = None,
+        temperature: float = 0.0,
+        realtime: bool = False
+    ) -> Dict[str, Any]:
+        """Transcribe encoded audio bytes; returns text, language, segments, confidence, duration, model"""
+
+    async def transcribe_stream(
+        self,
+        audio: bytes,
+        language: Optional[str] = None,
+        temperature: float = 0.0
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Transcribe encoded audio bytes, yielding {"type": "segment", ...} messages and a final {"type": "done", ...}
+
+        Backends that cannot stream transcribe the whole file first and then yield its segments.
+        """
+        result = await self.transcribe(audio, language=language, temperature=temperature)
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        for segment in result.get("segments", []):
+            yield {"type": "segment", **segment}
+        done = {key: value for key, value in result.items() if key != "segments"}
+        yield {"type": "done", **done}
+
+    @abstractmethod
+    async def transcribe_chunk(self, audio: bytes, session_id: str, chunk_index: int, language: Optional[str] = None) -> Dict[str, Any]:
+        """Transcribe one chunk of a realtime session (language, if given, pins the session's language)"""
+
+    @abstractmethod
+    def clear_session(self, session_id: str) -> bool:
+        """Forget a realtime session; returns whether it existed"""
+
+    def get_supported_languages(self) -> list:
+        """Get list of supported languages"""
+        return [
+            "en", "zh", "de", "es", "ru", "ko", "fr", "ja", "pt", "tr", "pl", "ca", "nl",
+            "ar", "sv", "it", "id", "hi", "fi", "vi", "he", "uk", "el", "ms", "cs", "ro",
+            "da", "hu", "ta", "no", "th", "ur", "hr", "bg", "lt", "la", "mi", "ml", "cy",
+            "sk", "te", "fa", "lv", "bn", "sr", "az", "sl", "kn", "et", "mk", "br", "eu",
+            "is", "hy", "ne", "mn", "bs", "kk", "sq", "sw", "gl", "mr", "pa", "si", "km",
+            "sn", "yo", "so", "af", "oc", "ka", "be", "tg", "sd", "gu", "am", "yi", "lo",
+            "uz", "fo", "ht", "ps", "tk", "nn", "mt", "sa", "lb", "my", "bo", "tl", "mg",
+            "as", "tt", "haw", "ln", "ha", "ba", "jw", "su"
+        ]
+
+    async def warmup(self):
+        """Load and warm up models ahead of the first request"""
+
+    def health_error(self) -> Optional[str]:
+        """Why the backend can no longer serve requests after warmup (e.g. its workers are gone), or None"""
+        return None
+
+    async def close(self):
+        """Release connections, processes and other resources at shutdown"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics of the backend"""
+        return {"backend": self.name}
+
+
+class SpeechBackend(ABC):
+    """Interface for text-to-speech backends"""
+
+    name = "base"
+
+    @abstractmethod
+    async def text_to_speech(self, text: str, voice_id: str, model_id: str, voice_settings: Optional[Dict] = None) -> bytes:
+        """Convert text to MP3 audio"""
+
+    @abstractmethod
+    def text_to_speech_stream(self, text: str, voice_id: str, model_id: str) -> AsyncGenerator[bytes, None]:
+        """Convert text to MP3 audio, yielding chunks"""
+
+    @abstractmethod
+    async def get_voices(self) -> Dict[str, Any]:
+        """List available voices"""
+
+    @abstractmethod
+    async def get_voice_settings(self, voice_id: str) -> Dict[str, Any]:
+        """Get settings of a voice"""
+
+    async def warmup(self):
+        """Open connections to the upstream API ahead of the first request"""
+
+    async def close(self):
+        """Release connections, processes and other resources at shutdown"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics of the backend"""
+        return {"backend": self.name}
+
+
+class BackendRegistry:
+    """Maps backend names to factories; vendor modules are only imported when selected"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._factories: Dict[str, Callable[[], Any]] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register a backend factory
+
+        Args:
+            name: Name used in configuration (e.g. "gemini", "stub")
+            factory: Zero-argument callable returning a backend instance
+        """
+        self._factories[name] = factory
+
+    def create(self, name: str):
+        """
+        Instantiate the backend registered under name
+
+        Raises:
+            ValueError: If no backend is registered under that name
+        """
+        if name not in self._factories:
+            raise ValueError(
+                f"Unknown {self.kind} backend '{name}'. Available: {', '.join(sorted(self._factories))}"
+            )
+        logger.info(f"Using {self.kind} backend: {name}")
+        return self._factories[name]()
+
+    def names(self):
+        return sorted(self._factories)
+
+
+def _gemini_factory():
+    from utils.gemini import GeminiVisionAnalyzer
+    return GeminiVisionAnalyzer()
+
+
+def _whisper_factory():
+    from utils.model_router import ModelRouter
+    from utils.whisper import WhisperTier, WhisperTranscriber
+    from utils.whisper_pool import WhisperWorkerPool
+    sizes = [size.strip() for size in settings.WHISPER_FAST_MODELS.split(",") if size.strip()]
+    sizes = [size for size in sizes if size != settings.WHISPER_MODEL] + [settings.WHISPER_MODEL]
+    # Every tier has its own workers; by default they all share the machine's cores
+    cpu_threads = settings.WHISPER_CPU_THREADS or max(
+        1, (os.cpu_count() or 1) // max(1, settings.WHISPER_WORKERS * len(sizes))
+    )
+    tiers = []
+    for size in sizes:
+        pool = None
+        if settings.WHISPER_WORKERS > 0:
+            pool = WhisperWorkerPool(
+                size,
+                workers=settings.WHISPER_WORKERS,
+                cpu_threads=cpu_threads,
+                max_queue=settings.WHISPER_MAX_QUEUE,
+                job_timeout=settings.WHISPER_JOB_TIMEOUT_SECONDS,
+                health_interval=settings.WHISPER_HEALTH_CHECK_SECONDS,
+                restart_attempts=settings.WHISPER_RESTART_ATTEMPTS
+            )
+        tiers.append(WhisperTier(
+            model_size=size,
+            pool=pool,
+            batch_max_size=settings.WHISPER_BATCH_MAX_SIZE,
+            batch_window_ms=settings.WHISPER_BATCH_WINDOW_MS
+        ))
+    router = ModelRouter(
+        sizes,
+        realtime_max_seconds=settings.WHISPER_REALTIME_MAX_SECONDS,
+        overload_depth=settings.WHISPER_OVERLOAD_DEPTH
+    )
+    return WhisperTranscriber(tiers, router)
+
+
+def _elevenlabs_factory():
+    from utils.elevenlabs import ElevenLabsTTS
+    return ElevenLabsTTS()
+
+
+def _stub_vision_factory():
+    from utils.stub_backends import StubVisionBackend
+    return StubVisionBackend()
+
+
+def _stub_transcription_factory():
+    from utils.stub_backends import StubTranscriptionBackend
+    return StubTranscriptionBackend()
+
+
+def _stub_speech_factory():
+    from utils.stub_backends import StubSpeechBackend
+    return StubSpeechBackend()
+
+
+vision_backends = BackendRegistry("vision")
+vision_backends.register("gemini", _gemini_factory)
+vision_backends.register("stub", _stub_vision_factory)
+
+transcription_backends = BackendRegistry("transcription")
+transcription_backends.register("whisper", _whisper_factory)
+transcription_backends.register("stub", _stub_transcription_factory)
+
+speech_backends = BackendRegistry("speech")
+speech_backends.register("elevenlabs", _elevenlabs_factory)
+speech_backends.register("stub", _stub_speech_factory)
+
+
+def create_vision_backend() -> VisionBackend:
+    """Create the drawing analysis backend selected by VISION_BACKEND"""
+    return vision_backends.create(settings.VISION_BACKEND)
+
+
+def create_transcription_backend() -> TranscriptionBackend:
+    """Create the speech-to-text backend selected by TRANSCRIPTION_BACKEND"""
+    return transcription_backends.create(settings.TRANSCRIPTION_BACKEND)
+
+
+def create_speech_backend() -> SpeechBackend:
+    """Create the text-to-speech backend selected by SPEECH_BACKEND"""
+    return speech_backends.create(settings.SPEECH_BACKEND)
@@ -0,0 +1,279 @@
+import base64
+import binascii
+import hmac
+import io
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class CanvasSyncError(Exception):
+    """Raised for malformed canvas sync messages"""
+
+
+def _decode_payload(data: str) -> bytes:
+    """Decode base64 payload, accepting both plain base64 and data URLs"""
+    if data.startswith("data:"):
+        data = data.split(",", 1)[1]
+    try:
+        return base64.b64decode(data, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise CanvasSyncError(f"Invalid base64 payload: {e}")
+
+
+class CanvasSession:
+    """Authoritative server-side raster for one drawing session"""
+
+    def __init__(self, width: int, height: int, background: tuple, token: str):
+        # Issued on canvas_init; required to patch or reset the canvas
+        self.token = token
+        self.pixels = np.empty((height, width, 3), dtype=np.uint8)
+        self.pixels[:] = background
+        self.seq = 0
+        self.patches_applied = 0
+        self.bytes_received = 0
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def width(self) -> int:
+        return self.pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.pixels.shape[0]
+
+
+class CanvasStore:
+    """Per-session canvases kept in sync through dirty-rectangle patches"""
+
+    def __init__(self, max_sessions: int = 200, idle_ttl_seconds: float = 1800.0, max_dimension: int = 4096):
+        """
+        Initialize the canvas store
+
+        Args:
+            max_sessions: Maximum number of canvases kept (least recently used are dropped)
+            idle_ttl_seconds: Canvases untouched for this long are dropped
+            max_dimension: Maximum canvas width/height accepted
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_dimension = max_dimension
+
+        self._sessions: "OrderedDict[str, CanvasSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.patches_applied = 0
+        self.resyncs_requested = 0
+        self.bytes_received = 0
+        self.evictions = 0
+
+    def init_session(
+        self,
+        session_id: str,
+        width: int,
+        height: int,
+        background: str = "#ffffff",
+        image: Optional[str] = None,
+        token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Create (or reset) the canvas for a session
+
+        A new canvas gets a fresh token. Resetting an existing canvas needs
+        its token, so a client that only knows the session_id cannot replace
+        somebody else's canvas.
+
+        Args:
+            session_id: Drawing session identifier
+            width: Canvas width in pixels
+            height: Canvas height in pixels
+            background: Background colour as a hex string
+            image: Optional base64 image / data URL with the full current canvas
+            token: Token of the existing canvas, when resetting it
+
+        Returns:
+            Acknowledgement with the canvas size, sequence number and token
+        """
+        width, height = int(width), int(height)
+        if not (0 < width <= self.max_dimension and 0 < height <= self.max_dimension):
+            raise CanvasSyncError(f"Canvas size must be between 1 and {self.max_dimension} pixels per side")
+
+        try:
+            fill = Image.new("RGB", (1, 1), background).getpixel((0, 0))
+        except ValueError:
+            raise CanvasSyncError(f"Invalid background colour: {background}")
+
+        existing = self._get(session_id)
+        if existing is not None:
+            self._check_token(existing, token)
+
+        session = CanvasSession(width, height, fill, existing.token if existing is not None else secrets.token_urlsafe(16))
+        if image:
+            payload = _decode_payload(image)
+            self._paste(session, 0, 0, Image.open(io.BytesIO(payload)).convert("RGB"))
+            session.bytes_received += len(payload)
+
+        with self._lock:
+            current = self._sessions.get(session_id)
+            # Another client may have created the session while the image was decoded
+            if current is not None and current is not existing:
+                raise CanvasSyncError("Canvas session was created by another client")
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = session
+            self._evict()
+
+        return {"seq": session.seq, "width": width, "height": height, "canvas_token": session.token}
+
+    def apply_patches(self, session_id: str, token: Optional[str], seq: int, patches: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply a batch of dirty-rectangle patches
+
+        Each patch is {"x", "y", "encoding", "data"} where encoding is "png"
+        (any PIL-readable image as base64 / data URL) or "rgba" (raw
+        base64 RGBA bytes, as from getImageData, with "width" and "height").
+
+        Batches must arrive with consecutive sequence numbers. A repeated
+        sequence number is ignored; a gap means an update was lost, and the
+        client is asked to resend the full canvas. Every patch is decoded
+        before any is written, so a bad patch leaves the canvas unchanged.
+
+        Args:
+            session_id: Drawing session identifier
+            token: Token returned by init_session
+            seq: Sequence number of this batch
+            patches: List of patch dictionaries
+
+        Returns:
+            Acknowledgement, or a resync request
+        """
+        session = self._get(session_id)
+        if session is None:
+            self.resyncs_requested += 1
+            return {"status": "resync", "reason": "unknown_session", "seq": 0}
+        self._check_token(session, token)
+
+        with session.lock:
+            if seq <= session.seq:
+                return {"status": "duplicate", "seq": session.seq}
+            if seq != session.seq + 1:
+                self.resyncs_requested += 1
+                return {"status": "resync", "reason": "sequence_gap", "seq": session.seq}
+
+            if not isinstance(patches, list):
+                raise CanvasSyncError("patches must be a list")
+            decoded = [self._decode_patch(patch) for patch in patches]
+            for x, y, rgb, _ in decoded:
+                self._paste_array(session, x, y, rgb)
+            received = sum(size for _, _, _, size in decoded)
+
+            session.seq = seq
+            session.patches_applied += len(patches)
+            session.bytes_received += received
+            session.last_active = time.monotonic()
+
+        self.patches_applied += len(patches)
+        self.bytes_received += received
+        return {"status": "ok", "seq": seq}
+
+    @staticmethod
+    def _check_token(session: CanvasSession, token: Optional[str]):
+        if not isinstance(token, str) or not hmac.compare_digest(token, session.token):
+            raise CanvasSyncError("Invalid canvas_token for this session")
+
+    @staticmethod
+    def _decode_patch(patch: Dict[str, Any]) -> Tuple[int, int, np.ndarray, int]:
+        """Decode one patch into (x, y, RGB pixels, payload size), raising CanvasSyncError if it is malformed"""
+        if not isinstance(patch, dict):
+            raise CanvasSyncError("Each patch must be an object")
+        payload = _decode_payload(patch.get("data", ""))
+        try:
+            x, y = int(patch.get("x", 0)), int(patch.get("y", 0))
+            if patch.get("encoding", "png") == "rgba":
+                w, h = int(patch["width"]), int(patch["height"])
+                if w <= 0 or h <= 0 or len(payload) != w * h * 4:
+                    raise CanvasSyncError("RGBA patch size does not match width x height")
+                rgb = np.frombuffer(payload, dtype=np.uint8).reshape(h, w, 4)[:, :, :3]
+            else:
+                rgb = np.asarray(Image.open(io.BytesIO(payload)).convert("RGB"))
+        except CanvasSyncError:
+            raise
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            raise CanvasSyncError(f"Invalid patch: {e}")
+        return x, y, rgb, len(payload)
+
+    def _paste(self, session: CanvasSession, x: int, y: int, image: Image.Image):
+        self._paste_array(session, x, y, np.asarray(image))
+
+    @staticmethod
+    def _paste_array(session: CanvasSession, x: int, y: int, rgb: np.ndarray):
+        """Copy a patch into the raster, clipping it to the canvas bounds"""
+        h, w = rgb.shape[:2]
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, session.width), min(y + h, session.height)
+        if right <= left or bottom <= top:
+            return
+        session.pixels[top:bottom, left:right] = rgb[top - y:bottom - y, left - x:right - x]
+
+    def snapshot(self, session_id: str) -> Optional[Image.Image]:
+        """
+        Get a copy of the session's current canvas
+
+        Args:
+            session_id: Drawing session identifier
+
+        Returns:
+            RGB PIL Image, or None if the session has no synced canvas
+        """
+        session = self._get(session_id)
+        if session is None:
+            return None
+        with session.lock:
+            return Image.fromarray(session.pixels.copy(), "RGB")
+
+    def drop_session(self, session_id: str):
+        """Forget a session's canvas"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _get(self, session_id: str) -> Optional[CanvasSession]:
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_active = time.monotonic()
+            return session
+
+    def _evict(self):
+        """Drop idle canvases and the least recently used ones above the cap (lock held)"""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        for session_id in [sid for sid, s in self._sessions.items() if s.last_active < cutoff]:
+            del self._sessions[session_id]
+            self.evictions += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get session occupancy and sync traffic counters"""
+        with self._lock:
+            raster_bytes = sum(s.pixels.nbytes for s in self._sessions.values())
+            sessions = len(self._sessions)
+        return {
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "raster_bytes": raster_bytes,
+            "patches_applied": self.patches_applied,
+            "bytes_received": self.bytes_received,
+            "resyncs_requested": self.resyncs_requested,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,241 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def region_box(
+    bbox: Tuple[int, int, int, int],
+    size: Tuple[int, int],
+    padding: int = 32,
+    min_side: int = 128
+) -> Tuple[int, int, int, int]:
+    """
+    Grow a changed-pixel bounding box into the region sent as a close-up
+
+    The box is padded so the model sees the change in its surroundings and
+    widened to at least min_side per side, then clamped to the canvas.
+
+    Args:
+        bbox: (left, upper, right, lower) of the changed pixels
+        size: Canvas (width, height)
+        padding: Pixels added on every side
+        min_side: Minimum width/height of the region
+
+    Returns:
+        (left, upper, right, lower) of the region
+    """
+    width, height = size
+    box = [bbox[0] - padding, bbox[1] - padding, bbox[2] + padding, bbox[3] + padding]
+    for low, high, limit in ((0, 2, width), (1, 3, height)):
+        short = min(min_side, limit) - (box[high] - box[low])
+        if short > 0:
+            box[low] -= short // 2
+            box[high] += short - short // 2
+        # Shift back inside the canvas before clamping, to keep the size
+        if box[low] < 0:
+            box[high] -= box[low]
+            box[low] = 0
+        if box[high] > limit:
+            box[low] = max(0, box[low] - (box[high] - limit))
+            box[high] = limit
+    return tuple(box)
+
+
+class _Frame:
+    """Downscaled grayscale copy of an analyzed canvas, plus what it was analyzed with"""
+
+    __slots__ = ("pixels", "size", "prompt", "analysis", "last_active")
+
+    def __init__(self, pixels: np.ndarray, size: Tuple[int, int]):
+        self.pixels = pixels
+        self.size = size
+        self.prompt: Optional[str] = None
+        self.analysis: Optional[str] = None
+        self.last_active = time.monotonic()
+
+
+class ChangeDetector:
+    """Per-session last analyzed frame, used to skip analyses of (almost) unchanged canvases"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        diff_long_edge: int = 256,
+        pixel_tolerance: int = 24,
+        max_changed_fraction: float = 0.002,
+        block_size: int = 16,
+        max_block_change: float = 0.05,
+        max_sessions: int = 1000,
+        idle_ttl_seconds: float = 3600.0
+    ):
+        """
+        Initialize the change detector
+
+        Args:
+            enabled: When False, every canvas counts as changed
+            diff_long_edge: Frames are compared at this resolution (longest side)
+            pixel_tolerance: Grayscale difference (0-255) still treated as unchanged
+            max_changed_fraction: Max fraction of changed pixels for a frame to count as unchanged
+            block_size: Side of the blocks used for the structural (local) check, in diff pixels
+            max_block_change: Max fraction of changed pixels within any single block
+            max_sessions: Maximum number of sessions tracked (least recently used are dropped)
+            idle_ttl_seconds: Sessions untouched for this long are dropped
+        """
+        self.enabled = enabled
+        self.diff_long_edge = diff_long_edge
+        self.pixel_tolerance = pixel_tolerance
+        self.max_changed_fraction = max_changed_fraction
+        self.block_size = block_size
+        self.max_block_change = max_block_change
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+        self._frames: "OrderedDict[str, _Frame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.reused = 0
+        self.evictions = 0
+
+    def _downscale(self, image: Image.Image) -> np.ndarray:
+        gray = image.convert("L")
+        scale = min(1.0, self.diff_long_edge / max(gray.width, gray.height))
+        if scale < 1.0:
+            size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+            gray = gray.resize(size, Image.BOX)
+        return np.asarray(gray, dtype=np.int16)
+
+    def check(self, session_id: str, image: Image.Image, prompt: Optional[str]) -> Dict[str, Any]:
+        """
+        Compare a canvas against the last analyzed frame of the session
+
+        Runs NumPy work; call it off the event loop.
+
+        Args:
+            session_id: Drawing session identifier
+            image: Canvas about to be analyzed
+            prompt: Prompt it would be analyzed with (None never reuses an analysis)
+
+        Returns:
+            Dictionary with "changed", "changed_fraction", "max_block_change",
+            "bbox" (changed region in canvas pixels, or None), "analysis" (the
+            previous analysis when it can be reused, else None) and "frame" (to
+            pass back to remember)
+        """
+        frame = _Frame(self._downscale(image), image.size)
+        result = {
+            "changed": True,
+            "changed_fraction": 1.0,
+            "max_block_change": 1.0,
+            "bbox": (0, 0, image.width, image.height),
+            "analysis": None,
+            "frame": frame
+        }
+        if not self.enabled:
+            return result
+
+        # check() runs on the pool's threads, so counters are updated under the lock
+        with self._lock:
+            self.checks += 1
+        previous = self._get(session_id)
+        if previous is None or previous.size != frame.size or previous.pixels.shape != frame.pixels.shape:
+            return result
+
+        mask = np.abs(frame.pixels - previous.pixels) > self.pixel_tolerance
+        changed_fraction = float(mask.mean())
+
+        # Local check: a small but concentrated edit (e.g. a new eye on a face)
+        # can matter even when the changed fraction of the whole canvas is tiny
+        b = self.block_size
+        h, w = (mask.shape[0] // b) * b, (mask.shape[1] // b) * b
+        if h and w:
+            blocks = mask[:h, :w].reshape(h // b, b, w // b, b).mean(axis=(1, 3))
+            max_block_change = float(blocks.max())
+        else:
+            max_block_change = changed_fraction
+
+        bbox = None
+        rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+        if rows.size:
+            sx, sy = image.width / mask.shape[1], image.height / mask.shape[0]
+            bbox = (
+                int(cols[0] * sx), int(rows[0] * sy),
+                min(image.width, int(np.ceil((cols[-1] + 1) * sx))),
+                min(image.height, int(np.ceil((rows[-1] + 1) * sy)))
+            )
+
+        changed = changed_fraction > self.max_changed_fraction or max_block_change > self.max_block_change
+        result.update(
+            changed=changed,
+            changed_fraction=round(changed_fraction, 5),
+            max_block_change=round(max_block_change, 4),
+            bbox=bbox
+        )
+        if not changed and prompt is not None and previous.analysis is not None and previous.prompt == prompt:
+            result["analysis"] = previous.analysis
+            with self._lock:
+                self.reused += 1
+        return result
+
+    def remember(self, session_id: str, frame: _Frame, prompt: str, analysis: str):
+        """
+        Store a frame as the session's last analyzed canvas
+
+        Args:
+            session_id: Drawing session identifier
+            frame: Frame returned by check
+            prompt: Prompt the canvas was analyzed with
+            analysis: Resulting analysis
+        """
+        if not self.enabled:
+            return
+        frame.prompt = prompt
+        frame.analysis = analysis
+        with self._lock:
+            self._frames.pop(session_id, None)
+            self._frames[session_id] = frame
+            self._evict()
+
+    def drop_session(self, session_id: str):
+        """Forget a session's last frame"""
+        with self._lock:
+            self._frames.pop(session_id, None)
+
+    def _get(self, session_id: str) -> Optional[_Frame]:
+        with self._lock:
+            self._evict()
+            frame = self._frames.get(session_id)
+            if frame is not None:
+                self._frames.move_to_end(session_id)
+                frame.last_active = time.monotonic()
+            return frame
+
+    def _evict(self):
+        """Drop idle frames and the least recently used ones above the cap (lock held)"""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        for session_id in [sid for sid, f in self._frames.items() if f.last_active < cutoff]:
+            del self._frames[session_id]
+            self.evictions += 1
+        while len(self._frames) > self.max_sessions:
+            self._frames.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get reuse counters"""
+        with self._lock:
+            sessions, checks, reused, evictions = len(self._frames), self.checks, self.reused, self.evictions
+        return {
+            "enabled": self.enabled,
+            "sessions": sessions,
+            "checks": checks,
+            "reused": reused,
+            "reuse_rate": round(reused / checks, 3) if checks else 0.0,
+            "evictions": evictions,
+        }
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class _Turn:
+    __slots__ = ("role", "text", "tokens")
+
+    def __init__(self, role: str, text: str):
+        self.role = role
+        self.text = text
+        self.tokens = estimate_tokens(text) + 2
+
+    def render(self) -> str:
+        return f"{self.role}: {self.text}"
+
+
+class _Conversation:
+    def __init__(self):
+        self.turns: List[_Turn] = []
+        self.summary = ""
+        self.summarized_turns = 0
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+class ConversationStore:
+    """Per-session conversation history kept within a token budget"""
+
+    def __init__(
+        self,
+        summarizer: Optional[Callable[[str, str, int], Awaitable[str]]] = None,
+        token_budget: int = 2000,
+        summary_tokens: int = 400,
+        min_recent_turns: int = 4,
+        max_sessions: int = 1000,
+        idle_ttl_seconds: float = 3600.0
+    ):
+        """
+        Initialize the conversation store
+
+        Args:
+            summarizer: Coroutine (previous_summary, transcript, max_words) -> new summary
+            token_budget: Max estimated tokens of history (summary + recent turns) per prompt
+            summary_tokens: Max estimated tokens of the rolling summary
+            min_recent_turns: Turns always kept verbatim, even above the budget
+            max_sessions: Maximum number of conversations kept (least recently used are dropped)
+            idle_ttl_seconds: Conversations untouched for this long are dropped
+        """
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.min_recent_turns = min_recent_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+        self._sessions: "OrderedDict[str, _Conversation]" = OrderedDict()
+
+        self.compactions = 0
+        self.summarizer_failures = 0
+        self.evictions = 0
+
+    def _get(self, session_id: str) -> _Conversation:
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        for stale_id in [sid for sid, c in self._sessions.items() if c.last_active < cutoff]:
+            del self._sessions[stale_id]
+            self.evictions += 1
+
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            conversation = _Conversation()
+            self._sessions[session_id] = conversation
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        conversation.last_active = time.monotonic()
+        return conversation
+
+    def has_history(self, session_id: str) -> bool:
+        """Check whether a session already has any stored turns or summary"""
+        conversation = self._sessions.get(session_id)
+        return conversation is not None and bool(conversation.turns or conversation.summary)
+
+    def add_turn(self, session_id: str, role: str, text: str):
+        """
+        Append a turn to a session's history
+
+        Args:
+            session_id: Conversation / drawing session identifier
+            role: Speaker label, e.g. "User" or "Assistant"
+            text: Turn text
+        """
+        if text and text.strip():
+            self._get(session_id).turns.append(_Turn(role, text.strip()))
+
+    def add_exchange(self, session_id: str, user_text: str, assistant_text: str):
+        """Append a user message and the assistant's reply"""
+        self.add_turn(session_id, "User", user_text)
+        self.add_turn(session_id, "Assistant", assistant_text)
+
+    async def render_history(self, session_id: str) -> Dict[str, Any]:
+        """
+        Build the prompt history for a session, compacting it first if needed
+
+        Turns that no longer fit in the token budget are folded into the
+        rolling summary, which is cached on the session and only recomputed
+        when more turns are folded in.
+
+        Args:
+            session_id: Conversation / drawing session identifier
+
+        Returns:
+            Dictionary with the history text and its estimated token count
+        """
+        conversation = self._get(session_id)
+        async with conversation.lock:
+            await self._compact(conversation)
+
+            parts = []
+            if conversation.summary:
+                parts.append(f"Summary of earlier conversation: {conversation.summary}")
+            parts.extend(turn.render() for turn in conversation.turns)
+            history = "\n".join(parts)
+
+            return {
+                "history": history,
+                "history_tokens": estimate_tokens(history),
+                "turns": len(conversation.turns),
+                "summarized_turns": conversation.summarized_turns,
+            }
+
+    async def _compact(self, conversation: _Conversation):
+        """Fold the oldest turns into the summary until the history fits the budget"""
+        summary_cost = estimate_tokens(conversation.summary)
+        total = summary_cost + sum(turn.tokens for turn in conversation.turns)
+        if total <= self.token_budget:
+            return
+
+        # The summary may grow up to its own cap, so leave room for it, and fold
+        # down to half of what is left so the summarizer isn't called every turn
+        target = (self.token_budget - self.summary_tokens) // 2
+        folded: List[_Turn] = []
+        while len(conversation.turns) > self.min_recent_turns and (
+            sum(turn.tokens for turn in conversation.turns) > target
+        ):
+            folded.append(conversation.turns.pop(0))
+
+        if not folded:
+            return
+
+        transcript = "\n".join(turn.render() for turn in folded)
+        max_words = max(self.summary_tokens * 3 // 4, 20)
+        summary = None
+
+        if self.summarizer is not None:
+            try:
+                summary = await self.summarizer(conversation.summary, transcript, max_words)
+            except Exception as e:
+                self.summarizer_failures += 1
+                logger.warning(f"Conversation summarization failed, truncating instead: {e}")
+
+        if not summary:
+            # Fallback: keep the most recent part of the earlier conversation verbatim
+            summary = f"{conversation.summary}\n{transcript}".strip()
+
+        max_chars = self.summary_tokens * 4
+        if len(summary) > max_chars:
+            summary = "..." + summary[-max_chars:]
+
+        conversation.summary = summary.strip()
+        conversation.summarized_turns += len(folded)
+        self.compactions += 1
+
+    def clear(self, session_id: str):
+        """Forget a session's conversation"""
+        self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get occupancy and compaction counters"""
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "token_budget": self.token_budget,
+            "compactions": self.compactions,
+            "summarizer_failures": self.summarizer_failures,
+            "evictions": self.evictions,
+        }
@@ -4,12 +4,18 @@ import aiohttp
 from typing import Dict, Any, Optional, Generator, AsyncGenerator
 import json
 import logging
+from config import settings
+from utils.backends import SpeechBackend
+from utils.resilience import Resilience, UpstreamError
+from utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-class ElevenLabsTTS:
+class ElevenLabsTTS(SpeechBackend):
     """Helper class for ElevenLabs text-to-speech API"""
     
+    name = "elevenlabs"
+    
     def __init__(self):
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         if not self.api_key:
@@ -29,6 +35,43 @@ class ElevenLabsTTS:
             "style": 0.0,
             "use_speaker_boost": True
         }
+        
+        # Coalesces identical in-flight text-to-speech requests
+        self.inflight = SingleFlight("elevenlabs")
+        
+        # No request may hang forever; transient errors are retried within a deadline
+        self.timeout = aiohttp.ClientTimeout(total=settings.ELEVENLABS_TIMEOUT_SECONDS)
+        # One pooled session for all calls, so connections (and their TLS
+        # handshakes) are reused; created on first use inside the event loop
+        self._client: Optional[aiohttp.ClientSession] = None
+        self.resilience = Resilience(
+            "elevenlabs",
+            attempt_timeout=settings.ELEVENLABS_TIMEOUT_SECONDS,
+            deadline=settings.ELEVENLABS_DEADLINE_SECONDS,
+            max_attempts=settings.ELEVENLABS_MAX_ATTEMPTS,
+            backoff_base=settings.RETRY_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.RETRY_BACKOFF_MAX_SECONDS,
+            hedge_after=settings.ELEVENLABS_HEDGE_AFTER_SECONDS,
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.CIRCUIT_RESET_SECONDS
+        )
+    
+    def _session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, (re)created on demand"""
+        if self._client is None or self._client.closed:
+            self._client = aiohttp.ClientSession(timeout=self.timeout)
+        return self._client
+    
+    async def warmup(self):
+        """Open a pooled connection to ElevenLabs (DNS, TLS, auth) before the first request"""
+        async with self._session().get(f"{self.base_url}/models", headers={"xi-api-key": self.api_key}) as response:
+            await self._raise_for_status(response, "ElevenLabs warmup failed")
+            await response.read()
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
     
     async def text_to_speech(
         self,
@@ -53,33 +96,83 @@ class ElevenLabsTTS:
             if voice_settings is None:
                 voice_settings = self.default_voice_settings
             
-            url = f"{self.base_url}/text-to-speech/{voice_id}"
+            # Identical concurrent requests (same voice, model, settings and
+            # whitespace-normalized text) share one upstream call
+            key = (
+                voice_id,
+                model_id,
+                json.dumps(voice_settings, sort_keys=True),
+                " ".join(text.split())
+            )
             
-            data = {
-                "text": text,
-                "model_id": model_id,
-                "voice_settings": voice_settings
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers=self.headers,
-                    json=data
-                ) as response:
-                    if response.status == 200:
-                        audio_data = await response.read()
-                        logger.info(f"Generated speech for text length: {len(text)}")
-                        return audio_data
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"ElevenLabs API error: {response.status} - {error_text}")
-                        raise Exception(f"ElevenLabs API error: {response.status}")
+            return await self.inflight.do(
+                key,
+                lambda: self.resilience.call(
+                    lambda: self._request_speech(text, voice_id, model_id, voice_settings)
+                )
+            )
                         
         except Exception as e:
             logger.error(f"Text-to-speech error: {e}")
             raise
     
+    async def _request_speech(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str,
+        voice_settings: Dict
+    ) -> bytes:
+        """
+        Perform one text-to-speech API attempt
+        
+        Args:
+            text: Text to convert to speech
+            voice_id: ElevenLabs voice ID
+            model_id: Model ID to use
+            voice_settings: Voice settings dictionary
+            
+        Returns:
+            Audio data as bytes (MP3 format)
+            
+        Raises:
+            UpstreamError: On a non-200 response or a transport failure
+        """
+        url = f"{self.base_url}/text-to-speech/{voice_id}"
+        
+        data = {
+            "text": text,
+            "model_id": model_id,
+            "voice_settings": voice_settings
+        }
+        
+        try:
+            async with self._session().post(
+                url,
+                headers=self.headers,
+                json=data
+            ) as response:
+                await self._raise_for_status(response, "ElevenLabs API error")
+                audio_data = await response.read()
+                logger.info(f"Generated speech for text length: {len(text)}")
+                return audio_data
+        except aiohttp.ClientError as e:
+            raise UpstreamError("elevenlabs", str(e) or type(e).__name__, retryable=True)
+    
+    async def _raise_for_status(self, response: aiohttp.ClientResponse, message: str):
+        """Raise UpstreamError (retryable for 429 / 5xx) unless the response is a 200"""
+        if response.status == 200:
+            return
+        error_text = await response.text()
+        logger.error(f"{message}: {response.status} - {error_text}")
+        retry_after = response.headers.get("Retry-After")
+        raise UpstreamError(
+            "elevenlabs",
+            message,
+            status=response.status,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+    
     async def text_to_speech_stream(
         self,
         text: str,
@@ -106,24 +199,44 @@ class ElevenLabsTTS:
                 "voice_settings": self.default_voice_settings
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers=self.headers,
-                    json=data
-                ) as response:
-                    if response.status == 200:
-                        async for chunk in response.content.iter_chunked(1024):
-                            yield chunk
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"ElevenLabs streaming error: {response.status} - {error_text}")
-                        raise Exception(f"ElevenLabs streaming error: {response.status}")
+            # Opening the stream is retried; once audio flows, each read has its own timeout
+            response = await self.resilience.call(
+                lambda: self._open_stream(url, data),
+                hedge=False
+            )
+            try:
+                async for chunk in response.content.iter_chunked(1024):
+                    yield chunk
+            finally:
+                response.release()
                         
         except Exception as e:
             logger.error(f"Text-to-speech streaming error: {e}")
             raise
     
+    async def _open_stream(self, url: str, data: Dict[str, Any]):
+        """
+        Start a streaming text-to-speech request
+        
+        Returns:
+            Response with a 200 status; the caller releases it
+        """
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=settings.ELEVENLABS_TIMEOUT_SECONDS,
+            sock_read=settings.ELEVENLABS_TIMEOUT_SECONDS
+        )
+        try:
+            response = await self._session().post(url, headers=self.headers, json=data, timeout=timeout)
+        except aiohttp.ClientError as e:
+            raise UpstreamError("elevenlabs", str(e) or type(e).__name__, retryable=True)
+        try:
+            await self._raise_for_status(response, "ElevenLabs streaming error")
+        except BaseException:
+            response.release()
+            raise
+        return response
+    
     async def get_voices(self) -> Dict[str, Any]:
         """
         Get list of available voices from ElevenLabs
@@ -132,39 +245,41 @@ class ElevenLabsTTS:
             Dictionary with voice information
         """
         try:
-            url = f"{self.base_url}/voices"
-            headers = {"xi-api-key": self.api_key}
+            data = await self.resilience.call(self._fetch_voices)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # Format voice data
-                        voices = []
-                        for voice in data.get("voices", []):
-                            voices.append({
-                                "voice_id": voice.get("voice_id"),
-                                "name": voice.get("name"),
-                                "category": voice.get("category"),
-                                "description": voice.get("description"),
-                                "preview_url": voice.get("preview_url"),
-                                "settings": voice.get("settings")
-                            })
-                        
-                        return {
-                            "voices": voices,
-                            "total_count": len(voices)
-                        }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Error fetching voices: {response.status} - {error_text}")
-                        raise Exception(f"Error fetching voices: {response.status}")
+            # Format voice data
+            voices = []
+            for voice in data.get("voices", []):
+                voices.append({
+                    "voice_id": voice.get("voice_id"),
+                    "name": voice.get("name"),
+                    "category": voice.get("category"),
+                    "description": voice.get("description"),
+                    "preview_url": voice.get("preview_url"),
+                    "settings": voice.get("settings")
+                })
+            
+            return {
+                "voices": voices,
+                "total_count": len(voices)
+            }
                         
         except Exception as e:
             logger.error(f"Get voices error: {e}")
             raise
     
+    async def _fetch_voices(self) -> Dict[str, Any]:
+        """One attempt at GET /voices"""
+        url = f"{self.base_url}/voices"
+        headers = {"xi-api-key": self.api_key}
+        
+        try:
+            async with self._session().get(url, headers=headers) as response:
+                await self._raise_for_status(response, "Error fetching voices")
+                return await response.json()
+        except aiohttp.ClientError as e:
+            raise UpstreamError("elevenlabs", str(e) or type(e).__name__, retryable=True)
+    
     async def get_voice_settings(self, voice_id: str) -> Dict[str, Any]:
         """
         Get voice settings for a specific voice
@@ -179,14 +294,13 @@ class ElevenLabsTTS:
             url = f"{self.base_url}/voices/{voice_id}/settings"
             headers = {"xi-api-key": self.api_key}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Error fetching voice settings: {response.status} - {error_text}")
-                        return self.default_voice_settings
+            async with self._session().get(url, headers=headers) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Error fetching voice settings: {response.status} - {error_text}")
+                    return self.default_voice_settings
                         
         except Exception as e:
             logger.error(f"Get voice settings error: {e}")
@@ -203,21 +317,20 @@ class ElevenLabsTTS:
             url = f"{self.base_url}/user"
             headers = {"xi-api-key": self.api_key}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            "character_count": data.get("subscription", {}).get("character_count", 0),
-                            "character_limit": data.get("subscription", {}).get("character_limit", 0),
-                            "can_extend_character_limit": data.get("subscription", {}).get("can_extend_character_limit", False),
-                            "allowed_to_extend_character_limit": data.get("subscription", {}).get("allowed_to_extend_character_limit", False),
-                            "next_character_count_reset_unix": data.get("subscription", {}).get("next_character_count_reset_unix", 0)
-                        }
-                    else:
-                        logger.warning(f"Could not fetch user info: {response.status}")
-                        return {}
-                        
+            async with self._session().get(url, headers=headers) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {
+                        "character_count": data.get("subscription", {}).get("character_count", 0),
+                        "character_limit": data.get("subscription", {}).get("character_limit", 0),
+                        "can_extend_character_limit": data.get("subscription", {}).get("can_extend_character_limit", False),
+                        "allowed_to_extend_character_limit": data.get("subscription", {}).get("allowed_to_extend_character_limit", False),
+                        "next_character_count_reset_unix": data.get("subscription", {}).get("next_character_count_reset_unix", 0)
+                    }
+                else:
+                    logger.warning(f"Could not fetch user info: {response.status}")
+                    return {}
+                    
         except Exception as e:
             logger.error(f"Get user info error: {e}")
             return {}
@@ -254,6 +367,14 @@ class ElevenLabsTTS:
             logger.error(f"Create custom voice error: {e}")
             raise
     
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics: request coalescing, retries and circuit state"""
+        return {
+            "backend": self.name,
+            "singleflight": self.inflight.stats(),
+            "resilience": self.resilience.stats()
+        }
+    
     def get_recommended_voices(self) -> Dict[str, str]:
         """
         Get recommended voice IDs for different use cases
@@ -0,0 +1,132 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when an AdmissionGate's wait queue is full"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is at capacity, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Limit on concurrent calls with a bounded wait queue, for async (non-blocking) work"""
+
+    def __init__(self, name: str, max_concurrency: int = 8, max_queue: int = 32, min_retry_after: int = 1):
+        """
+        Initialize the gate
+
+        Args:
+            name: Name used in errors and metrics
+            max_concurrency: Maximum number of calls running at once
+            max_queue: Maximum number of callers waiting for a free slot
+            min_retry_after: Lower bound for the Retry-After hint in seconds
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.min_retry_after = min_retry_after
+
+        self._slots = None
+        self._waiting = 0
+        self._in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.avg_run_seconds = 0.0
+        self._recent_waits = deque(maxlen=256)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold one slot for the duration of the block
+
+        Raises:
+            ExecutorSaturatedError: If every slot is taken and the wait queue is full
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorSaturatedError(self.name, self._retry_after())
+
+        self._waiting += 1
+        queued_at = time.monotonic()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - queued_at
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self._recent_waits.append(waited)
+
+        self._in_flight += 1
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            self.completed += 1
+            # Exponential moving average of service time, for Retry-After estimates
+            self.avg_run_seconds += 0.1 * ((time.monotonic() - started_at) - self.avg_run_seconds)
+
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await a coroutine function while holding a slot
+
+        Args:
+            func: Zero-argument coroutine function
+
+        Returns:
+            Return value of func
+
+        Raises:
+            ExecutorSaturatedError: If every slot is taken and the wait queue is full
+        """
+        async with self.slot():
+            return await func()
+
+    def _retry_after(self) -> int:
+        """Estimate how long until the current backlog has drained"""
+        backlog = (self._waiting + self._in_flight) / max(self.max_concurrency, 1)
+        return max(self.min_retry_after, math.ceil(backlog * self.avg_run_seconds))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth, in-flight count and wait-time metrics"""
+        recent = sorted(self._recent_waits)
+        admitted = self.completed + self._in_flight
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(int(p * len(recent)), len(recent) - 1)]
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": int(self.total_wait_seconds / admitted * 1000) if admitted else 0,
+            "p50_wait_ms": int(percentile(0.50) * 1000),
+            "p95_wait_ms": int(percentile(0.95) * 1000),
+            "max_wait_ms": int(self.max_wait_seconds * 1000),
+            "avg_run_ms": int(self.avg_run_seconds * 1000),
+        }
+
@@ -1,16 +1,22 @@
 import google.generativeai as genai
 import os
 from PIL import Image
+from typing import Optional, Dict, Any, AsyncGenerator
 import asyncio
-from typing import Optional, Dict, Any
 import logging
 from config import settings
+from utils.backends import VisionBackend, EmptyResponseError, ImageInput, image_parts
+from utils.executor import AdmissionGate, ExecutorSaturatedError
+from utils.resilience import Resilience, DeadlineExceededError
+from utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-class GeminiVisionAnalyzer:
+class GeminiVisionAnalyzer(VisionBackend):
     """Helper class for Gemini Vision API interactions"""
     
+    name = "gemini"
+    
     def __init__(self):
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
@@ -23,6 +29,31 @@ class GeminiVisionAnalyzer:
         self.vision_model = genai.GenerativeModel(settings.GEMINI_MODEL)
         self.text_model = genai.GenerativeModel(settings.GEMINI_MODEL)
         
+        # Calls use the SDK's async API, so waiting on Gemini costs a coroutine,
+        # not a thread; the gate only bounds how many are in flight at once
+        self.gate = AdmissionGate(
+            "gemini",
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            max_queue=settings.GEMINI_MAX_QUEUE,
+            min_retry_after=settings.GEMINI_RETRY_AFTER_SECONDS
+        )
+        
+        # Identical concurrent requests share one upstream call
+        self.inflight = SingleFlight("gemini")
+        
+        # Timeouts, retries on transient errors, optional hedging and a circuit breaker
+        self.resilience = Resilience(
+            "gemini",
+            attempt_timeout=settings.GEMINI_TIMEOUT_SECONDS,
+            deadline=settings.GEMINI_DEADLINE_SECONDS,
+            max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+            backoff_base=settings.RETRY_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.RETRY_BACKOFF_MAX_SECONDS,
+            hedge_after=settings.GEMINI_HEDGE_AFTER_SECONDS,
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.CIRCUIT_RESET_SECONDS
+        )
+        
         # Safety settings
         self.safety_settings = [
             {
@@ -43,44 +74,139 @@ class GeminiVisionAnalyzer:
             }
         ]
     
-    async def analyze_image(self, image: Image.Image, prompt: str = None) -> str:
+    async def generate_image_analysis(self, image: ImageInput, prompt: str = None) -> str:
         """
-        Analyze an image using Gemini Vision
+        Analyze an image using Gemini Vision, raising on failure
+        
+        Unlike analyze_image, errors are not turned into a friendly message, so
+        callers can tell a real analysis apart from a fallback (e.g. before caching it).
         
         Args:
-            image: PIL Image object
+            image: PIL Image object, an encoded {"mime_type", "data"} image part, or a list of them
             prompt: Custom prompt for analysis
             
         Returns:
             Analysis text from Gemini
+            
+        Raises:
+            EmptyResponseError: If Gemini returned no content
         """
-        try:
-            if prompt is None:
-                prompt = """
-                You are an AI art critic and friendly assistant observing a drawing canvas. 
-                Describe what you see in this drawing with enthusiasm and creativity. 
-                Be engaging, ask thoughtful questions, and provide constructive feedback. 
-                If it's a sketch or rough drawing, encourage the artist and suggest improvements.
-                """
-            
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.vision_model.generate_content(
-                    [prompt, image],
-                    safety_settings=self.safety_settings
+        if prompt is None:
+            prompt = """
+            You are an AI art critic and friendly assistant observing a drawing canvas. 
+            Describe what you see in this drawing with enthusiasm and creativity. 
+            Be engaging, ask thoughtful questions, and provide constructive feedback. 
+            If it's a sketch or rough drawing, encourage the artist and suggest improvements.
+            """
+        
+        response = await self._generate(self.vision_model, [prompt, *image_parts(image)])
+        
+        if not response.parts:
+            raise EmptyResponseError("Gemini returned an empty response")
+        
+        return response.text
+    
+    async def _generate(self, model, contents):
+        """
+        Call generate_content_async, coalescing identical concurrent requests
+        
+        Each attempt has a timeout and transient errors are retried within the
+        call's deadline (see utils.resilience). If every caller waiting for the
+        request is cancelled (e.g. the clients disconnected), the upstream RPC
+        is cancelled as well.
+        
+        Args:
+            model: Gemini model to call
+            contents: Prompt string, or list of prompt strings and image parts
+            
+        Returns:
+            Gemini response object (shared between coalesced callers)
+        """
+        key = (model.model_name, self.contents_key(contents))
+        
+        return await self.inflight.do(
+            key,
+            lambda: self.gate.run(
+                lambda: self.resilience.call(
+                    lambda: model.generate_content_async(
+                        contents,
+                        safety_settings=self.safety_settings
+                    )
                 )
             )
+        )
+    
+    async def stream_image_analysis(
+        self,
+        image: ImageInput,
+        prompt: str
+    ) -> AsyncGenerator[str, None]:
+        """
+        Analyze an image using Gemini Vision, yielding text as it is generated
+        
+        Args:
+            image: PIL Image object, an encoded {"mime_type", "data"} image part, or a list of them
+            prompt: Prompt for analysis
             
-            if response.parts:
-                return response.text
-            else:
-                return "I can see your drawing, but I'm having trouble analyzing it right now. Could you try again?"
-                
-        except Exception as e:
-            logger.error(f"Error in Gemini vision analysis: {e}")
-            return f"I apologize, but I encountered an error while analyzing your drawing: {str(e)}"
+        Yields:
+            Text chunks from Gemini
+            
+        Raises:
+            EmptyResponseError: If Gemini returned no content
+        """
+        async for chunk in self._stream(self.vision_model, [prompt, *image_parts(image)]):
+            yield chunk
+    
+    async def stream_text_only(self, prompt: str) -> AsyncGenerator[str, None]:
+        """
+        Generate a text response without image, yielding text as it is generated
+        
+        Args:
+            prompt: Text prompt for generation
+            
+        Yields:
+            Text chunks from Gemini
+            
+        Raises:
+            EmptyResponseError: If Gemini returned no content
+        """
+        async for chunk in self._stream(self.text_model, prompt):
+            yield chunk
+    
+    async def _stream(self, model, contents) -> AsyncGenerator[str, None]:
+        """
+        Stream a generate_content_async call, holding an admission slot until it ends
+        
+        Opening the stream (up to the first chunk) goes through the resilience
+        policy; after that each chunk must arrive within the attempt timeout.
+        Closing the generator (e.g. when the client disconnects) releases the
+        slot and abandons the upstream stream.
+        """
+        async with self.gate.slot():
+            response = await self.resilience.call(
+                lambda: model.generate_content_async(
+                    contents,
+                    safety_settings=self.safety_settings,
+                    stream=True
+                ),
+                hedge=False
+            )
+            
+            yielded = False
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.resilience.attempt_timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise DeadlineExceededError("gemini", self.resilience.attempt_timeout)
+                if chunk.parts:
+                    yielded = True
+                    yield chunk.text
+            
+            if not yielded:
+                raise EmptyResponseError("Gemini returned an empty response")
     
     async def generate_contextual_response(
         self, 
@@ -112,46 +238,94 @@ class GeminiVisionAnalyzer:
             helpful way that considers both the image and our previous discussion.
             """
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.vision_model.generate_content(
-                    [context_prompt, image],
-                    safety_settings=self.safety_settings
-                )
-            )
+            response = await self._generate(self.vision_model, [context_prompt, image])
             
             return response.text if response.parts else "I'm here to help with your drawing!"
             
+        except ExecutorSaturatedError:
+            raise
         except Exception as e:
             logger.error(f"Error generating contextual response: {e}")
             return "Let me take another look at your drawing and help you with that."
     
-    async def analyze_text_only(self, prompt: str) -> str:
+    async def generate_text(self, prompt: str) -> str:
         """
-        Generate text response without image
+        Generate text response without image, raising on failure
         
         Args:
             prompt: Text prompt for generation
             
         Returns:
             Generated text response
+            
+        Raises:
+            EmptyResponseError: If Gemini returned no content
         """
-        try:
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.text_model.generate_content(
-                    prompt,
-                    safety_settings=self.safety_settings
-                )
-            )
+        response = await self._generate(self.text_model, prompt)
+        
+        if not response.parts:
+            raise EmptyResponseError("Gemini returned an empty response")
+        
+        return response.text
+    
+    async def summarize_conversation(
+        self,
+        previous_summary: str,
+        transcript: str,
+        max_words: int = 300
+    ) -> str:
+        """
+        Fold older conversation turns into a rolling summary
+        
+        Args:
+            previous_summary: Summary of the conversation so far (may be empty)
+            transcript: Older turns that no longer fit in the prompt
+            max_words: Upper bound for the summary length
             
-            return response.text if response.parts else "I'd be happy to help!"
+        Returns:
+            Updated summary text
             
-        except Exception as e:
-            logger.error(f"Error in text generation: {e}")
-            return f"I encountered an error: {str(e)}"
+        Raises:
+            EmptyResponseError: If Gemini returned no content
+        """
+        prompt = f"""
+        Summarize this drawing-session conversation so it can be used as context for later replies.
+        Keep what the user is drawing, their goals and questions, and the advice already given.
+        Use at most {max_words} words.
+        
+        Existing summary:
+        {previous_summary or "(none)"}
+        
+        Conversation turns to add:
+        {transcript}
+        """
+        
+        response = await self._generate(self.text_model, prompt)
+        if not response.parts:
+            raise EmptyResponseError("Gemini returned an empty summary")
+        
+        return response.text.strip()
+
+    async def warmup(self):
+        """
+        Open the SDK's async channel to Gemini (DNS, TLS, auth) before the first request
+
+        count_tokens is free and goes through the same async client as
+        generate_content_async, which both models share.
+        """
+        await asyncio.wait_for(
+            self.vision_model.count_tokens_async("warmup"),
+            timeout=settings.GEMINI_TIMEOUT_SECONDS
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics: admission queue, request coalescing, retries and circuit state"""
+        return {
+            "backend": self.name,
+            "admission": self.gate.stats(),
+            "singleflight": self.inflight.stats(),
+            "resilience": self.resilience.stats()
+        }
     
     async def suggest_improvements(self, image: Image.Image) -> Dict[str, Any]:
         """
@@ -0,0 +1,229 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping overhead (dict slots, tuple key, floats)
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 16) -> int:
+    """
+    Compute a difference hash (dHash) of an image
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right neighbour,
+    so small re-encodes and resizes of the same canvas produce the same or a
+    very close hash.
+
+    Args:
+        image: PIL Image object
+        hash_size: Side length of the hash grid (hash has hash_size**2 bits)
+
+    Returns:
+        Hash as an integer
+    """
+    thumbnail = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+class _CacheEntry:
+    __slots__ = ("prompt_key", "image_hash", "value", "size_bytes", "expires_at")
+
+    def __init__(self, prompt_key: str, image_hash: int, value: str, size_bytes: int, expires_at: float):
+        self.prompt_key = prompt_key
+        self.image_hash = image_hash
+        self.value = value
+        self.size_bytes = size_bytes
+        self.expires_at = expires_at
+
+
+class AnalysisCache:
+    """LRU + TTL cache of drawing analyses keyed by perceptual hash and prompt"""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 600.0,
+        max_bytes: int = 16 * 1024 * 1024,
+        hash_size: int = 16,
+        max_hamming_distance: int = 4,
+        enabled: bool = True
+    ):
+        """
+        Initialize the analysis cache
+
+        Args:
+            max_entries: Maximum number of cached analyses
+            ttl_seconds: Time-to-live of an entry in seconds
+            max_bytes: Approximate memory cap for cached entries
+            hash_size: Side length of the perceptual hash grid
+            max_hamming_distance: Maximum differing hash bits for a near-duplicate hit
+            enabled: Whether lookups and stores are performed at all
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hash_size = hash_size
+        self.max_hamming_distance = max_hamming_distance
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[Tuple[str, int], _CacheEntry]" = OrderedDict()
+        self._hashes_by_prompt: Dict[str, Set[int]] = {}
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def image_hash(self, image: Image.Image) -> int:
+        """Compute the perceptual hash used as the image part of the key"""
+        return perceptual_hash(image, self.hash_size)
+
+    @staticmethod
+    def _prompt_key(prompt: str) -> str:
+        return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+    def get(self, image_hash: int, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached analysis
+
+        Args:
+            image_hash: Perceptual hash of the canvas
+            prompt: Prompt the analysis was generated for
+
+        Returns:
+            Dictionary with the cached analysis and Hamming distance, or None on miss
+        """
+        if not self.enabled:
+            return None
+
+        prompt_key = self._prompt_key(prompt)
+        now = time.monotonic()
+
+        entry = self._entries.get((prompt_key, image_hash))
+        if entry is not None and entry.expires_at <= now:
+            self._remove((prompt_key, image_hash))
+            self.expirations += 1
+            entry = None
+        distance = 0
+
+        if entry is None and self.max_hamming_distance > 0:
+            best = None
+            # Copied: expired candidates are evicted while scanning
+            for candidate in list(self._hashes_by_prompt.get(prompt_key, ())):
+                candidate_distance = (candidate ^ image_hash).bit_count()
+                if candidate_distance > self.max_hamming_distance:
+                    continue
+                candidate_entry = self._entries[(prompt_key, candidate)]
+                if candidate_entry.expires_at <= now:
+                    self._remove((prompt_key, candidate))
+                    self.expirations += 1
+                    continue
+                if best is None or candidate_distance < best[0]:
+                    best = (candidate_distance, candidate_entry)
+            if best is not None:
+                distance, entry = best
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end((entry.prompt_key, entry.image_hash))
+        self.hits += 1
+        if distance:
+            self.near_hits += 1
+
+        return {"analysis": entry.value, "distance": distance}
+
+    def put(self, image_hash: int, prompt: str, analysis: str):
+        """
+        Store an analysis, evicting expired and least recently used entries as needed
+
+        Args:
+            image_hash: Perceptual hash of the canvas
+            prompt: Prompt the analysis was generated for
+            analysis: Analysis text returned by the model
+        """
+        if not self.enabled:
+            return
+
+        prompt_key = self._prompt_key(prompt)
+        key = (prompt_key, image_hash)
+        size_bytes = len(analysis.encode("utf-8")) + _ENTRY_OVERHEAD_BYTES
+
+        if size_bytes > self.max_bytes:
+            logger.debug("Analysis too large to cache (%d bytes)", size_bytes)
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = _CacheEntry(
+            prompt_key, image_hash, analysis, size_bytes, time.monotonic() + self.ttl_seconds
+        )
+        self._hashes_by_prompt.setdefault(prompt_key, set()).add(image_hash)
+        self._total_bytes += size_bytes
+
+        self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then LRU entries until within both caps"""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+            self.expirations += 1
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, int]):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size_bytes
+        hashes = self._hashes_by_prompt.get(entry.prompt_key)
+        if hashes is not None:
+            hashes.discard(entry.image_hash)
+            if not hashes:
+                del self._hashes_by_prompt[entry.prompt_key]
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        self._entries.clear()
+        self._hashes_by_prompt.clear()
+        self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache occupancy and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "max_hamming_distance": self.max_hamming_distance,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
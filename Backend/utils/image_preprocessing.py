@@ -0,0 +1,249 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Formats Gemini accepts as inline image data
+_MIME_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+
+class CanvasPreprocessor:
+    """Shrinks canvas screenshots before they are sent to Gemini"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_workers: int = 2,
+        autocrop: bool = True,
+        crop_padding: int = 16,
+        background_tolerance: int = 12,
+        target_long_edge: int = 1024,
+        quantize_colors: int = 16,
+        quantize_coverage: float = 0.95,
+        output_formats: Optional[List[str]] = None,
+        jpeg_quality: int = 85
+    ):
+        """
+        Initialize the canvas preprocessor
+
+        Args:
+            enabled: If False, images are passed to Gemini unchanged
+            max_workers: Size of the worker pool used for decoding and encoding
+            autocrop: Crop away margins that only contain the background colour
+            crop_padding: Pixels of background kept around the cropped drawing
+            background_tolerance: Max per-channel difference still counted as background
+            target_long_edge: Downscale so the longest side is at most this many pixels
+            quantize_colors: Palette size for flat-colour sketches (0 disables quantization)
+            quantize_coverage: Fraction of pixels the palette must cover to quantize
+            output_formats: Candidate encodings; the smallest result is used
+            jpeg_quality: Quality used for the JPEG candidate
+        """
+        self.enabled = enabled
+        self.max_workers = max_workers
+        self.autocrop = autocrop
+        self.crop_padding = crop_padding
+        self.background_tolerance = background_tolerance
+        self.target_long_edge = target_long_edge
+        self.quantize_colors = quantize_colors
+        self.quantize_coverage = quantize_coverage
+        self.output_formats = [f for f in (output_formats or ["png", "webp", "jpeg"]) if f in _MIME_TYPES]
+        self.jpeg_quality = jpeg_quality
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="canvas-preprocess")
+        self._slots = None
+
+        # prepare() runs on the pool's threads, so the counters are updated under a lock
+        self._counters_lock = threading.Lock()
+        self.images_processed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def run(self, func, *args):
+        """
+        Run a CPU-bound function on the preprocessing pool
+
+        Submissions are bounded to the pool size, so excess requests wait on the
+        event loop (where they can still be cancelled) instead of piling up in
+        the executor's queue.
+
+        Args:
+            func: Function to call
+            *args: Positional arguments for func
+
+        Returns:
+            Return value of func
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        async with self._slots:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def decode(self, contents: bytes) -> Image.Image:
+        """
+        Decode an uploaded canvas image to RGB
+
+        Args:
+            contents: Raw image bytes
+
+        Returns:
+            PIL Image in RGB mode
+        """
+        image = Image.open(io.BytesIO(contents))
+        image_format = image.format
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+            image.format = image_format
+        return image
+
+    def prepare(
+        self,
+        image: Image.Image,
+        original_bytes: Optional[int],
+        long_edge: Optional[int] = None,
+        autocrop: Optional[bool] = None
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Crop, downscale, quantize and encode a canvas for upload
+
+        Args:
+            image: Decoded RGB canvas
+            original_bytes: Size of the uploaded file, for the savings report; None for an image
+                derived from the upload (a crop or overview), which is left out of bytes_in/bytes_out
+            long_edge: Override of target_long_edge for this image
+            autocrop: Override of autocrop for this image
+
+        Returns:
+            Tuple of (image part for Gemini, preprocessing report)
+        """
+        if not self.enabled:
+            return image, {"enabled": False, "original_bytes": original_bytes}
+
+        start_time = time.perf_counter()
+        original_size = image.size
+        crop_box = None
+        blank = False
+
+        long_edge = long_edge or self.target_long_edge
+        if self.autocrop if autocrop is None else autocrop:
+            crop_box = self._content_bbox(image)
+            if crop_box is None:
+                blank = True
+            elif crop_box != (0, 0, image.width, image.height):
+                image = image.crop(crop_box)
+
+        if max(image.size) > long_edge:
+            image = image.copy()
+            image.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        quantized = False
+        if self.quantize_colors and self._is_flat(image):
+            image = image.quantize(colors=self.quantize_colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+            quantized = True
+
+        image_format, data = self._encode_smallest(image)
+
+        with self._counters_lock:
+            self.images_processed += 1
+            if original_bytes is not None:
+                self.bytes_in += original_bytes
+                self.bytes_out += len(data)
+
+        report = {
+            "enabled": True,
+            "original_bytes": original_bytes,
+            "output_bytes": len(data),
+            "bytes_saved": original_bytes - len(data) if original_bytes is not None else None,
+            "original_size": f"{original_size[0]}x{original_size[1]}",
+            "output_size": f"{image.width}x{image.height}",
+            "crop_box": list(crop_box) if crop_box else None,
+            "blank_canvas": blank,
+            "quantized": quantized,
+            "output_format": image_format,
+            "processing_time_ms": int((time.perf_counter() - start_time) * 1000)
+        }
+
+        return {"mime_type": _MIME_TYPES[image_format], "data": data}, report
+
+    def _content_bbox(self, image: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Find the bounding box of everything that differs from the background
+
+        The background colour is taken as the median of the four corner pixels.
+
+        Returns:
+            Padded (left, upper, right, lower) box, or None for a blank canvas
+        """
+        pixels = np.asarray(image, dtype=np.int16)
+        corners = pixels[[0, 0, -1, -1], [0, -1, 0, -1]]
+        background = np.median(corners, axis=0).astype(np.int16)
+
+        mask = (np.abs(pixels - background) > self.background_tolerance).any(axis=2)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(mask.any(axis=0))
+
+        pad = self.crop_padding
+        return (
+            max(int(cols[0]) - pad, 0),
+            max(int(rows[0]) - pad, 0),
+            min(int(cols[-1]) + 1 + pad, image.width),
+            min(int(rows[-1]) + 1 + pad, image.height),
+        )
+
+    def _is_flat(self, image: Image.Image) -> bool:
+        """Check whether a few colours cover almost all pixels (typical for sketches)"""
+        colors = image.getcolors(maxcolors=4096)
+        if colors is None:
+            return False
+        counts = sorted((count for count, _ in colors), reverse=True)
+        return sum(counts[:self.quantize_colors]) >= self.quantize_coverage * image.width * image.height
+
+    def _encode_smallest(self, image: Image.Image) -> Tuple[str, bytes]:
+        """Encode with every candidate format and keep the smallest result"""
+        best = None
+        for image_format in self.output_formats:
+            buffer = io.BytesIO()
+            if image_format == "png":
+                image.save(buffer, format="PNG", optimize=True)
+            elif image_format == "webp":
+                image.save(buffer, format="WEBP", lossless=True, method=4)
+            else:
+                rgb = image.convert("RGB") if image.mode != "RGB" else image
+                rgb.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+            data = buffer.getvalue()
+            if best is None or len(data) < len(best[1]):
+                best = (image_format, data)
+
+        if best is None:
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+            best = ("png", buffer.getvalue())
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cumulative preprocessing counters"""
+        with self._counters_lock:
+            images_processed, bytes_in, bytes_out = self.images_processed, self.bytes_in, self.bytes_out
+        return {
+            "enabled": self.enabled,
+            "workers": self.max_workers,
+            "images_processed": images_processed,
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "bytes_saved": bytes_in - bytes_out,
+        }
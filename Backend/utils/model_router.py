@@ -0,0 +1,74 @@
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRouter:
+    """
+    Chooses which resident model size transcribes a request
+
+    Tiers are ordered from the fastest (smallest) model to the most accurate.
+    Short realtime chunks always go to the fastest tier. Everything else goes
+    to the most accurate tier that is not overloaded, so full uploads get the
+    larger model while it is idle and fall back to smaller ones as its queue
+    grows.
+    """
+
+    def __init__(self, tiers: List[str], realtime_max_seconds: float = 10.0, overload_depth: int = 4):
+        """
+        Initialize the router
+
+        Args:
+            tiers: Model sizes, fastest first
+            realtime_max_seconds: Realtime audio up to this long counts as a short chunk
+            overload_depth: Requests queued or running on a tier at which it counts as overloaded
+        """
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        self.tiers = list(tiers)
+        self.realtime_max_seconds = realtime_max_seconds
+        self.overload_depth = max(1, overload_depth)
+        self.routed = Counter()
+        self.reasons = Counter()
+
+    def choose(self, duration: float, realtime: bool, depths: Dict[str, int]) -> Tuple[str, str]:
+        """
+        Pick a tier for one request
+
+        Args:
+            duration: Seconds of audio the model will process
+            realtime: Whether the request comes from a live (realtime or streaming) session
+            depths: Requests currently queued or running per tier
+
+        Returns:
+            The chosen model size and the reason ('single', 'realtime', 'idle' or 'overload')
+        """
+        if len(self.tiers) == 1:
+            tier, reason = self.tiers[0], "single"
+        elif realtime and duration <= self.realtime_max_seconds:
+            tier, reason = self.tiers[0], "realtime"
+        else:
+            tier, reason = self.tiers[0], "overload"
+            for candidate in reversed(self.tiers):
+                if depths.get(candidate, 0) < self.overload_depth:
+                    tier = candidate
+                    reason = "idle" if candidate == self.tiers[-1] else "overload"
+                    break
+
+        self.routed[tier] += 1
+        self.reasons[reason] += 1
+        if reason == "overload":
+            logger.debug(f"Larger Whisper tiers busy ({depths}); routed {duration:.1f}s of audio to '{tier}'")
+        return tier, reason
+
+    def stats(self) -> Dict[str, Any]:
+        """Get routing counters"""
+        return {
+            "tiers": self.tiers,
+            "realtime_max_seconds": self.realtime_max_seconds,
+            "overload_depth": self.overload_depth,
+            "routed": {tier: self.routed[tier] for tier in self.tiers},
+            "reasons": dict(self.reasons),
+        }
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (name, coroutine function, required)
+WarmupStep = Tuple[str, Callable[[], Awaitable[Any]], bool]
+# Returns why a component can no longer serve traffic, or None
+HealthCheck = Callable[[], Optional[str]]
+
+
+class Readiness:
+    """
+    Startup warmup steps and whether the app may receive traffic yet
+
+    The app is ready once every step has finished and no required step
+    failed. Optional steps (e.g. preconnecting to an upstream API) are
+    reported but never keep the app out of rotation. Health checks take the
+    app out of rotation again if a component fails after warmup.
+    """
+
+    def __init__(self, checks: Optional[Dict[str, HealthCheck]] = None):
+        """
+        Initialize readiness
+
+        Args:
+            checks: Health checks evaluated on every probe, by component name
+        """
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.checks = dict(checks or {})
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    async def run(self, steps: List[WarmupStep], timeout: float = 600.0):
+        """
+        Run all warmup steps concurrently
+
+        Args:
+            steps: Steps to run
+            timeout: Seconds a step may take before it counts as failed
+        """
+        for name, _, required in steps:
+            self.steps[name] = {"status": "pending", "required": required, "seconds": None, "error": None}
+        await asyncio.gather(*(self._run_step(name, warm, timeout) for name, warm, _ in steps))
+        self.finished_at = time.monotonic()
+        if self.ready:
+            logger.info(f"Warmup finished in {self.finished_at - self.started_at:.1f}s")
+        else:
+            logger.error(f"Warmup failed; not ready: {self.stats()['steps']}")
+
+    async def _run_step(self, name: str, warm: Callable[[], Awaitable[Any]], timeout: float):
+        step = self.steps[name]
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(warm(), timeout)
+            step["status"] = "ready"
+        except Exception as e:
+            step["status"] = "failed"
+            step["error"] = str(e) or type(e).__name__
+            log = logger.error if step["required"] else logger.warning
+            log(f"Warmup step '{name}' failed: {step['error']}")
+        step["seconds"] = round(time.monotonic() - started, 2)
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and all(
+            step["status"] == "ready" for step in self.steps.values() if step["required"]
+        ) and not self.failing()
+
+    def failing(self) -> Dict[str, str]:
+        """Errors of the health checks that currently fail"""
+        errors = {name: check() for name, check in self.checks.items()}
+        return {name: error for name, error in errors.items() if error is not None}
+
+    def stats(self) -> Dict[str, Any]:
+        """Get readiness, the state of every step and failing health checks"""
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round((self.finished_at or time.monotonic()) - self.started_at, 2),
+            "steps": {name: dict(step) for name, step in self.steps.items()},
+            "failing": self.failing(),
+        }
@@ -0,0 +1,317 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from utils.executor import ExecutorSaturatedError
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying: timeouts, throttling and transient server errors
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Non-success response (or transport failure) from an upstream AI service"""
+
+    def __init__(
+        self,
+        service: str,
+        message: str,
+        status: Optional[int] = None,
+        retryable: Optional[bool] = None,
+        retry_after: Optional[float] = None
+    ):
+        super().__init__(f"{service} error{f' {status}' if status else ''}: {message}")
+        self.service = service
+        self.status = status
+        self.retryable = status in RETRYABLE_STATUS_CODES if retryable is None else retryable
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(UpstreamError):
+    """Raised when a call (including its retries) did not finish within its deadline"""
+
+    def __init__(self, service: str, seconds: float):
+        super().__init__(service, f"no response within {seconds:g}s", status=504, retryable=False)
+
+
+class CircuitOpenError(ExecutorSaturatedError):
+    """
+    Raised without calling upstream while a service's circuit is open
+
+    Subclasses ExecutorSaturatedError so routes answer it the same way:
+    503 with a Retry-After header.
+    """
+
+    def __init__(self, name: str, retry_after: int):
+        Exception.__init__(self, f"{name} is temporarily unavailable, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Decide whether a failed attempt is worth retrying
+
+    Timeouts, connection errors and retryable HTTP status codes are; anything
+    else (bad requests, safety blocks, empty responses, local admission
+    rejections) is not.
+    """
+    if isinstance(error, UpstreamError):
+        return error.retryable
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google.api_core exceptions carry the HTTP status as .code
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Per-service breaker: opens after consecutive failures, then lets single probes through"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, service: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        """
+        Initialize the breaker
+
+        Args:
+            service: Service name used in errors and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: Time the circuit stays open before a probe call is allowed
+        """
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may go upstream now
+
+        Returns:
+            True if the call may proceed (closed, or the single half-open probe)
+        """
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit for {self.service} half-open, probing")
+
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def retry_after(self) -> int:
+        """Seconds until the circuit will let a probe through"""
+        remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for {self.service} closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(f"Circuit for {self.service} opened after {self.consecutive_failures} failures")
+
+    def record_abandoned(self):
+        """A call was cancelled before it had an outcome; free the probe slot"""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class Resilience:
+    """Deadlines, jittered retries, optional hedging and a circuit breaker for one upstream service"""
+
+    def __init__(
+        self,
+        service: str,
+        attempt_timeout: float = 30.0,
+        deadline: float = 60.0,
+        max_attempts: int = 3,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        hedge_after: float = 0.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0
+    ):
+        """
+        Initialize the policy
+
+        Args:
+            service: Service name used in errors and metrics
+            attempt_timeout: Max seconds for a single attempt
+            deadline: Max seconds for the whole call, retries and backoff included
+            max_attempts: Attempts per call (1 disables retries)
+            backoff_base: Backoff before the first retry; doubles per retry (full jitter)
+            backoff_max: Upper bound for a single backoff
+            hedge_after: If > 0, start a second identical request when the first
+                         has not answered after this many seconds; first success wins
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: Time the circuit stays open before probing
+        """
+        self.service = service
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(service, failure_threshold, reset_seconds)
+
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def call(self, func: Callable[[], Awaitable[Any]], hedge: bool = True) -> Any:
+        """
+        Call upstream under the policy
+
+        Args:
+            func: Zero-argument coroutine function performing one attempt
+            hedge: Allow a hedged duplicate request (only for idempotent calls
+                   whose losing result can simply be dropped)
+
+        Returns:
+            Result of the first successful attempt
+
+        Raises:
+            CircuitOpenError: If the service's circuit is open
+            DeadlineExceededError: If the deadline passed before an attempt succeeded
+            Exception: The last attempt's error when it is not retryable or attempts ran out
+        """
+        self.calls += 1
+        deadline_at = time.monotonic() + self.deadline
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.failures += 1
+                raise DeadlineExceededError(self.service, self.deadline)
+
+            if not self.breaker.allow():
+                raise CircuitOpenError(self.service, self.breaker.retry_after())
+
+            timeout = min(self.attempt_timeout, remaining)
+            try:
+                result = await asyncio.wait_for(
+                    self._hedged(func) if hedge and self.hedge_after > 0 else func(),
+                    timeout
+                )
+            except asyncio.CancelledError:
+                self.breaker.record_abandoned()
+                raise
+            except Exception as e:
+                error = e
+                retryable = is_retryable(e)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    error = DeadlineExceededError(self.service, timeout)
+
+                # Only failures that say something about the vendor's health count;
+                # e.g. a 400 still proves the service is up
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+                if not retryable or attempt == self.max_attempts - 1:
+                    self.failures += 1
+                    if error is e:
+                        raise
+                    raise error from e
+
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                retry_after = getattr(e, "retry_after", None)
+                if isinstance(retry_after, (int, float)):
+                    delay = max(delay, retry_after)
+                if delay >= deadline_at - time.monotonic():
+                    self.failures += 1
+                    raise error from e
+
+                logger.warning(
+                    f"{self.service} attempt {attempt + 1}/{self.max_attempts} failed ({error}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    async def _hedged(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func; if it is slow, race it against a second identical request"""
+        first = asyncio.ensure_future(func())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+            if done:
+                return first.result()
+
+            self.hedges += 1
+            tasks.append(asyncio.ensure_future(func()))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get retry / hedging counters and the circuit state"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "circuit": self.breaker.stats(),
+        }
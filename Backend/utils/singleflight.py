@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one upstream call"""
+
+    def __init__(self, name: str):
+        """
+        Initialize the coalescing group
+
+        Args:
+            name: Name used in logs and metrics
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func, or join an identical call that is already in flight
+
+        Every caller receives the same result or exception. A caller that is
+        cancelled simply stops waiting; the upstream call is only cancelled
+        once no callers are left waiting for it.
+
+        Args:
+            key: Hashable identity of the normalized request
+            func: Zero-argument coroutine function performing the upstream call
+
+        Returns:
+            Result of the (shared) upstream call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                logger.debug(f"{self.name}: all waiters left, cancelling upstream call")
+                self.abandoned += 1
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call):
+        """Stop routing new callers to a finished or abandoned call"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.done() and not call.task.cancelled():
+            # Mark the exception as retrieved when nobody awaited it
+            call.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters"""
+        return {
+            "in_flight": len(self._calls),
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,285 @@
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE, pcm_to_wav
+from utils.vad import EnergyVAD
+
+logger = logging.getLogger(__name__)
+
+# Transcribes one WAV-encoded clip; returns the backend's result dictionary
+Transcribe = Callable[[bytes], Awaitable[Dict[str, Any]]]
+# Sends one message to the client
+Emit = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _words(text: str):
+    return [re.sub(r"[^\w']", "", word.lower()) for word in text.split()]
+
+
+def strip_repeated_prefix(previous: str, text: str, max_words: int = 6) -> str:
+    """
+    Drop words at the start of text that repeat the end of previous
+
+    The overlap audio kept between segments is transcribed twice; this removes
+    the duplicate words it produces at the boundary.
+
+    Args:
+        previous: Text of the previous final segment
+        text: Text of the new segment
+        max_words: Longest repeated run looked for
+
+    Returns:
+        text without the repeated leading words
+    """
+    previous_words, words = _words(previous), _words(text)
+    for count in range(min(max_words, len(previous_words), len(words)), 0, -1):
+        if previous_words[-count:] == words[:count]:
+            return " ".join(text.split()[count:])
+    return text.strip()
+
+
+class StreamingStats:
+    """Counters shared by all streaming transcription sessions"""
+
+    def __init__(self):
+        self.active = 0
+        self.started = 0
+        self.partials = 0
+        self.finals = 0
+        self.audio_seconds = 0.0
+        self._final_latencies = deque(maxlen=256)
+
+    def record_final(self, latency: float):
+        """Count a final segment emitted latency seconds after its endpoint"""
+        self.finals += 1
+        self._final_latencies.append(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._final_latencies)
+        return {
+            "active": self.active,
+            "started": self.started,
+            "partials": self.partials,
+            "finals": self.finals,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "p50_final_latency_ms": round(latencies[len(latencies) // 2] * 1000) if latencies else 0,
+            "p95_final_latency_ms": round(latencies[int(len(latencies) * 0.95)] * 1000) if latencies else 0,
+        }
+
+
+class StreamingSession:
+    """
+    Rolling-buffer transcription of one continuous audio stream
+
+    Only audio that is not yet committed is kept. Energy VAD finds endpoints
+    (enough trailing silence after speech); the audio up to an endpoint is
+    transcribed once and emitted as a final segment, then dropped except for a
+    short overlap kept as context for the next segment. While speech is
+    ongoing, the uncommitted audio is re-transcribed at a fixed interval to
+    emit partial hypotheses.
+    """
+
+    def __init__(
+        self,
+        transcribe: Transcribe,
+        emit: Emit,
+        vad: EnergyVAD,
+        stats: Optional[StreamingStats] = None,
+        partial_interval_ms: int = 500,
+        endpoint_silence_ms: int = 600,
+        min_speech_ms: int = 150,
+        max_segment_seconds: float = 20.0,
+        overlap_seconds: float = 0.3
+    ):
+        """
+        Initialize the session
+
+        Args:
+            transcribe: Transcribes one WAV clip
+            emit: Sends a message to the client
+            vad: Voice activity detector used for endpointing
+            stats: Shared counters to update
+            partial_interval_ms: Minimum time between partial hypotheses
+            endpoint_silence_ms: Trailing silence that ends a segment
+            min_speech_ms: Speech needed before a segment can be committed
+            max_segment_seconds: Segments are cut (at the quietest point) once this long
+            overlap_seconds: Audio kept before each segment as context
+        """
+        self.transcribe = transcribe
+        self.emit = emit
+        self.vad = vad
+        self.stats = stats or StreamingStats()
+        self.partial_interval = partial_interval_ms / 1000
+        self.endpoint_silence = int(endpoint_silence_ms * SAMPLE_RATE / 1000)
+        self.min_speech = int(min_speech_ms * SAMPLE_RATE / 1000)
+        self.max_segment = int(max_segment_seconds * SAMPLE_RATE)
+        self.overlap = int(overlap_seconds * SAMPLE_RATE)
+
+        self._buffer = np.zeros(0, dtype=np.float32)  # uncommitted audio, context first
+        self._offset = 0        # stream position (samples) of buffer[0]
+        self._context = 0       # leading samples of the buffer already committed (overlap)
+        self._scanned = 0       # samples of the buffer already run through VAD
+        self._speech = 0        # speech samples since the last commit
+        self._silence = 0       # trailing silence samples after speech
+
+        self._segment = 0
+        self._previous_final = ""
+        self._generation = 0
+        self._last_partial = 0.0
+        self._partial_task: Optional[asyncio.Task] = None
+
+        self.stats.active += 1
+        self.stats.started += 1
+
+    async def feed(self, audio: np.ndarray):
+        """
+        Append decoded audio and emit whatever became available
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+        """
+        if audio.size == 0:
+            return
+        self.stats.audio_seconds += audio.size / SAMPLE_RATE
+        self._buffer = np.concatenate((self._buffer, audio))
+        self._scan()
+
+        if self._speech >= self.min_speech and self._silence >= self.endpoint_silence:
+            await self._commit(self._buffer.size - self._silence + self.endpoint_silence // 2)
+        elif self._speech and self._silence >= self.endpoint_silence:
+            # Too little speech before the silence (a click, a cough): noise, not a segment
+            self._speech = 0
+            self._silence = 0
+            self._drop(max(0, self._buffer.size - self.overlap))
+            self._context = self._buffer.size
+        elif self._buffer.size - self._context >= self.max_segment:
+            await self._commit(self._quietest_cut())
+        elif self._speech == 0 and self._buffer.size > self.overlap + self.endpoint_silence:
+            # Nothing said yet: drop leading silence instead of growing the buffer
+            self._drop(self._buffer.size - self.overlap)
+            self._context = self._buffer.size
+        elif self._speech >= self.min_speech and time.monotonic() - self._last_partial >= self.partial_interval:
+            if self._partial_task is None or self._partial_task.done():
+                self._last_partial = time.monotonic()
+                self._partial_task = asyncio.ensure_future(self._partial(self._generation, self._buffer.copy()))
+
+    async def finish(self):
+        """Commit the remaining audio (end of stream)"""
+        if self._buffer is None:
+            return
+        self._scan()
+        if self._speech >= self.min_speech:
+            await self._commit(self._buffer.size)
+        self.close()
+
+    def close(self):
+        """Stop background work; the session cannot be used afterwards"""
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+        self._partial_task = None
+        if self._buffer is not None:
+            self._buffer = None
+            self.stats.active -= 1
+
+    def _scan(self):
+        """Run VAD over frames not scanned yet and update the speech / silence counters"""
+        frame = self.vad.frame_length
+        end = self._scanned + (self._buffer.size - self._scanned) // frame * frame
+        if end <= self._scanned:
+            return
+        for is_speech in self.vad.speech_frames(self._buffer[self._scanned:end]):
+            if is_speech:
+                self._speech += frame
+                self._silence = 0
+            elif self._speech:
+                self._silence += frame
+        self._scanned = end
+
+    def _quietest_cut(self) -> int:
+        """Position of the quietest frame in the last second, to avoid cutting through a word"""
+        frame = self.vad.frame_length
+        start = max(self._context, self._scanned - SAMPLE_RATE)
+        levels = self.vad.frame_levels(self._buffer[start:self._scanned])
+        if levels.size == 0:
+            return self._scanned
+        return start + int(np.argmin(levels)) * frame + frame // 2
+
+    def _drop(self, count: int):
+        """Forget the first count samples of the buffer"""
+        self._buffer = self._buffer[count:]
+        self._offset += count
+        self._scanned = max(0, self._scanned - count)
+        self._context = max(0, self._context - count)
+
+    async def _commit(self, cut: int):
+        """Transcribe buffer[:cut] as a final segment and keep only the overlap before the rest"""
+        cut = max(self._context, min(cut, self._buffer.size))
+        endpoint_at = time.monotonic()
+        segment = self._buffer[:cut]
+        start = (self._offset + self._context) / SAMPLE_RATE
+        end = (self._offset + cut) / SAMPLE_RATE
+
+        # Anything in flight belongs to audio that is being committed now
+        self._generation += 1
+        self._drop(max(0, cut - self.overlap))
+        self._context = min(self.overlap, cut)
+        self._scanned = min(self._scanned, self._context)
+        self._speech = 0
+        self._silence = 0
+        self._scan()
+
+        try:
+            result = await self.transcribe(pcm_to_wav(segment))
+        except Exception as e:
+            logger.error(f"Streaming transcription of segment {self._segment} failed: {e}")
+            result = {"text": "", "error": str(e)}
+        if result.get("error"):
+            await self._send({"type": "error", "segment": self._segment, "error": result["error"]})
+
+        text = strip_repeated_prefix(self._previous_final, result.get("text", ""))
+        if text:
+            self._previous_final = text
+        latency = time.monotonic() - endpoint_at
+        self.stats.record_final(latency)
+        await self._send({
+            "type": "final",
+            "segment": self._segment,
+            "text": text,
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "language": result.get("language"),
+            "latency_ms": round(latency * 1000)
+        })
+        self._segment += 1
+
+    async def _partial(self, generation: int, audio: np.ndarray):
+        try:
+            result = await self.transcribe(pcm_to_wav(audio))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {e}")
+            return
+        # A final for this audio was committed meanwhile; the hypothesis is stale
+        if generation != self._generation or self._buffer is None:
+            return
+        self.stats.partials += 1
+        await self._send({
+            "type": "partial",
+            "segment": self._segment,
+            "text": strip_repeated_prefix(self._previous_final, result.get("text", "")),
+            "start": round((self._offset + self._context) / SAMPLE_RATE, 2),
+            "end": round((self._offset + audio.size) / SAMPLE_RATE, 2)
+        })
+
+    async def _send(self, message: Dict[str, Any]):
+        try:
+            await self.emit(message)
+        except Exception as e:
+            logger.debug(f"Could not send streaming transcription message: {e}")
@@ -0,0 +1,338 @@
+import asyncio
+import hashlib
+import math
+import random
+from typing import Dict, Any, AsyncGenerator, Optional
+import logging
+
+from config import settings
+from utils.backends import (
+    VisionBackend,
+    TranscriptionBackend,
+    SpeechBackend,
+    EmptyResponseError,
+    ImageInput,
+    image_parts,
+)
+from utils.executor import AdmissionGate
+from utils.resilience import Resilience, UpstreamError
+from utils.singleflight import SingleFlight
+from utils.transcription_sessions import TranscriptionSessionStore
+
+logger = logging.getLogger(__name__)
+
+_WORDS = [
+    "bright", "curved", "line", "circle", "shape", "colour", "shadow", "corner",
+    "sketch", "stroke", "balance", "detail", "outline", "texture", "contrast",
+    "space", "figure", "angle", "pattern", "layer", "tone", "edge", "form",
+    "light", "motion", "frame", "centre", "depth", "soft", "bold", "simple", "clear"
+]
+
+# One silent MPEG-1 Layer III frame (128 kbit/s, 44.1 kHz, mono): 417 bytes, ~26 ms
+_SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+_MP3_FRAME_SECONDS = 1152 / 44100
+
+
+class StubBackendError(UpstreamError):
+    """Failure injected by a stub backend (see STUB_FAILURE_RATE); retryable like a 503"""
+
+    def __init__(self, service: str):
+        super().__init__(service, "injected stub failure", status=503)
+
+
+class LatencyModel:
+    """Seeded latency distribution parsed from a spec such as "lognormal:1200:0.4" """
+
+    def __init__(self, spec: str, seed: int = 0, failure_rate: float = 0.0):
+        """
+        Initialize the latency model
+
+        Args:
+            spec: fixed:MS, uniform:LOW_MS:HIGH_MS, normal:MEAN_MS:STD_MS or lognormal:MEDIAN_MS:SIGMA
+            seed: Random seed, so runs with the same seed see the same latency sequence
+            failure_rate: Probability (0-1) that a call fails with StubBackendError
+        """
+        self.spec = spec
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+        kind, *params = spec.split(":")
+        try:
+            params = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"Invalid stub latency spec: {spec}")
+
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"Invalid stub latency spec: {spec}")
+        self.kind = kind
+        self.params = params
+
+    def sample(self) -> float:
+        """Draw one latency in seconds"""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = self._random.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = self._random.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = self._random.lognormvariate(math.log(max(median, 1e-3)), sigma)
+        return max(ms, 0.0) / 1000
+
+    def maybe_fail(self, name: str):
+        """Raise StubBackendError with probability failure_rate"""
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise StubBackendError(name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"latency": self.spec, "failure_rate": self.failure_rate}
+
+
+def _resilience(service: str, vendor: str) -> Resilience:
+    """Same retry / circuit policy as the vendor backend the stub stands in for"""
+    return Resilience(
+        service,
+        attempt_timeout=getattr(settings, f"{vendor}_TIMEOUT_SECONDS"),
+        deadline=getattr(settings, f"{vendor}_DEADLINE_SECONDS"),
+        max_attempts=getattr(settings, f"{vendor}_MAX_ATTEMPTS"),
+        backoff_base=settings.RETRY_BACKOFF_BASE_SECONDS,
+        backoff_max=settings.RETRY_BACKOFF_MAX_SECONDS,
+        hedge_after=getattr(settings, f"{vendor}_HEDGE_AFTER_SECONDS"),
+        failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=settings.CIRCUIT_RESET_SECONDS
+    )
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=32).digest()
+
+
+def _words_from_digest(digest: bytes, count: int) -> str:
+    """Deterministic pseudo-sentence built from a digest"""
+    return " ".join(_WORDS[digest[i % len(digest)] % len(_WORDS)] for i in range(count))
+
+
+class StubVisionBackend(VisionBackend):
+    """Offline drawing analysis backend with deterministic output and simulated latency"""
+
+    name = "stub"
+
+    def __init__(self):
+        self.latency = LatencyModel(settings.STUB_VISION_LATENCY, settings.STUB_SEED, settings.STUB_FAILURE_RATE)
+
+        # Same admission control and coalescing as the Gemini backend, so the
+        # stub exercises the same queueing behaviour under load
+        self.gate = AdmissionGate(
+            "stub-vision",
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            max_queue=settings.GEMINI_MAX_QUEUE,
+            min_retry_after=settings.GEMINI_RETRY_AFTER_SECONDS
+        )
+        self.inflight = SingleFlight("stub-vision")
+        self.resilience = _resilience("stub-vision", "GEMINI")
+
+    async def _respond(self, contents) -> str:
+        """Wait for a sampled latency, then return text derived from the contents"""
+        await asyncio.sleep(self.latency.sample())
+        self.latency.maybe_fail(self.name)
+        digest = bytes.fromhex(self.contents_key(contents))
+        return f"Stub analysis: {_words_from_digest(digest, 8 + digest[0] % 24)}."
+
+    async def _generate(self, contents) -> str:
+        key = self.contents_key(contents)
+        return await self.inflight.do(
+            key,
+            lambda: self.gate.run(lambda: self.resilience.call(lambda: self._respond(contents)))
+        )
+
+    async def generate_image_analysis(self, image: ImageInput, prompt: str = None) -> str:
+        return await self._generate([prompt or "", *image_parts(image)])
+
+    async def generate_text(self, prompt: str) -> str:
+        return await self._generate([prompt])
+
+    async def stream_image_analysis(self, image: ImageInput, prompt: str) -> AsyncGenerator[str, None]:
+        async for chunk in self._stream([prompt, *image_parts(image)]):
+            yield chunk
+
+    async def stream_text_only(self, prompt: str) -> AsyncGenerator[str, None]:
+        async for chunk in self._stream([prompt]):
+            yield chunk
+
+    async def _stream(self, contents) -> AsyncGenerator[str, None]:
+        """Yield the deterministic response a few words at a time, spreading the latency over the chunks"""
+        text = await self.gate.run(lambda: self.resilience.call(lambda: self._respond(contents), hedge=False))
+        words = text.split()
+        if not words:
+            raise EmptyResponseError("Stub returned no content")
+
+        step = 4
+        for i in range(0, len(words), step):
+            if i:
+                await asyncio.sleep(0.02)
+            yield " ".join(words[i:i + step]) + " "
+
+    async def summarize_conversation(self, previous_summary: str, transcript: str, max_words: int = 300) -> str:
+        words = f"{previous_summary} {transcript}".split()
+        return " ".join(words[-max_words:])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            **self.latency.stats(),
+            "admission": self.gate.stats(),
+            "singleflight": self.inflight.stats(),
+            "resilience": self.resilience.stats()
+        }
+
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """Offline speech-to-text backend with deterministic output and simulated latency"""
+
+    name = "stub"
+
+    def __init__(self):
+        self.latency = LatencyModel(settings.STUB_TRANSCRIPTION_LATENCY, settings.STUB_SEED, settings.STUB_FAILURE_RATE)
+        self.sessions = TranscriptionSessionStore(
+            max_sessions=settings.TRANSCRIPTION_SESSION_MAX,
+            idle_ttl_seconds=settings.TRANSCRIPTION_SESSION_TTL_SECONDS,
+            max_bytes=settings.TRANSCRIPTION_SESSION_MAX_BYTES,
+            max_pending_chunks=settings.TRANSCRIPTION_SESSION_MAX_PENDING_CHUNKS
+        )
+        self.calls = 0
+
+    async def transcribe(
+        self,
+        audio: bytes,
+        language: Optional[str] = None,
+        temperature: float = 0.0,
+        realtime: bool = False
+    ) -> Dict[str, Any]:
+        try:
+            self.calls += 1
+            await asyncio.sleep(self.latency.sample())
+            self.latency.maybe_fail(self.name)
+
+            digest = _digest(audio)
+            text = _words_from_digest(digest, 3 + digest[0] % 12)
+            # Duration as if the upload were 16 kHz 16-bit mono PCM
+            duration = len(audio) / 32000
+            return {
+                "text": text,
+                "language": language or "en",
+                "segments": [{"text": text, "start": 0.0, "end": round(duration, 2)}],
+                "confidence": 0.9,
+                "duration": duration,
+                "model": self.name
+            }
+        except Exception as e:
+            logger.error(f"Stub transcription error: {e}")
+            return {
+                "text": "",
+                "language": "unknown",
+                "segments": [],
+                "confidence": 0.0,
+                "error": str(e)
+            }
+
+    async def transcribe_chunk(self, audio: bytes, session_id: str, chunk_index: int, language: Optional[str] = None) -> Dict[str, Any]:
+        result = await self.transcribe(audio, language=language, realtime=True)
+        is_final = result["text"].endswith(("line", "edge", "form"))
+        session_text = self.sessions.add_chunk(session_id, chunk_index, result["text"], is_final)
+        return {
+            "text": result["text"],
+            "confidence": result["confidence"],
+            "is_final": is_final,
+            "session_text": session_text,
+            "chunk_index": chunk_index,
+            "model": result.get("model"),
+            "language": result["language"],
+            "language_pinned": language is not None
+        }
+
+    def clear_session(self, session_id: str) -> bool:
+        return self.sessions.drop_session(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            **self.latency.stats(),
+            "calls": self.calls,
+            "sessions": self.sessions.stats()
+        }
+
+
+class StubSpeechBackend(SpeechBackend):
+    """Offline text-to-speech backend returning silent MP3 audio sized to the text"""
+
+    name = "stub"
+
+    # Roughly 15 characters of text per second of speech
+    CHARS_PER_SECOND = 15
+
+    def __init__(self):
+        self.latency = LatencyModel(settings.STUB_SPEECH_LATENCY, settings.STUB_SEED, settings.STUB_FAILURE_RATE)
+        self.default_voice_settings = {
+            "stability": 0.5,
+            "similarity_boost": 0.5,
+            "style": 0.0,
+            "use_speaker_boost": True
+        }
+        self.inflight = SingleFlight("stub-speech")
+        self.resilience = _resilience("stub-speech", "ELEVENLABS")
+
+    def _silence(self, text: str) -> bytes:
+        seconds = max(len(text) / self.CHARS_PER_SECOND, 0.5)
+        return _SILENT_MP3_FRAME * math.ceil(seconds / _MP3_FRAME_SECONDS)
+
+    async def _request_speech(self, text: str) -> bytes:
+        await asyncio.sleep(self.latency.sample())
+        self.latency.maybe_fail(self.name)
+        return self._silence(text)
+
+    async def text_to_speech(
+        self,
+        text: str,
+        voice_id: str = "21m00Tcm4TlvDq8ikWAM",
+        model_id: str = "eleven_monolingual_v1",
+        voice_settings: Optional[Dict] = None
+    ) -> bytes:
+        key = (voice_id, model_id, " ".join(text.split()))
+        return await self.inflight.do(key, lambda: self.resilience.call(lambda: self._request_speech(text)))
+
+    async def text_to_speech_stream(
+        self,
+        text: str,
+        voice_id: str = "21m00Tcm4TlvDq8ikWAM",
+        model_id: str = "eleven_monolingual_v1"
+    ) -> AsyncGenerator[bytes, None]:
+        # Time to first byte follows the latency model; the rest arrives in 1 KiB chunks
+        audio = await self.resilience.call(lambda: self._request_speech(text), hedge=False)
+        for i in range(0, len(audio), 1024):
+            yield audio[i:i + 1024]
+
+    async def get_voices(self) -> Dict[str, Any]:
+        voices = [
+            {
+                "voice_id": "stub-voice-1",
+                "name": "Stub",
+                "category": "stub",
+                "description": "Silent offline voice",
+                "preview_url": None,
+                "settings": self.default_voice_settings
+            }
+        ]
+        return {"voices": voices, "total_count": len(voices)}
+
+    async def get_voice_settings(self, voice_id: str) -> Dict[str, Any]:
+        return self.default_voice_settings
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            **self.latency.stats(),
+            "singleflight": self.inflight.stats(),
+            "resilience": self.resilience.stats()
+        }
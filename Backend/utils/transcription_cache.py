@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping overhead (dict slots, key string)
+_ENTRY_OVERHEAD_BYTES = 256
+
+# Bump when the cached result format changes, so old disk entries are ignored
+_FORMAT_VERSION = 1
+
+
+def audio_digest(audio: np.ndarray) -> str:
+    """
+    Hash the exact samples a model would be given
+
+    Args:
+        audio: Mono float32 samples (decoded, resampled and trimmed)
+
+    Returns:
+        Hex digest of the sample bytes
+    """
+    return hashlib.blake2b(np.ascontiguousarray(audio, dtype=np.float32).data, digest_size=20).hexdigest()
+
+
+def cache_key(digest: str, language: Optional[str], model_size: str) -> str:
+    """
+    Build the cache key of one transcription
+
+    Args:
+        digest: audio_digest of the model input
+        language: Requested language code, or None for auto-detection
+        model_size: Whisper model size that transcribes the audio
+
+    Returns:
+        Key (the disk tier stores it under a hash, so it need not be a safe file name)
+    """
+    return f"{digest}-{language or 'auto'}-{model_size}"
+
+
+class TranscriptionCache:
+    """
+    Content-addressed cache of Whisper results
+
+    Results are keyed by a hash of the decoded audio plus the language and
+    model size, so a retried upload or a re-sent clip is answered without
+    running the model when it decodes to byte-identical samples (a lossless
+    rewrap hits; a lossy re-encode or a different resampling path misses). An
+    in-memory LRU is backed by an optional directory of JSON files that
+    survives restarts (and can be shared by several API processes: files
+    are written atomically).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+        enabled: bool = True
+    ):
+        """
+        Initialize the transcription cache
+
+        Args:
+            max_entries: Maximum number of results kept in memory
+            max_bytes: Approximate memory cap for results kept in memory
+            disk_dir: Directory of the on-disk tier; None or empty disables it
+            disk_max_bytes: Size cap of the on-disk tier (oldest files are removed first)
+            enabled: Whether lookups and stores are performed at all
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._total_bytes = 0
+        # Size of the disk tier, counted on first use and kept up to date by this process
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock: Optional[asyncio.Lock] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_errors = 0
+
+    async def get(self, digest: str, language: Optional[str], model_sizes: List[str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up a cached result, promoting disk hits into memory
+
+        Args:
+            digest: audio_digest of the model input
+            language: Requested language code, or None for auto-detection
+            model_sizes: Model sizes whose results are acceptable, in order of preference
+
+        Returns:
+            The model size and its result ("language", "segments"), or None on miss
+        """
+        if not self.enabled:
+            return None
+
+        keys = [(size, cache_key(digest, language, size)) for size in model_sizes]
+        for size, key in keys:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return size, entry[0]
+
+        if self.disk_dir is not None:
+            loop = asyncio.get_event_loop()
+            for size, key in keys:
+                result = await loop.run_in_executor(None, self._read_file, key)
+                if result is not None:
+                    self._remember(key, *result)
+                    self.disk_hits += 1
+                    return size, result[0]
+
+        self.misses += 1
+        return None
+
+    async def put(self, digest: str, language: Optional[str], model_size: str, result: Dict[str, Any]):
+        """
+        Store a model result in memory and, if configured, on disk
+
+        Args:
+            digest: audio_digest of the model input
+            language: Requested language code, or None for auto-detection
+            model_size: Model size that produced the result
+            result: Model result ("language", "segments") as plain data
+        """
+        if not self.enabled:
+            return
+
+        key = cache_key(digest, language, model_size)
+        encoded = json.dumps({"version": _FORMAT_VERSION, "result": result}).encode("utf-8")
+        self._remember(key, result, len(encoded))
+        self.stores += 1
+
+        if self.disk_dir is not None:
+            if self._disk_lock is None:
+                self._disk_lock = asyncio.Lock()
+            # One writer at a time keeps the size accounting and pruning consistent
+            async with self._disk_lock:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, self._write_file, key, encoded)
+
+    def _remember(self, key: str, result: Dict[str, Any], encoded_size: int):
+        """Insert into the in-memory LRU, evicting least recently used entries as needed"""
+        size_bytes = encoded_size + _ENTRY_OVERHEAD_BYTES
+        if size_bytes > self.max_bytes:
+            logger.debug("Transcription too large to cache in memory (%d bytes)", size_bytes)
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._total_bytes -= previous[1]
+        self._entries[key] = (result, size_bytes)
+        self._total_bytes += size_bytes
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_bytes
+            self.evictions += 1
+
+    def _path(self, key: str) -> str:
+        # The key embeds request fields, so the file name is a hash of it rather than the key itself;
+        # fan out over subdirectories so no single directory grows huge
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.json")
+
+    def _read_file(self, key: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Read and parse a disk entry (runs in the default executor)"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                encoded = f.read()
+            stored = json.loads(encoded)
+            if stored.get("version") != _FORMAT_VERSION:
+                return None
+            # Refresh the mtime so pruning removes the least recently used files first
+            os.utime(path)
+            return stored["result"], len(encoded)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable transcription cache file {path}: {e}")
+            self.disk_errors += 1
+            return None
+
+    def _write_file(self, key: str, encoded: bytes):
+        """Write a disk entry atomically, then prune the tier to its size cap (runs in the default executor)"""
+        path = self._path(key)
+        try:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(encoded)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self._disk_bytes += len(encoded) - replaced
+            if self._disk_bytes > self.disk_max_bytes:
+                self._prune_disk()
+        except OSError as e:
+            logger.warning(f"Could not write transcription cache file {path}: {e}")
+            self.disk_errors += 1
+
+    def _scan_disk(self):
+        """List (mtime, path, size) of every disk entry"""
+        files = []
+        for directory, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((info.st_mtime, path, info.st_size))
+        return files
+
+    def _prune_disk(self):
+        """Remove the least recently used files until the tier is back under 90% of its cap"""
+        files = sorted(self._scan_disk())
+        total = sum(size for _, _, size in files)
+        target = int(self.disk_max_bytes * 0.9)
+        for _, path, size in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.disk_evictions += 1
+        self._disk_bytes = total
+
+    def clear(self):
+        """Remove all in-memory entries (the disk tier and counters are kept)"""
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache occupancy and hit/miss counters"""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "disk": {
+                "enabled": self.disk_dir is not None,
+                "bytes": self._disk_bytes,
+                "max_bytes": self.disk_max_bytes,
+                "evictions": self.disk_evictions,
+                "errors": self.disk_errors,
+            },
+        }
@@ -0,0 +1,212 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough fixed cost of a session and of a pending chunk, on top of their text
+_SESSION_OVERHEAD = 512
+_CHUNK_OVERHEAD = 160
+
+
+class _Session:
+    __slots__ = ("committed_text", "committed_through", "pending", "language", "language_source", "last_active", "size")
+
+    def __init__(self):
+        self.committed_text = ""
+        self.committed_through = -1        # highest chunk index folded into committed_text
+        self.pending: Dict[int, str] = {}  # chunk index -> text, not yet committed
+        self.language: Optional[str] = None         # pinned language, None until detected or set
+        self.language_source: Optional[str] = None  # 'detected' or 'override'
+        self.last_active = time.monotonic()
+        self.size = _SESSION_OVERHEAD
+
+
+class TranscriptionSessionStore:
+    """
+    Per-session state of chunked realtime transcription, with bounded memory
+
+    Chunks are kept individually only until a final chunk arrives; then
+    they are compacted into the session's committed text. Sessions expire
+    after an idle TTL, the least recently used are dropped above a session
+    cap, and more are dropped while the total estimated size is above a
+    memory cap.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl_seconds: float = 600.0,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_pending_chunks: int = 32,
+        max_text_chars: int = 8000
+    ):
+        """
+        Initialize the session store
+
+        Args:
+            max_sessions: Maximum number of sessions kept (least recently used are dropped)
+            idle_ttl_seconds: Sessions untouched for this long are dropped
+            max_bytes: Cap on the estimated memory of all sessions together
+            max_pending_chunks: Uncommitted chunks kept per session before the oldest are compacted
+            max_text_chars: Committed text kept per session (older text is trimmed)
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_pending_chunks = max_pending_chunks
+        self.max_text_chars = max_text_chars
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+
+        self.compactions = 0
+        self.late_chunks = 0
+        self.languages_detected = 0
+        self.language_overrides = 0
+        self.evictions = {"ttl": 0, "lru": 0, "memory": 0}
+
+    def add_chunk(self, session_id: str, chunk_index: int, text: str, is_final: bool) -> str:
+        """
+        Record a transcribed chunk
+
+        Args:
+            session_id: Realtime session identifier
+            chunk_index: Index of the chunk in the session
+            text: Transcribed text of the chunk
+            is_final: Whether the chunk ends an utterance (commits pending chunks)
+
+        Returns:
+            The session's committed text
+        """
+        session = self._get(session_id)
+        self._bytes -= session.size
+
+        if chunk_index <= session.committed_through:
+            # Arrived after its neighbours were committed; too late to place
+            self.late_chunks += 1
+        else:
+            session.pending[chunk_index] = text
+            if is_final:
+                self._compact(session, len(session.pending))
+            elif len(session.pending) > self.max_pending_chunks:
+                self._compact(session, len(session.pending) - self.max_pending_chunks)
+
+        session.size = (
+            _SESSION_OVERHEAD
+            + sys.getsizeof(session.committed_text)
+            + sum(_CHUNK_OVERHEAD + sys.getsizeof(t) for t in session.pending.values())
+        )
+        self._bytes += session.size
+        self._evict()
+        return session.committed_text
+
+    def _compact(self, session: _Session, count: int):
+        """Fold the count oldest pending chunks into the committed text"""
+        indexes = sorted(session.pending)[:count]
+        texts = [session.pending.pop(i).strip() for i in indexes]
+        combined = " ".join(t for t in [session.committed_text, *texts] if t)
+        if len(combined) > self.max_text_chars:
+            combined = combined[-self.max_text_chars:].split(" ", 1)[-1]
+        session.committed_text = combined
+        session.committed_through = indexes[-1]
+        self.compactions += 1
+
+    def get_text(self, session_id: str) -> Optional[str]:
+        """Committed text of a session, or None if it is unknown or expired"""
+        session = self._sessions.get(session_id)
+        if session is None or session.last_active < time.monotonic() - self.idle_ttl_seconds:
+            return None
+        return session.committed_text
+
+    def get_language(self, session_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """Pinned language of a session and how it was set ('detected' or 'override'), or (None, None)"""
+        session = self._sessions.get(session_id)
+        if session is None or session.last_active < time.monotonic() - self.idle_ttl_seconds:
+            return None, None
+        return session.language, session.language_source
+
+    def pin_language(self, session_id: str, language: str, source: str) -> bool:
+        """
+        Pin the language used for the rest of a session's chunks
+
+        A detected language never replaces one that is already pinned (two
+        chunks may finish detection concurrently); an override always does.
+
+        Args:
+            session_id: Realtime session identifier
+            language: Language code
+            source: 'detected' or 'override'
+
+        Returns:
+            Whether the session's language changed
+        """
+        session = self._get(session_id)
+        if session.language == language or (source == "detected" and session.language is not None):
+            return False
+        session.language = language
+        session.language_source = source
+        if source == "override":
+            self.language_overrides += 1
+        else:
+            self.languages_detected += 1
+        logger.debug(f"Pinned language of transcription session {session_id} to {language} ({source})")
+        self._evict()
+        return True
+
+    def drop_session(self, session_id: str) -> bool:
+        """Forget a session; returns whether it existed"""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._bytes -= session.size
+        return True
+
+    def _get(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = _Session()
+            self._sessions[session_id] = session
+            self._bytes += session.size
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+        return session
+
+    def _evict(self):
+        """Drop idle sessions, then the least recently used above the session and memory caps"""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        # Sessions are in LRU order, so the idle ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_active >= cutoff:
+                break
+            self._remove_oldest("ttl")
+        while len(self._sessions) > self.max_sessions:
+            self._remove_oldest("lru")
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove_oldest("memory")
+
+    def _remove_oldest(self, reason: str):
+        session_id, session = self._sessions.popitem(last=False)
+        self._bytes -= session.size
+        self.evictions[reason] += 1
+        logger.debug(f"Evicted transcription session {session_id} ({reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get occupancy and eviction counters"""
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "pending_chunks": sum(len(s.pending) for s in self._sessions.values()),
+            "compactions": self.compactions,
+            "late_chunks": self.late_chunks,
+            "pinned_languages": sum(1 for s in self._sessions.values() if s.language is not None),
+            "languages_detected": self.languages_detected,
+            "language_overrides": self.language_overrides,
+            "evictions": dict(self.evictions),
+        }
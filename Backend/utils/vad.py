@@ -0,0 +1,141 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE
+
+
+class SpeechTrim:
+    """Result of EnergyVAD.trim: the kept audio and where it came from"""
+
+    def __init__(self, audio: np.ndarray, regions: List[Tuple[int, int]], original_length: int, sample_rate: int):
+        self.audio = audio
+        self.regions = regions  # (start, end) sample ranges of the original audio, in order
+        self.original_length = original_length
+        self.sample_rate = sample_rate
+
+    @property
+    def has_speech(self) -> bool:
+        return self.audio.size > 0
+
+    @property
+    def skipped_seconds(self) -> float:
+        return (self.original_length - self.audio.size) / self.sample_rate
+
+    def original_time(self, seconds: float) -> float:
+        """Map a time in the trimmed audio back to the original audio"""
+        position = seconds * self.sample_rate
+        for start, end in self.regions:
+            if position <= end - start:
+                return (start + position) / self.sample_rate
+            position -= end - start
+        return self.original_length / self.sample_rate
+
+
+class EnergyVAD:
+    """Frame-level voice activity detection by signal energy (RMS in dBFS)"""
+
+    def __init__(self, threshold_db: float = -45.0, frame_ms: int = 30, sample_rate: int = SAMPLE_RATE):
+        """
+        Initialize the detector
+
+        Args:
+            threshold_db: Frames louder than this (dBFS) count as speech
+            frame_ms: Frame length in milliseconds
+            sample_rate: Sample rate of the audio in Hz
+        """
+        self.threshold_db = threshold_db
+        self.frame_ms = frame_ms
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, sample_rate * frame_ms // 1000)
+
+    def frame_levels(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Energy of every complete frame
+
+        Args:
+            audio: Mono float32 samples in [-1, 1]
+
+        Returns:
+            Level of each frame in dBFS (a trailing partial frame is ignored)
+        """
+        count = audio.size // self.frame_length
+        if count == 0:
+            return np.zeros(0, dtype=np.float32)
+        frames = audio[:count * self.frame_length].reshape(count, self.frame_length)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-10))
+
+    def speech_frames(self, audio: np.ndarray, noise_margin_db: float = 0.0) -> np.ndarray:
+        """
+        Boolean speech mask with one entry per complete frame
+
+        Args:
+            audio: Mono float32 samples in [-1, 1]
+            noise_margin_db: If > 0, frames must also be this much louder than the
+                             recording's noise floor (its 10th-percentile frame level),
+                             provided the recording has one
+
+        Returns:
+            True for frames that contain speech
+        """
+        levels = self.frame_levels(audio)
+        mask = levels > self.threshold_db
+        if noise_margin_db > 0 and levels.size:
+            floor, loud = np.percentile(levels, [10, 90])
+            # Only a recording with quiet stretches has a noise floor; one that is loud
+            # throughout (e.g. a chunk cut mid-utterance) would lose its speech to it
+            if loud - floor > noise_margin_db:
+                mask &= levels > floor + noise_margin_db
+        return mask
+
+    def trim(
+        self,
+        audio: np.ndarray,
+        padding_ms: int = 200,
+        max_silence_ms: int = 800,
+        min_speech_ms: int = 100,
+        noise_margin_db: float = 10.0
+    ) -> SpeechTrim:
+        """
+        Remove leading, trailing and long internal silences
+
+        Speech runs are padded on both sides; silences shorter than
+        max_silence_ms between them are kept, longer ones are cut out.
+
+        Args:
+            audio: Mono float32 samples in [-1, 1]
+            padding_ms: Audio kept around every speech run
+            max_silence_ms: Longest internal silence kept as is
+            min_speech_ms: Less speech than this in total counts as no speech
+            noise_margin_db: Required level above the noise floor (0 uses the fixed threshold only)
+
+        Returns:
+            SpeechTrim with the kept audio (empty if there is no speech)
+        """
+        mask = self.speech_frames(audio, noise_margin_db)
+        frame = self.frame_length
+        min_speech = min_speech_ms * self.sample_rate // 1000
+        if int(mask.sum()) * frame < min_speech and noise_margin_db > 0:
+            # Never report no speech while enough frames clear the absolute threshold
+            mask = self.speech_frames(audio)
+        if int(mask.sum()) * frame < min_speech:
+            return SpeechTrim(audio[:0], [], audio.size, self.sample_rate)
+
+        # Speech runs as [start, end) frame indexes
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+        padding = padding_ms * self.sample_rate // 1000
+        max_gap = max_silence_ms * self.sample_rate // 1000
+
+        regions: List[Tuple[int, int]] = []
+        for start, end in zip((edges[::2] * frame).tolist(), (edges[1::2] * frame).tolist()):
+            start, end = max(0, start - padding), min(audio.size, end + padding)
+            if regions and start - regions[-1][1] <= max_gap:
+                regions[-1] = (regions[-1][0], end)
+            else:
+                regions.append((start, end))
+
+        if len(regions) == 1 and regions[0] == (0, audio.size):
+            return SpeechTrim(audio, regions, audio.size, self.sample_rate)
+        kept = np.concatenate([audio[start:end] for start, end in regions])
+        return SpeechTrim(kept, regions, audio.size, self.sample_rate)
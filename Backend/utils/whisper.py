@@ -1,98 +1,457 @@
 from faster_whisper import WhisperModel
 import asyncio
 import os
+import threading
+import time
 import numpy as np
-import librosa
-from typing import Dict, Any, Optional
+from collections import Counter, deque
+from typing import AsyncGenerator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
 import logging
-from pydub import AudioSegment
+from config import settings
+from utils.audio_decoding import AudioDecodeError, AudioDecoder, SAMPLE_RATE
+from utils.backends import TranscriptionBackend
+from utils.executor import ExecutorSaturatedError
+from utils.model_router import ModelRouter
+from utils.singleflight import SingleFlight
+from utils.transcription_cache import TranscriptionCache, audio_digest
+from utils.transcription_sessions import TranscriptionSessionStore
+from utils.vad import EnergyVAD, SpeechTrim
+from utils.whisper_pool import BATCH_MAX_SECONDS, WhisperWorkerPool, run_batch, run_transcription, warm_up
 
 logger = logging.getLogger(__name__)
 
-class WhisperTranscriber:
-    """Helper class for Faster-Whisper speech-to-text transcription"""
-    
-    def __init__(self, model_size: str = "base"):
+BatchRunner = Callable[[List[np.ndarray], List[Optional[str]], float], Awaitable[List[Dict[str, Any]]]]
+
+
+class _StreamAbandoned(Exception):
+    """Stops an in-process streaming transcription whose consumer went away"""
+
+
+class TranscriptionBatcher:
+    """
+    Micro-batching scheduler for short transcriptions
+
+    Requests arriving within a short window are collected (up to a maximum
+    batch size) and transcribed in one batched model pass; each caller gets
+    its own result back. A lone request waits at most the window.
+    """
+
+    def __init__(self, run: BatchRunner, max_batch_size: int = 8, window_ms: float = 20.0):
         """
-        Initialize Whisper transcriber
-        
+        Initialize the batcher
+
+        Args:
+            run: Coroutine function transcribing (audios, languages, temperature) as one batch
+            max_batch_size: A batch is started as soon as it has this many requests
+            window_ms: Longest time the first request of a batch waits for others
+        """
+        self.run = run
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+
+        # Requests waiting for their batch, per temperature (the batch shares sampling settings)
+        self._pending: Dict[float, List[Tuple[np.ndarray, Optional[str], asyncio.Future]]] = {}
+        self._timers: Dict[float, asyncio.TimerHandle] = {}
+
+        self.batches = 0
+        self.requests = 0
+        self.sizes = Counter()
+
+    async def submit(self, audio: np.ndarray, language: Optional[str], temperature: float) -> Dict[str, Any]:
+        """
+        Queue one clip for the next batch and wait for its result
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+            language: Language code or None for auto-detection
+            temperature: Sampling temperature
+
+        Returns:
+            run_transcription-shaped dictionary for this clip
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(temperature, [])
+        pending.append((audio, language, future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(temperature)
+        elif temperature not in self._timers:
+            self._timers[temperature] = loop.call_later(self.window, self._flush, temperature)
+        return await future
+
+    def _flush(self, temperature: float):
+        timer = self._timers.pop(temperature, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(temperature, [])
+        if items:
+            asyncio.ensure_future(self._run(items, temperature))
+
+    async def _run(self, items: List[Tuple[np.ndarray, Optional[str], asyncio.Future]], temperature: float):
+        # Callers that went away (client disconnect) are left out of the batch
+        items = [item for item in items if not item[2].done()]
+        if not items:
+            return
+
+        self.batches += 1
+        self.requests += len(items)
+        self.sizes[len(items)] += 1
+        try:
+            results = await self.run([audio for audio, _, _ in items], [language for _, language, _ in items], temperature)
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batch counters"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": round(self.window * 1000, 1),
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "batch_sizes": {str(size): count for size, count in sorted(self.sizes.items())},
+        }
+
+class WhisperTier:
+    """One resident Whisper model size, in this process or in its own worker pool"""
+
+    def __init__(
+        self,
+        model_size: str = "base",
+        pool: Optional[WhisperWorkerPool] = None,
+        batch_max_size: int = 8,
+        batch_window_ms: float = 20.0
+    ):
+        """
+        Initialize the tier
+
         Args:
             model_size: Whisper model size ('tiny', 'base', 'small', 'medium', 'large')
+            pool: Worker processes to run inference in; None runs the model in this process
+            batch_max_size: Max short clips transcribed in one batched pass (1 disables batching)
+            batch_window_ms: How long a short clip waits for others to batch with
         """
         self.model_size = model_size
         self.model = None
-        self.session_cache = {}  # For real-time transcription sessions
-        
-        # Load model in background
-        asyncio.create_task(self._load_model())
-    
-    async def _load_model(self):
-        """Load Whisper model asynchronously"""
+        self.pool = pool
+        self._load_lock: Optional[asyncio.Lock] = None
+        self.batcher = TranscriptionBatcher(self._run_batch, batch_max_size, batch_window_ms) if batch_max_size > 1 else None
+        self.depth = 0  # requests queued or running on this tier
+        self.requests = 0
+        self.audio_seconds = 0.0
+
+    async def load(self):
+        """Load and warm up the model exactly once (worker processes load their own copy)"""
+        if self.pool is not None:
+            await self.pool.start()
+            return
+        if self.model is not None:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self.model is not None:
+                return
+            def load_model():
+                model = WhisperModel(self.model_size, device="cpu", compute_type="int8")
+                warm_up(model)
+                return model
+            try:
+                loop = asyncio.get_event_loop()
+                self.model = await loop.run_in_executor(None, load_model)
+                logger.info(f"Faster-Whisper model '{self.model_size}' loaded successfully")
+            except Exception as e:
+                logger.error(f"Failed to load Whisper model '{self.model_size}': {e}")
+                raise
+
+    def close(self):
+        """Stop the tier's worker processes"""
+        if self.pool is not None:
+            self.pool.close()
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None if self.pool is None else self.pool.stats()["started"]
+
+    async def run(self, audio: np.ndarray, language: Optional[str], temperature: float, realtime: bool = False) -> Dict[str, Any]:
+        """
+        Transcribe decoded audio with this tier's model
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+            language: Language code or None for auto-detection
+            temperature: Sampling temperature
+            realtime: Whether the audio comes from a live session; only those clips are batched
+
+        Returns:
+            run_transcription-shaped dictionary
+        """
+        self.depth += 1
+        self.requests += 1
+        self.audio_seconds += audio.size / SAMPLE_RATE
         try:
+            await self.load()
+            # Short realtime clips are batched with concurrent requests (a batched clip
+            # comes back as one segment without timestamps, so uploads are not batched);
+            # the rest run alone in a worker process, or in the thread pool
+            if self.batcher is not None and realtime and audio.size <= BATCH_MAX_SECONDS * SAMPLE_RATE:
+                return await self.batcher.submit(audio, language, temperature)
+            if self.pool is not None:
+                return await self.pool.transcribe(audio, language=language, temperature=temperature)
             loop = asyncio.get_event_loop()
-            self.model = await loop.run_in_executor(
-                None, 
-                lambda: WhisperModel(self.model_size, device="cpu", compute_type="int8")
+            return await loop.run_in_executor(
+                None,
+                lambda: run_transcription(self.model, audio, language=language, temperature=temperature)
             )
-            logger.info(f"Faster-Whisper model '{self.model_size}' loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load Whisper model: {e}")
-            raise
+        finally:
+            self.depth -= 1
+
+    async def stream(
+        self,
+        audio: np.ndarray,
+        language: Optional[str],
+        temperature: float
+    ) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+        """
+        Transcribe decoded audio on its own (never batched), yielding segments as they are decoded
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+            language: Language code or None for auto-detection
+            temperature: Sampling temperature
+
+        Yields:
+            ("segment", segment) for every segment, then ("done", run_transcription-shaped result)
+        """
+        self.depth += 1
+        self.requests += 1
+        self.audio_seconds += audio.size / SAMPLE_RATE
+        loop = asyncio.get_running_loop()
+        segments: asyncio.Queue = asyncio.Queue()
+        abandoned = threading.Event()
+        job = None
+
+        def on_segment(segment: Dict[str, Any]):
+            loop.call_soon_threadsafe(segments.put_nowait, segment)
+
+        def on_segment_in_process(segment: Dict[str, Any]):
+            # Stop decoding the remaining windows once nobody is listening
+            # (a worker process is told the same through the pool's cancel event)
+            if abandoned.is_set():
+                raise _StreamAbandoned()
+            on_segment(segment)
+
+        try:
+            await self.load()
+            if self.pool is not None:
+                job = asyncio.ensure_future(
+                    self.pool.transcribe_stream(
+                        audio, on_segment, language=language, temperature=temperature, cancel=abandoned
+                    )
+                )
+            else:
+                job = loop.run_in_executor(
+                    None,
+                    lambda: run_transcription(
+                        self.model, audio, language=language, temperature=temperature,
+                        on_segment=on_segment_in_process
+                    )
+                )
+
+            while True:
+                next_segment = asyncio.ensure_future(segments.get())
+                await asyncio.wait({next_segment, job}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_segment.done():
+                    next_segment.cancel()
+                    break
+                yield "segment", next_segment.result()
+            # Segments are queued before the job's result is delivered, so all of them are here by now
+            while not segments.empty():
+                yield "segment", segments.get_nowait()
+            yield "done", job.result()
+        finally:
+            abandoned.set()
+            if job is not None and not job.done():
+                job.cancel()
+            self.depth -= 1
+
+    async def _run_batch(self, audios: List[np.ndarray], languages: List[Optional[str]], temperature: float) -> List[Dict[str, Any]]:
+        """Transcribe one micro-batch in a worker process, or in the thread pool"""
+        if self.pool is not None:
+            return await self.pool.transcribe_batch(audios, languages, temperature)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: run_batch(self.model, audios, languages, temperature))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get load and counters of this tier"""
+        return {
+            "model": self.model_size,
+            "loaded": self.loaded,
+            "depth": self.depth,
+            "requests": self.requests,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "worker_pool": self.pool.stats() if self.pool is not None else None,
+            "batching": self.batcher.stats() if self.batcher is not None else None
+        }
+
+
+class WhisperTranscriber(TranscriptionBackend):
+    """Helper class for Faster-Whisper speech-to-text transcription"""
+    
+    name = "whisper"
+    
+    def __init__(
+        self,
+        tiers: Optional[List[WhisperTier]] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        """
+        Initialize Whisper transcriber
+        
+        Args:
+            tiers: Resident model sizes, fastest first (defaults to a single 'base' model)
+            router: Picks the tier of each request (defaults to routing by realtime mode and load)
+        """
+        self.tiers = {tier.model_size: tier for tier in (tiers or [WhisperTier("base")])}
+        self.router = router or ModelRouter(list(self.tiers))
+        # Realtime transcription sessions, bounded by TTL, count and memory
+        self.sessions = TranscriptionSessionStore(
+            max_sessions=settings.TRANSCRIPTION_SESSION_MAX,
+            idle_ttl_seconds=settings.TRANSCRIPTION_SESSION_TTL_SECONDS,
+            max_bytes=settings.TRANSCRIPTION_SESSION_MAX_BYTES,
+            max_pending_chunks=settings.TRANSCRIPTION_SESSION_MAX_PENDING_CHUNKS
+        )
+        # Results of uploads already transcribed, keyed by the decoded audio
+        self.cache = TranscriptionCache(
+            max_entries=settings.TRANSCRIPTION_CACHE_MAX_ENTRIES,
+            max_bytes=settings.TRANSCRIPTION_CACHE_MAX_BYTES,
+            disk_dir=settings.TRANSCRIPTION_CACHE_DIR,
+            disk_max_bytes=settings.TRANSCRIPTION_CACHE_DISK_MAX_BYTES,
+            enabled=settings.TRANSCRIPTION_CACHE_ENABLED
+        )
+        # Identical uploads arriving together (e.g. a client retrying early) share one inference
+        self.inflight = SingleFlight("whisper")
+        self.decoder = AudioDecoder(
+            SAMPLE_RATE,
+            normalize=settings.AUDIO_PEAK_NORMALIZE,
+            ffmpeg_timeout=settings.AUDIO_DECODE_TIMEOUT_SECONDS
+        )
+        self.vad = EnergyVAD(settings.VAD_THRESHOLD_DB, settings.VAD_FRAME_MS) if settings.VAD_TRIM_ENABLED else None
+        self.no_speech_skips = 0
+        self.skipped_seconds = 0.0
+        self.audio_seconds = 0.0
+        # Realtime chunk latency with and without language detection
+        self.pin_languages = settings.REALTIME_LANGUAGE_PIN_ENABLED
+        self._chunk_latencies = {"detect": deque(maxlen=256), "pinned": deque(maxlen=256)}
+        self.chunk_counts = Counter()
+    
+    async def warmup(self):
+        """Load and warm up every resident model (models not warmed up load on first use)"""
+        await asyncio.gather(*(tier.load() for tier in self.tiers.values()))
     
-    async def _ensure_model_loaded(self):
-        """Ensure model is loaded before use"""
-        if self.model is None:
-            await self._load_model()
+    def health_error(self) -> Optional[str]:
+        """Error of the first worker pool that has failed, or None"""
+        for tier in self.tiers.values():
+            if tier.pool is not None and tier.pool.error is not None:
+                return tier.pool.error
+        return None
+    
+    async def close(self):
+        """Stop worker processes"""
+        for tier in self.tiers.values():
+            tier.close()
     
     async def transcribe(
         self, 
-        audio_path: str, 
+        audio: bytes, 
         language: Optional[str] = None,
-        temperature: float = 0.0
+        temperature: float = 0.0,
+        realtime: bool = False
     ) -> Dict[str, Any]:
         """
-        Transcribe audio file using Whisper
+        Transcribe audio using Whisper
         
         Args:
-            audio_path: Path to audio file
+            audio: Encoded audio bytes (WAV, MP3, M4A, WebM, ...)
             language: Language code (e.g., 'en', 'es') or None for auto-detection
             temperature: Sampling temperature (0.0 = deterministic)
+            realtime: Whether the audio comes from a live session (prefers the fastest model)
             
         Returns:
-            Dictionary with transcription results
+            Dictionary with transcription results, including the model that produced them
         """
         try:
-            await self._ensure_model_loaded()
+            # Decode in memory and cut silences
+            audio_data, trim = await self._preprocess_audio(audio)
+            duration = (trim.original_length if trim is not None else len(audio_data)) / SAMPLE_RATE
+            skipped = trim.skipped_seconds if trim is not None else 0.0
+            self.audio_seconds += duration
+            self.skipped_seconds += skipped
             
-            # Preprocess audio
-            audio_data = await self._preprocess_audio(audio_path)
+            # Nothing but silence or noise: answer without running the model
+            if trim is not None and not trim.has_speech:
+                self.no_speech_skips += 1
+                return {
+                    "text": "",
+                    "language": language or "unknown",
+                    "segments": [],
+                    "confidence": 0.0,
+                    "duration": duration,
+                    "skipped_seconds": round(skipped, 2),
+                    "no_speech": True
+                }
             
-            # Run transcription in thread pool
-            loop = asyncio.get_event_loop()
-            segments, info = await loop.run_in_executor(
-                None,
-                lambda: self.model.transcribe(
-                    audio_data,
-                    language=language,
-                    temperature=temperature
-                )
+            # Pick a resident model by realtime mode, speech duration and queue depth
+            model_size, routing = self.router.choose(
+                len(audio_data) / SAMPLE_RATE,
+                realtime,
+                {size: tier.depth for size, tier in self.tiers.items()}
             )
             
-            # Convert segments to list and extract text
-            segments_list = list(segments)
-            full_text = " ".join([segment.text for segment in segments_list])
+            # Serve uploads that were already transcribed without touching the model
+            digest = hit = None
+            if not realtime:
+                digest, hit = await self._cache_lookup(audio_data, language, temperature, model_size)
+            if hit is not None:
+                model_size, result = hit
+                routing = "cache"
+            elif digest is not None:
+                result = await self.inflight.do(
+                    (digest, language, model_size),
+                    lambda: self._run_and_cache(model_size, audio_data, language, temperature, digest)
+                )
+            else:
+                result = await self.tiers[model_size].run(audio_data, language, temperature, realtime)
+            
+            segments_list = result["segments"]
+            full_text = " ".join([segment["text"] for segment in segments_list])
             
             # Calculate confidence score (approximate)
             confidence = self._calculate_confidence_faster(segments_list)
             
+            segments = [self._original_timeline(s, trim) for s in segments_list]
+            
             return {
                 "text": full_text.strip(),
-                "language": info.language,
-                "segments": [{"text": s.text, "start": s.start, "end": s.end} for s in segments_list],
+                "language": result["language"],
+                "segments": segments,
                 "confidence": confidence,
-                "duration": len(audio_data) / 16000  # Assuming 16kHz sample rate
+                "duration": duration,
+                "skipped_seconds": round(skipped, 2),
+                "model": model_size,
+                "routing": routing,
+                "cached": hit is not None
             }
             
+        except (ExecutorSaturatedError, AudioDecodeError):
+            raise
         except Exception as e:
             logger.error(f"Transcription error: {e}")
             return {
@@ -103,63 +462,203 @@ class WhisperTranscriber:
                 "error": str(e)
             }
     
+    async def transcribe_stream(
+        self,
+        audio: bytes,
+        language: Optional[str] = None,
+        temperature: float = 0.0
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Transcribe audio, yielding each segment as soon as the model produces it
+        
+        faster-whisper decodes one 30 s window at a time, so the first segments
+        of a long recording arrive long before the whole file is done.
+        
+        Args:
+            audio: Encoded audio bytes (WAV, MP3, M4A, WebM, ...)
+            language: Language code (e.g., 'en', 'es') or None for auto-detection
+            temperature: Sampling temperature (0.0 = deterministic)
+            
+        Yields:
+            {"type": "segment", "text", "start", "end"} per segment, then
+            {"type": "done", "text", "language", "confidence", "duration", ...}
+        """
+        audio_data, trim = await self._preprocess_audio(audio)
+        duration = (trim.original_length if trim is not None else len(audio_data)) / SAMPLE_RATE
+        skipped = trim.skipped_seconds if trim is not None else 0.0
+        self.audio_seconds += duration
+        self.skipped_seconds += skipped
+        
+        if trim is not None and not trim.has_speech:
+            self.no_speech_skips += 1
+            yield {
+                "type": "done",
+                "text": "",
+                "language": language or "unknown",
+                "confidence": 0.0,
+                "duration": duration,
+                "skipped_seconds": round(skipped, 2),
+                "no_speech": True
+            }
+            return
+        
+        model_size, routing = self.router.choose(
+            len(audio_data) / SAMPLE_RATE,
+            False,
+            {size: tier.depth for size, tier in self.tiers.items()}
+        )
+        digest, hit = await self._cache_lookup(audio_data, language, temperature, model_size)
+        if hit is not None:
+            model_size, result = hit
+            for segment in result["segments"]:
+                yield {"type": "segment", **self._original_timeline(segment, trim)}
+            yield {
+                "type": "done",
+                "text": " ".join(s["text"] for s in result["segments"]).strip(),
+                "language": result["language"],
+                "confidence": self._calculate_confidence_faster(result["segments"]),
+                "duration": duration,
+                "skipped_seconds": round(skipped, 2),
+                "model": model_size,
+                "routing": "cache",
+                "cached": True
+            }
+            return
+        
+        async for kind, payload in self.tiers[model_size].stream(audio_data, language, temperature):
+            if kind == "segment":
+                yield {"type": "segment", **self._original_timeline(payload, trim)}
+                continue
+            if digest is not None:
+                await self.cache.put(digest, language, model_size, payload)
+            yield {
+                "type": "done",
+                "text": " ".join(s["text"] for s in payload["segments"]).strip(),
+                "language": payload["language"],
+                "confidence": self._calculate_confidence_faster(payload["segments"]),
+                "duration": duration,
+                "skipped_seconds": round(skipped, 2),
+                "model": model_size,
+                "routing": routing,
+                "cached": False
+            }
+    
+    async def _cache_lookup(
+        self,
+        audio: np.ndarray,
+        language: Optional[str],
+        temperature: float,
+        model_size: str
+    ) -> Tuple[Optional[str], Optional[Tuple[str, Dict[str, Any]]]]:
+        """
+        Look up the result of an earlier transcription of the same audio
+        
+        A result from the routed model or a more accurate one is accepted, so
+        a retry routed to a smaller model under load still hits.
+        
+        Args:
+            audio: Model input (decoded and trimmed samples)
+            language: Requested language code, or None for auto-detection
+            temperature: Sampling temperature (only deterministic decoding is cached)
+            model_size: Tier the router picked
+            
+        Returns:
+            The audio digest (None when the request is not cacheable) and the
+            cached model size and result (None on miss)
+        """
+        if not self.cache.enabled or temperature != 0.0:
+            return None, None
+        loop = asyncio.get_event_loop()
+        digest = await loop.run_in_executor(None, audio_digest, audio)
+        sizes = list(self.tiers)
+        return digest, await self.cache.get(digest, language, sizes[sizes.index(model_size):])
+    
+    async def _run_and_cache(
+        self,
+        model_size: str,
+        audio: np.ndarray,
+        language: Optional[str],
+        temperature: float,
+        digest: str
+    ) -> Dict[str, Any]:
+        """Transcribe on one tier and store the result under the audio digest"""
+        result = await self.tiers[model_size].run(audio, language, temperature)
+        await self.cache.put(digest, language, model_size, result)
+        return result
+    
+    def _original_timeline(self, segment: Dict[str, Any], trim: Optional[SpeechTrim]) -> Dict[str, Any]:
+        """Segment times refer to the trimmed audio; report them in the original's timeline"""
+        start, end = segment["start"], segment["end"]
+        if trim is not None and trim.skipped_seconds:
+            start, end = round(trim.original_time(start), 2), round(trim.original_time(end), 2)
+        return {"text": segment["text"], "start": start, "end": end}
+    
     async def transcribe_chunk(
         self,
-        audio_path: str,
+        audio: bytes,
         session_id: str,
-        chunk_index: int
+        chunk_index: int,
+        language: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Transcribe audio chunk for real-time processing
         
+        The session's language is detected once, on its first chunk with at
+        least REALTIME_LANGUAGE_PIN_MIN_SECONDS of speech, and pinned: later
+        chunks skip Whisper's language detection, which costs time on every
+        chunk and flips between languages on short ones.
+        
         Args:
-            audio_path: Path to audio chunk
+            audio: Encoded audio chunk bytes
             session_id: Unique session identifier
             chunk_index: Index of this chunk in the session
+            language: Language code to pin for this and later chunks (None keeps the session's language)
             
         Returns:
             Dictionary with partial transcription results
         """
         try:
-            await self._ensure_model_loaded()
-            
-            # Initialize session if needed
-            if session_id not in self.session_cache:
-                self.session_cache[session_id] = {
-                    "chunks": [],
-                    "full_text": "",
-                    "last_chunk_index": -1
-                }
-            
-            session = self.session_cache[session_id]
+            if language is not None:
+                self.sessions.pin_language(session_id, language, "override")
+            pinned, _ = self.sessions.get_language(session_id)
             
             # Transcribe current chunk
-            result = await self.transcribe(audio_path)
+            started = time.perf_counter()
+            result = await self.transcribe(audio, language=pinned, realtime=True)
+            ran_model = "error" not in result and not result.get("no_speech")
+            if ran_model:
+                kind = "pinned" if pinned is not None else "detect"
+                self._chunk_latencies[kind].append(time.perf_counter() - started)
+                self.chunk_counts[kind] += 1
             
-            # Update session
-            session["chunks"].append({
-                "index": chunk_index,
-                "text": result["text"],
-                "confidence": result["confidence"]
-            })
-            session["last_chunk_index"] = chunk_index
+            speech_seconds = result.get("duration", 0.0) - result.get("skipped_seconds", 0.0)
+            if (
+                pinned is None
+                and self.pin_languages
+                and ran_model
+                and speech_seconds >= settings.REALTIME_LANGUAGE_PIN_MIN_SECONDS
+            ):
+                self.sessions.pin_language(session_id, result["language"], "detected")
             
             # Determine if this should be considered "final"
             is_final = self._is_chunk_final(result["text"])
             
-            if is_final:
-                # Combine chunks for better context
-                combined_text = self._combine_chunks(session["chunks"])
-                session["full_text"] = combined_text
+            # A final chunk commits the session's pending chunks into its text
+            session_text = self.sessions.add_chunk(session_id, chunk_index, result["text"], is_final)
             
             return {
                 "text": result["text"],
                 "confidence": result["confidence"],
                 "is_final": is_final,
-                "session_text": session["full_text"],
-                "chunk_index": chunk_index
+                "session_text": session_text,
+                "chunk_index": chunk_index,
+                "model": result.get("model"),
+                "language": result["language"],
+                "language_pinned": pinned is not None
             }
             
+        except (ExecutorSaturatedError, AudioDecodeError):
+            raise
         except Exception as e:
             logger.error(f"Chunk transcription error: {e}")
             return {
@@ -169,31 +668,33 @@ class WhisperTranscriber:
                 "error": str(e)
             }
     
-    async def _preprocess_audio(self, audio_path: str) -> np.ndarray:
+    async def _preprocess_audio(self, audio: bytes) -> Tuple[np.ndarray, Optional[SpeechTrim]]:
         """
-        Preprocess audio file for Whisper
+        Decode audio bytes for Whisper without writing them to disk, then trim silences
         
         Args:
-            audio_path: Path to audio file
+            audio: Encoded audio bytes
             
         Returns:
-            Audio data as numpy array
+            Mono float32 samples at 16 kHz (leading, trailing and long internal
+            silences removed) and the trim result (None when trimming is disabled)
         """
+        def prepare():
+            samples = self.decoder.decode(audio)
+            if self.vad is None:
+                return samples, None
+            trim = self.vad.trim(
+                samples,
+                padding_ms=settings.VAD_TRIM_PADDING_MS,
+                max_silence_ms=settings.VAD_MAX_SILENCE_MS,
+                min_speech_ms=settings.VAD_MIN_SPEECH_MS,
+                noise_margin_db=settings.VAD_NOISE_MARGIN_DB
+            )
+            return trim.audio, trim
+        
         try:
-            # Convert to supported format if needed
-            if audio_path.endswith(('.mp3', '.m4a', '.webm')):
-                audio_segment = AudioSegment.from_file(audio_path)
-                audio_segment = audio_segment.set_frame_rate(16000).set_channels(1)
-                
-                # Convert to numpy array
-                audio_data = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
-                audio_data = audio_data / np.max(np.abs(audio_data))  # Normalize
-            else:
-                # Load with librosa for other formats
-                audio_data, _ = librosa.load(audio_path, sr=16000, mono=True)
-            
-            return audio_data
-            
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, prepare)
         except Exception as e:
             logger.error(f"Audio preprocessing error: {e}")
             raise
@@ -218,9 +719,9 @@ class WhisperTranscriber:
             
             for segment in segments:
                 # faster-whisper provides avg_logprob
-                if hasattr(segment, 'avg_logprob'):
+                if segment.get("avg_logprob") is not None:
                     # Convert log probability to probability
-                    prob = np.exp(segment.avg_logprob)
+                    prob = np.exp(segment["avg_logprob"])
                     total_prob += prob
                 else:
                     total_prob += 0.5  # Default if no probability available
@@ -258,34 +759,35 @@ class WhisperTranscriber:
         
         return False
     
-    def _combine_chunks(self, chunks: list) -> str:
-        """
-        Combine multiple chunks into coherent text
-        
-        Args:
-            chunks: List of chunk dictionaries
-            
-        Returns:
-            Combined text
-        """
-        sorted_chunks = sorted(chunks, key=lambda x: x["index"])
-        texts = [chunk["text"] for chunk in sorted_chunks if chunk["text"].strip()]
-        return " ".join(texts)
+    def clear_session(self, session_id: str) -> bool:
+        """Clear the state of a realtime session; returns whether it existed"""
+        return self.sessions.drop_session(session_id)
     
-    def clear_session(self, session_id: str):
-        """Clear session cache for a specific session"""
-        if session_id in self.session_cache:
-            del self.session_cache[session_id]
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics: resident models, routing, the result cache and open realtime sessions"""
+        return {
+            "backend": self.name,
+            "models": {size: tier.stats() for size, tier in self.tiers.items()},
+            "routing": self.router.stats(),
+            "sessions": self.sessions.stats(),
+            "realtime_language": self._language_pinning_stats(),
+            "cache": self.cache.stats(),
+            "singleflight": self.inflight.stats(),
+            "decoding": self.decoder.stats(),
+            "vad": {
+                "enabled": self.vad is not None,
+                "no_speech_skips": self.no_speech_skips,
+                "audio_seconds": round(self.audio_seconds, 1),
+                "skipped_seconds": round(self.skipped_seconds, 1),
+            }
+        }
     
-    def get_supported_languages(self) -> list:
-        """Get list of supported languages"""
-        return [
-            "en", "zh", "de", "es", "ru", "ko", "fr", "ja", "pt", "tr", "pl", "ca", "nl",
-            "ar", "sv", "it", "id", "hi", "fi", "vi", "he", "uk", "el", "ms", "cs", "ro",
-            "da", "hu", "ta", "no", "th", "ur", "hr", "bg", "lt", "la", "mi", "ml", "cy",
-            "sk", "te", "fa", "lv", "bn", "sr", "az", "sl", "kn", "et", "mk", "br", "eu",
-            "is", "hy", "ne", "mn", "bs", "kk", "sq", "sw", "gl", "mr", "pa", "si", "km",
-            "sn", "yo", "so", "af", "oc", "ka", "be", "tg", "sd", "gu", "am", "yi", "lo",
-            "uz", "fo", "ht", "ps", "tk", "nn", "mt", "sa", "lb", "my", "bo", "tl", "mg",
-            "as", "tt", "haw", "ln", "ha", "ba", "jw", "su"
-        ] 
\ No newline at end of file
+    def _language_pinning_stats(self) -> Dict[str, Any]:
+        """Realtime chunk counts and latency before (detecting) and after a session's language is pinned"""
+        stats = {"pinning_enabled": self.pin_languages, "min_speech_seconds": settings.REALTIME_LANGUAGE_PIN_MIN_SECONDS}
+        for kind, recent in self._chunk_latencies.items():
+            latencies = sorted(recent)
+            stats[f"{kind}_chunks"] = self.chunk_counts[kind]
+            stats[f"{kind}_p50_ms"] = round(latencies[len(latencies) // 2] * 1000) if latencies else 0
+            stats[f"{kind}_p95_ms"] = round(latencies[int(len(latencies) * 0.95)] * 1000) if latencies else 0
+        return stats
@@ -0,0 +1,666 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Any, List, Optional
+import logging
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE
+from utils.executor import AdmissionGate
+
+logger = logging.getLogger(__name__)
+
+
+# Longest clip that can join a batch: one Whisper window, decoded in a single pass
+BATCH_MAX_SECONDS = 30.0
+
+
+class WorkerCrashedError(Exception):
+    """Raised when a Whisper worker process died or hung while running a job"""
+
+
+class _JobCancelled(Exception):
+    """Stops a worker's streaming job once the parent asked it to"""
+
+
+def run_transcription(
+    model,
+    audio: np.ndarray,
+    language: Optional[str] = None,
+    temperature: float = 0.0,
+    on_segment: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Run a faster-whisper model and flatten its output to plain data
+
+    Used in worker processes and by the in-process fallback, so both return
+    the same picklable structure.
+
+    Args:
+        model: Loaded WhisperModel
+        audio: Mono float32 samples at 16 kHz
+        language: Language code or None for auto-detection
+        temperature: Sampling temperature
+        on_segment: Called with each segment as soon as the model produces it
+                    (segments are decoded lazily, one 30 s window at a time)
+
+    Returns:
+        Dictionary with "language" and "segments" (text, start, end, avg_logprob)
+    """
+    segments, info = model.transcribe(audio, language=language, temperature=temperature)
+    output = []
+    for s in segments:
+        segment = {"text": s.text, "start": s.start, "end": s.end, "avg_logprob": s.avg_logprob}
+        output.append(segment)
+        if on_segment is not None:
+            on_segment(segment)
+    return {"language": info.language, "segments": output}
+
+
+def warm_up(model):
+    """
+    Run one dummy inference on a freshly loaded model
+
+    CTranslate2 allocates its buffers and picks kernels on the first call;
+    doing that here keeps the cost off the first real request.
+
+    Args:
+        model: Loaded WhisperModel
+    """
+    run_transcription(model, np.zeros(SAMPLE_RATE, dtype=np.float32))
+
+
+def run_batch(model, audios: List[np.ndarray], languages: List[Optional[str]], temperature: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Transcribe several short clips in one batched encoder/decoder pass
+
+    Falls back to transcribing the clips one by one if the batched decode is
+    not available with the installed faster-whisper / CTranslate2 versions.
+
+    Args:
+        model: Loaded WhisperModel
+        audios: Mono float32 clips at 16 kHz, each at most BATCH_MAX_SECONDS long
+        languages: Language code per clip, or None for auto-detection
+        temperature: Sampling temperature shared by the batch
+
+    Returns:
+        One run_transcription-shaped dictionary per clip, in order
+    """
+    if len(audios) > 1:
+        try:
+            return _decode_batch(model, audios, list(languages), temperature)
+        except Exception as e:
+            logger.warning(f"Batched decode failed ({e}), transcribing {len(audios)} clips one by one")
+    return [run_transcription(model, audio, language, temperature) for audio, language in zip(audios, languages)]
+
+
+def _decode_batch(model, audios: List[np.ndarray], languages: List[Optional[str]], temperature: float) -> List[Dict[str, Any]]:
+    """Single 30 s window per clip, no timestamps: one segment per clip"""
+    import ctranslate2
+    from faster_whisper.tokenizer import Tokenizer
+
+    frames = model.feature_extractor.nb_max_frames
+    features = []
+    for audio in audios:
+        mel = model.feature_extractor(audio)[:, :frames]
+        features.append(np.pad(mel, ((0, 0), (0, frames - mel.shape[1]))))
+    features = np.ascontiguousarray(np.stack(features), dtype=np.float32)
+
+    multilingual = model.model.is_multilingual
+    if not multilingual:
+        languages = ["en"] * len(audios)
+    missing = [i for i, language in enumerate(languages) if language is None]
+    if missing:
+        detected = model.model.detect_language(ctranslate2.StorageView.from_array(features[missing]))
+        for i, probabilities in zip(missing, detected):
+            languages[i] = probabilities[0][0][2:-2]  # "<|en|>" -> "en"
+
+    tokenizers = {}
+    prompts = []
+    for language in languages:
+        if language not in tokenizers:
+            tokenizers[language] = Tokenizer(model.hf_tokenizer, multilingual, task="transcribe", language=language)
+        tokenizer = tokenizers[language]
+        prompts.append(list(tokenizer.sot_sequence) + [tokenizer.no_timestamps])
+
+    sampling = {"beam_size": 5} if temperature == 0 else {
+        "beam_size": 1, "sampling_topk": 0, "sampling_temperature": temperature
+    }
+    results = model.model.generate(
+        ctranslate2.StorageView.from_array(features),
+        prompts,
+        return_scores=True,
+        return_no_speech_prob=True,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+        **sampling
+    )
+
+    output = []
+    for audio, language, result in zip(audios, languages, results):
+        tokenizer = tokenizers[language]
+        text = tokenizer.decode([t for t in result.sequences_ids[0] if t < tokenizer.eot])
+        avg_logprob = result.scores[0]
+        segments = []
+        # Whisper's own no-speech rule
+        if text.strip() and not (result.no_speech_prob > 0.6 and avg_logprob < -1.0):
+            segments.append({
+                "text": text,
+                "start": 0.0,
+                "end": round(audio.size / SAMPLE_RATE, 2),
+                "avg_logprob": avg_logprob
+            })
+        output.append({"language": language, "segments": segments})
+    return output
+
+
+def _send_segment(conn, segment: Dict[str, Any]):
+    """Send one streamed segment, then stop the job if the parent has asked to cancel it"""
+    conn.send(("segment", segment))
+    # Only a cancel can arrive while a job is running
+    if conn.poll() and conn.recv()[0] == "cancel":
+        raise _JobCancelled()
+
+
+def _worker_main(conn, model_size: str, cpu_threads: int):
+    """Worker process: load and warm up the model once, then serve jobs from the pipe until told to stop"""
+    try:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+        warm_up(model)
+    except Exception as e:
+        conn.send(("error", f"Failed to load Whisper model: {e}"))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+
+        if kind == "stop":
+            return
+        if kind == "cancel":
+            # The job finished before the cancel arrived
+            continue
+        if kind == "ping":
+            conn.send(("pong", None))
+            continue
+
+        shm_name, lengths, options = payload
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+        except Exception as e:
+            conn.send(("error", f"Audio buffer unavailable: {e}"))
+            continue
+        try:
+            # Views on the parent's buffer; the audio is never copied or pickled
+            buffer = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+            clips = np.split(buffer, np.cumsum(lengths)[:-1])
+            if kind == "transcribe_batch":
+                result = run_batch(model, clips, **options)
+            elif kind == "transcribe_stream":
+                # Segments are sent back one by one ahead of the final reply
+                result = run_transcription(model, clips[0], on_segment=lambda s: _send_segment(conn, s), **options)
+            else:
+                result = run_transcription(model, clips[0], **options)
+            del buffer, clips
+        except _JobCancelled:
+            conn.send(("cancelled", None))
+            continue
+        except Exception as e:
+            conn.send(("error", str(e)))
+            continue
+        finally:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        conn.send(("ok", result))
+
+
+class _Worker:
+    """Handle on one worker process and the parent end of its pipe (blocking methods)"""
+
+    def __init__(self, ctx, index: int, model_size: str, cpu_threads: int):
+        self.ctx = ctx
+        self.index = index
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.conn = None
+        self.process = None
+        self.pid = None
+        self.jobs = 0
+        self.restarts = 0
+        # Set once the worker could not be restarted; it never rejoins the idle queue
+        self.failed = False
+
+    def start(self, ready_timeout: float):
+        """Spawn the process and wait until its model is loaded"""
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_size, self.cpu_threads),
+            name=f"whisper-worker-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        if not self.conn.poll(ready_timeout):
+            self.stop()
+            raise WorkerCrashedError(f"Whisper worker {self.index} did not load its model in {ready_timeout:g}s")
+        try:
+            status, payload = self.conn.recv()
+        except EOFError:
+            self.stop()
+            raise WorkerCrashedError(f"Whisper worker {self.index} exited while loading its model")
+        if status != "ready":
+            self.stop()
+            raise WorkerCrashedError(payload)
+        self.pid = payload
+
+    def request(
+        self,
+        message,
+        timeout: float,
+        on_segment: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None
+    ):
+        """
+        Send one message and wait for the reply, passing streamed segments to on_segment on the way
+
+        Once cancel is set, the worker is told to stop a streaming job at its
+        next segment (it answers "cancelled"); later segments are dropped.
+        """
+        try:
+            self.conn.send(message)
+            cancel_sent = False
+            deadline = time.monotonic() + timeout
+            while True:
+                if cancel is not None and cancel.is_set() and not cancel_sent:
+                    self.conn.send(("cancel", None))
+                    cancel_sent = True
+                remaining = deadline - time.monotonic()
+                # Wake up regularly to forward a cancel while the worker is busy
+                wait = remaining if cancel is None or cancel_sent else min(remaining, 0.25)
+                if not self.conn.poll(max(wait, 0)):
+                    if wait >= remaining:
+                        raise WorkerCrashedError(f"Whisper worker {self.index} did not answer in {timeout:g}s")
+                    continue
+                status, payload = self.conn.recv()
+                if status != "segment":
+                    return status, payload
+                deadline = time.monotonic() + timeout
+                if on_segment is not None and not cancel_sent:
+                    on_segment(payload)
+        except (EOFError, OSError) as e:
+            raise WorkerCrashedError(f"Whisper worker {self.index} died: {str(e) or 'pipe closed'}")
+
+    def stop(self):
+        """Stop the process, killing it if it does not exit promptly"""
+        if self.process is None:
+            return
+        try:
+            if self.process.is_alive():
+                try:
+                    self.conn.send(("stop", None))
+                except (OSError, ValueError):
+                    pass
+                self.process.join(2)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join(2)
+        finally:
+            self.conn.close()
+            self.process = None
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class WhisperWorkerPool:
+    """
+    Pool of Whisper worker processes, each with its own model and CPU-thread budget
+
+    Inference runs outside the API process, so it scales with cores and does
+    not compete with the event loop for the GIL. Audio is handed to workers
+    through shared memory; only job metadata and results cross the pipe.
+    Crashed or hung workers are restarted; idle workers are pinged periodically.
+    """
+
+    def __init__(
+        self,
+        model_size: str,
+        workers: int,
+        cpu_threads: int = 0,
+        max_queue: int = 32,
+        job_timeout: float = 300.0,
+        health_interval: float = 15.0,
+        ready_timeout: float = 600.0,
+        restart_attempts: int = 5
+    ):
+        """
+        Initialize the pool (processes are spawned on first use)
+
+        Args:
+            model_size: Whisper model size loaded by every worker
+            workers: Number of worker processes
+            cpu_threads: CPU threads per worker (0 splits the machine's cores evenly)
+            max_queue: Maximum number of jobs waiting for a free worker
+            job_timeout: Seconds after which a job's worker is considered hung and restarted
+            health_interval: Seconds between health checks of idle workers
+            ready_timeout: Seconds a worker may take to load its model
+            restart_attempts: Failed restarts after which a worker is given up on
+        """
+        self.model_size = model_size
+        self.size = max(1, workers)
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.size)
+        self.job_timeout = job_timeout
+        self.health_interval = health_interval
+        self.ready_timeout = ready_timeout
+        self.restart_attempts = max(1, restart_attempts)
+
+        ctx = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(ctx, i, model_size, self.cpu_threads) for i in range(self.size)]
+        # Blocking pipe I/O happens on these threads: in-flight jobs, restarts and pings
+        self._io = ThreadPoolExecutor(max_workers=2 * self.size + 1, thread_name_prefix="whisper-ipc")
+        self.gate = AdmissionGate("whisper", max_concurrency=self.size, max_queue=max_queue)
+
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._started = False
+        self._health_task: Optional[asyncio.Task] = None
+        # Why the pool can no longer serve jobs (every worker was given up on), or None
+        self.error: Optional[str] = None
+
+        self.completed = 0
+        self.failed = 0
+        self.crashes = 0
+        self.cancelled = 0
+
+    async def start(self):
+        """
+        Spawn all workers and wait for their models to load (idempotent)
+
+        Raises:
+            WorkerCrashedError: If the pool has failed (no worker could be restarted)
+        """
+        if self.error is not None:
+            raise WorkerCrashedError(self.error)
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._io, worker.start, self.ready_timeout)
+                for worker in self._workers
+            ))
+            self._idle = asyncio.Queue()
+            for worker in self._workers:
+                self._idle.put_nowait(worker)
+            self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+            logger.info(
+                f"Started {self.size} Whisper worker(s) with model '{self.model_size}', "
+                f"{self.cpu_threads} CPU thread(s) each"
+            )
+
+    async def transcribe(self, audio: np.ndarray, language: Optional[str] = None, temperature: float = 0.0) -> Dict[str, Any]:
+        """
+        Transcribe decoded audio on a free worker
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+            language: Language code or None for auto-detection
+            temperature: Sampling temperature
+
+        Returns:
+            Output of run_transcription
+
+        Raises:
+            ExecutorSaturatedError: If every worker is busy and the wait queue is full
+            WorkerCrashedError: If the worker died or hung during the job
+        """
+        await self.start()
+        return await self.gate.run(
+            lambda: self._dispatch("transcribe", [audio], {"language": language, "temperature": temperature})
+        )
+
+    async def transcribe_stream(
+        self,
+        audio: np.ndarray,
+        on_segment: Callable[[Dict[str, Any]], None],
+        language: Optional[str] = None,
+        temperature: float = 0.0,
+        cancel: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """
+        Transcribe decoded audio on a free worker, reporting segments as they are decoded
+
+        Args:
+            audio: Mono float32 samples at 16 kHz
+            on_segment: Called (from an I/O thread) with each segment as the worker sends it
+            language: Language code or None for auto-detection
+            temperature: Sampling temperature
+            cancel: Set when nobody is listening any more; the worker then stops
+                    decoding at its next segment and is free for other jobs
+
+        Returns:
+            Output of run_transcription
+        """
+        await self.start()
+        return await self.gate.run(
+            lambda: self._dispatch(
+                "transcribe_stream", [audio], {"language": language, "temperature": temperature}, on_segment, cancel
+            )
+        )
+
+    async def transcribe_batch(
+        self,
+        audios: List[np.ndarray],
+        languages: List[Optional[str]],
+        temperature: float = 0.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Transcribe several short clips in one batched pass on a free worker
+
+        Args:
+            audios: Mono float32 clips at 16 kHz, each at most BATCH_MAX_SECONDS long
+            languages: Language code per clip, or None for auto-detection
+            temperature: Sampling temperature shared by the batch
+
+        Returns:
+            Output of run_batch
+        """
+        await self.start()
+        return await self.gate.run(
+            lambda: self._dispatch("transcribe_batch", audios, {"languages": languages, "temperature": temperature})
+        )
+
+    async def _dispatch(
+        self,
+        kind: str,
+        audios: List[np.ndarray],
+        options: Dict[str, Any],
+        on_segment: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None
+    ):
+        # All clips go into one shared buffer, back to back
+        lengths = [int(audio.size) for audio in audios]
+        shm = shared_memory.SharedMemory(create=True, size=max(4 * sum(lengths), 1))
+        buffer = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+        offset = 0
+        for audio, length in zip(audios, lengths):
+            buffer[offset:offset + length] = audio
+            offset += length
+        del buffer
+        try:
+            worker = await self._idle.get()
+        except BaseException:
+            self._release_buffer(shm)
+            raise
+        if worker is None:
+            # The pool has failed; pass the marker on to the next waiter
+            self._idle.put_nowait(None)
+            self._release_buffer(shm)
+            raise WorkerCrashedError(self.error)
+
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(
+            self._io, worker.request, (kind, (shm.name, lengths, options)), self.job_timeout, on_segment, cancel
+        )
+        handed_off = False
+        try:
+            status, payload = await asyncio.shield(job)
+        except asyncio.CancelledError:
+            # The worker keeps running the job; release it and the buffer once it is done
+            handed_off = True
+            asyncio.ensure_future(self._release_after(job, worker, shm))
+            raise
+        except Exception as e:
+            self.failed += 1
+            self._replace(worker, e)
+            raise
+        finally:
+            if not handed_off:
+                self._release_buffer(shm)
+
+        worker.jobs += 1
+        self._idle.put_nowait(worker)
+        if status != "ok":
+            self.failed += 1
+            raise RuntimeError(payload)
+        self.completed += 1
+        return payload
+
+    async def _release_after(self, job: asyncio.Future, worker: _Worker, shm: shared_memory.SharedMemory):
+        try:
+            status, _ = await job
+        except Exception as e:
+            self._replace(worker, e)
+        else:
+            if status == "cancelled":
+                self.cancelled += 1
+            self._idle.put_nowait(worker)
+        finally:
+            self._release_buffer(shm)
+
+    def _replace(self, worker: _Worker, error: Exception):
+        """Restart a worker whose job failed in the parent or the child"""
+        if isinstance(error, WorkerCrashedError):
+            self.crashes += 1
+            logger.error(f"Whisper worker {worker.index} failed during a job, restarting it")
+        else:
+            # e.g. on_segment raised mid-stream: the worker may still be sending
+            # replies, so its pipe can no longer be trusted
+            logger.error(f"Job on Whisper worker {worker.index} failed ({error!r}), restarting the worker")
+        asyncio.ensure_future(self._restart(worker))
+
+    @staticmethod
+    def _release_buffer(shm: shared_memory.SharedMemory):
+        shm.close()
+        shm.unlink()
+
+    async def _restart(self, worker: _Worker):
+        """
+        Replace a dead or hung worker; it rejoins the idle queue once its model is loaded
+
+        After restart_attempts failures in a row the worker is given up on, and
+        once no worker is left the pool fails: waiting and later jobs raise
+        WorkerCrashedError instead of waiting forever.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.restart_attempts + 1):
+            try:
+                await loop.run_in_executor(self._io, worker.stop)
+                await loop.run_in_executor(self._io, worker.start, self.ready_timeout)
+                break
+            except Exception as e:
+                logger.error(f"Restarting Whisper worker {worker.index} failed (attempt {attempt}/{self.restart_attempts}): {e}")
+                if attempt == self.restart_attempts:
+                    self._give_up(worker, e)
+                    return
+                await asyncio.sleep(self.health_interval)
+        worker.restarts += 1
+        logger.info(f"Whisper worker {worker.index} restarted (pid {worker.pid})")
+        self._idle.put_nowait(worker)
+
+    def _give_up(self, worker: _Worker, error: Exception):
+        worker.failed = True
+        if all(w.failed for w in self._workers):
+            self.error = f"Whisper worker pool for model '{self.model_size}' failed: no worker could be restarted ({error})"
+            logger.critical(self.error)
+            # Wakes the jobs waiting for a worker; each passes it on to the next
+            self._idle.put_nowait(None)
+
+    async def _health_loop(self):
+        """Ping idle workers and restart the ones that died or stopped answering"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            if self.error is not None:
+                return
+            idle: List[_Worker] = []
+            while not self._idle.empty():
+                idle.append(self._idle.get_nowait())
+            # Pinged concurrently, and each worker rejoins the queue as soon as it
+            # answers, so admitted jobs never wait for the whole round
+            await asyncio.gather(*(self._check(worker) for worker in idle))
+
+    async def _check(self, worker: _Worker):
+        """Ping one worker taken off the idle queue; return it to the queue or restart it"""
+        healthy = worker.alive()
+        if healthy:
+            try:
+                loop = asyncio.get_running_loop()
+                status, _ = await loop.run_in_executor(self._io, worker.request, ("ping", None), 5.0)
+                healthy = status == "pong"
+            except WorkerCrashedError:
+                healthy = False
+        if healthy:
+            self._idle.put_nowait(worker)
+        else:
+            self.crashes += 1
+            logger.error(f"Whisper worker {worker.index} failed its health check, restarting it")
+            asyncio.ensure_future(self._restart(worker))
+
+    def close(self):
+        """Stop all workers"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for worker in self._workers:
+            worker.stop()
+        self._io.shutdown(wait=False)
+        self._started = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Get job counters and per-worker state"""
+        return {
+            "workers": self.size,
+            "cpu_threads_per_worker": self.cpu_threads,
+            "started": self._started,
+            "error": self.error,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "crashes": self.crashes,
+            "cancelled": self.cancelled,
+            "admission": self.gate.stats(),
+            "processes": [
+                {
+                    "index": w.index, "pid": w.pid, "alive": w.alive(), "jobs": w.jobs,
+                    "restarts": w.restarts, "failed": w.failed
+                }
+                for w in self._workers
+            ]
+        }